@@ -0,0 +1,414 @@
+"""
+Benchmark and load test for the model-serving API, runs fully offline.
+
+Drives the FastAPI app with synthetic audio at fixed concurrency and reports latency
+percentiles, throughput, real-time factor and peak RSS per endpoint as JSON. Gemini
+calls go to the local stub (benchmarks/fake_gemini.py), and Whisper defaults to the tiny
+model so a run takes minutes on a CPU (it must already be in the Hugging Face cache
+when running without network access).
+
+    # In-process (ASGI transport, no sockets)
+    python benchmarks/bench.py --endpoints ivrit gemini --durations 5 30 --concurrency 1 4
+
+    # Through uvicorn, closer to production, streamed responses report time to first byte
+    python benchmarks/bench.py --mode uvicorn --workers 2 --output results.json
+
+    # Compare against an earlier run
+    python benchmarks/bench.py --output new.json --baseline results.json
+
+Any AppSettings field can be overridden with --set, e.g. --set ivrit_batching=true.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+from fixtures import fixture
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+
+# Small models so a benchmark run is quick on CPU; other values are passed through as model aliases or names
+BENCH_MODELS = {
+    "tiny": "Systran/faster-whisper-tiny",
+    "base": "Systran/faster-whisper-base",
+}
+
+PROMPT = "Transcribe this recording."
+
+# name -> (path, streams the response, needs the Whisper model)
+ENDPOINTS = {
+    "ivrit": ("/ivrit/transcribe", False, True),
+    "ivrit_stream": ("/ivrit/transcribe/stream", True, True),
+    "gemini": ("/gemini/execute", False, False),
+    "gemini_stream": ("/gemini/execute", True, False),
+    "gemini_batch": ("/gemini/batch", False, False),
+}
+
+
+def build_request(endpoint: str, audio: bytes) -> dict:
+    """httpx request arguments for one call; result caches are bypassed so every call does the work"""
+    path, stream, _ = ENDPOINTS[endpoint]
+    wav = ("speech.wav", audio, "audio/wav")
+    if endpoint == "ivrit":
+        return {"url": path, "params": {"no_cache": "true"}, "files": {"file": wav}}
+    if endpoint == "ivrit_stream":
+        return {"url": path, "params": {"stream_format": "ndjson"}, "files": {"file": wav}}
+    if endpoint == "gemini_batch":
+        prompts = [PROMPT, "Summarize this recording.", "List the speakers."]
+        return {"url": path, "data": {"prompts": prompts, "no_cache": "true"}, "files": {"files": wav}}
+    data = {"prompt": PROMPT, "no_cache": "true"}
+    if stream:
+        data.update(stream="true", stream_format="ndjson")
+    return {"url": path, "data": data, "files": {"file": wav}}
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(seconds: list[float]) -> Optional[dict]:
+    if not seconds:
+        return None
+    return {
+        "p50": round(percentile(seconds, 0.50) * 1000, 1),
+        "p95": round(percentile(seconds, 0.95) * 1000, 1),
+        "p99": round(percentile(seconds, 0.99) * 1000, 1),
+        "mean": round(sum(seconds) / len(seconds) * 1000, 1),
+        "max": round(max(seconds) * 1000, 1),
+    }
+
+
+def process_tree(pid: int) -> list[int]:
+    """pid and all its descendants (uvicorn --workers forks one process per worker)"""
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as children:
+                    pids.extend(int(child) for child in children.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def rss_bytes(pid: int) -> int:
+    total = 0
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/statm") as statm:
+                total += int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+class RssSampler:
+    """Samples the server's RSS in the background and keeps the peak"""
+
+    def __init__(self, pid: int, interval: float = 0.02):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            self.peak = max(self.peak, rss_bytes(self.pid))
+            if self._stop.wait(self.interval):
+                break
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    server_pid: int,
+    endpoint: str,
+    audio_seconds: float,
+    audio: bytes,
+    concurrency: int,
+    requests: int,
+) -> dict:
+    """Send requests calls with at most concurrency in flight and summarize them"""
+    latencies: list[float] = []
+    first_bytes: list[float] = []
+    errors: Counter = Counter()
+    remaining = requests
+
+    async def call():
+        started = time.monotonic()
+        first_byte = None
+        try:
+            async with client.stream("POST", **build_request(endpoint, audio)) as response:
+                async for chunk in response.aiter_bytes():
+                    if first_byte is None and chunk:
+                        first_byte = time.monotonic() - started
+                status = response.status_code
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] += 1
+            return
+        if status >= 400:
+            errors[str(status)] += 1
+            return
+        latencies.append(time.monotonic() - started)
+        if first_byte is not None:
+            first_bytes.append(first_byte)
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await call()
+
+    with RssSampler(server_pid) as rss:
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.monotonic() - started
+
+    latency = summarize(latencies)
+    result = {
+        "endpoint": endpoint,
+        "audio_seconds": audio_seconds,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": dict(errors),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_ms": latency,
+        # Processing time per second of audio at this concurrency; below 1 is faster than real time
+        "rtf": round(latency["mean"] / 1000 / audio_seconds, 4) if latency else None,
+        "audio_seconds_per_second": round(len(latencies) * audio_seconds / wall, 2) if wall else 0.0,
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1),
+    }
+    if ENDPOINTS[endpoint][1]:
+        result["ttfb_ms"] = summarize(first_bytes)
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_process(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=SRC,
+        env={**os.environ, **env, "PYTHONPATH": os.pathsep.join(filter(None, [SRC, os.environ.get("PYTHONPATH")]))},
+        stdout=subprocess.DEVNULL,  # Warnings and tracebacks still reach stderr
+    )
+
+
+def stop_process(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def wait_until(client: httpx.AsyncClient, path: str, timeout: float):
+    """Poll a health endpoint until it answers 200 (e.g. /ready once models are loaded)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get(path)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Server did not answer 200 on {path} within {timeout:.0f}s")
+        await asyncio.sleep(0.2)
+
+
+def server_env(args: argparse.Namespace, state_dir: str, gemini_url: str, needs_model: bool) -> dict:
+    """AppSettings overrides: stub Gemini, bench model, state in a scratch directory"""
+    env = {
+        "gemini_api": "bench",
+        "gemini_base_url": gemini_url,
+        "ivrit_compute_type": args.compute_type,
+        "ivrit_workers": str(args.ivrit_workers),
+        "preload_models": "true" if needs_model else "false",
+        # Only the routers the endpoints under test need, so e.g. Gemini-only runs never wait on Whisper
+        "enabled_routers": json.dumps(sorted({ENDPOINTS[endpoint][0].split("/")[1] for endpoint in args.endpoints})),
+        "job_store_path": os.path.join(state_dir, "jobs.sqlite3"),
+        "job_spool_dir": os.path.join(state_dir, "job-inputs"),
+        "gemini_file_cache_path": os.path.join(state_dir, "gemini-files.sqlite3"),
+        "url_cache_dir": os.path.join(state_dir, "url-cache"),
+        "log_level": "WARNING",
+    }
+    if args.model in BENCH_MODELS:
+        env["ivrit_models"] = json.dumps({args.model: BENCH_MODELS[args.model]})
+    env["ivrit_default_model"] = args.model
+    for override in args.set:
+        key, _, value = override.partition("=")
+        env[key] = value
+    return env
+
+
+async def run_all(args: argparse.Namespace, client: httpx.AsyncClient, server_pid: int) -> list[dict]:
+    results = []
+    for endpoint in args.endpoints:
+        for seconds in args.durations:
+            with open(fixture(seconds, args.fixtures), "rb") as wav:
+                audio = wav.read()
+            # Unmeasured calls first, so model loads and first uploads don't skew the percentiles
+            for _ in range(args.warmup):
+                await run_scenario(client, server_pid, endpoint, seconds, audio, 1, 1)
+            for concurrency in args.concurrency:
+                result = await run_scenario(
+                    client, server_pid, endpoint, seconds, audio, concurrency, max(args.requests, concurrency)
+                )
+                results.append(result)
+                latency = result["latency_ms"] or {}
+                print(
+                    f"{endpoint:14} {seconds:>6g}s  c={concurrency:<3} ok={result['ok']}/{result['requests']}  "
+                    f"p50={latency.get('p50')}ms p95={latency.get('p95')}ms  "
+                    f"{result['throughput_rps']} req/s  rtf={result['rtf']}  rss={result['peak_rss_mb']}MB",
+                    file=sys.stderr,
+                )
+    return results
+
+
+async def benchmark(args: argparse.Namespace) -> dict:
+    needs_model = any(ENDPOINTS[endpoint][2] for endpoint in args.endpoints)
+    gemini_port = free_port()
+    gemini = start_process(
+        ["-m", "uvicorn", "fake_gemini:app", "--app-dir", BENCHMARKS, "--port", str(gemini_port), "--log-level", "warning"],
+        {"FAKE_GEMINI_LATENCY": str(args.gemini_latency)},
+    )
+    timeout = httpx.Timeout(args.timeout)
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-") as state_dir:
+            env = server_env(args, state_dir, f"http://127.0.0.1:{gemini_port}/", needs_model)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{gemini_port}") as stub:
+                await wait_until(stub, "/stats", 30)
+
+            if args.mode == "uvicorn":
+                port = free_port()
+                server = start_process(
+                    ["-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers),
+                     "--log-level", "warning"],
+                    env,
+                )
+                try:
+                    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+                        await wait_until(client, "/ready", args.startup_timeout)
+                        return {"results": await run_all(args, client, server.pid)}
+                finally:
+                    stop_process(server)
+
+            # In-process: settings are read from the environment when main is imported
+            os.environ.update(env)
+            sys.path.insert(0, SRC)
+            from main import app
+
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+                    await wait_until(client, "/ready", args.startup_timeout)
+                    return {"results": await run_all(args, client, os.getpid())}
+    finally:
+        stop_process(gemini)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline_path: str):
+    """Print p95 latency and throughput changes against an earlier run"""
+    with open(baseline_path) as baseline_file:
+        baseline = {
+            (r["endpoint"], r["audio_seconds"], r["concurrency"]): r for r in json.load(baseline_file)["results"]
+        }
+    print(f"\nCompared with {baseline_path}:", file=sys.stderr)
+    for result in results:
+        before = baseline.get((result["endpoint"], result["audio_seconds"], result["concurrency"]))
+        if not before or not before["latency_ms"] or not result["latency_ms"] or not before["throughput_rps"]:
+            continue
+        p95 = (result["latency_ms"]["p95"] / before["latency_ms"]["p95"] - 1) * 100
+        rps = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100
+        print(
+            f"{result['endpoint']:14} {result['audio_seconds']:>6g}s  c={result['concurrency']:<3} "
+            f"p95 {p95:+.1f}%  throughput {rps:+.1f}%",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=["ivrit", "gemini"])
+    parser.add_argument("--durations", nargs="+", type=float, default=[5.0, 30.0], help="Audio lengths in seconds")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--requests", type=int, default=16, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests before each endpoint/duration")
+    parser.add_argument("--model", default="tiny", help=f"{', '.join(BENCH_MODELS)} or a configured alias")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--ivrit-workers", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (--mode uvicorn)")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="Stub Gemini seconds per call")
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=VALUE", help="AppSettings override")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "model-serving-bench"))
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        **asyncio.run(benchmark(args)),
+    }
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        compare(report["results"], args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Local stand-in for the Gemini API, for load-testing the gemini router offline.
+
+Implements the endpoints google-genai uses for file uploads (resumable protocol),
+file lookups and (streaming) content generation, with a configurable artificial
+latency. Run it and point the model server at it:
+
+    FAKE_GEMINI_LATENCY=2.0 python benchmarks/fake_gemini.py
+    gemini_base_url=http://localhost:8090/ gemini_api=fake uvicorn main:app
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.environ.get("FAKE_GEMINI_LATENCY", "0.5"))  # Seconds per generate call
+STREAM_CHUNKS = int(os.environ.get("FAKE_GEMINI_STREAM_CHUNKS", "5"))
+
+app = FastAPI(title="Fake Gemini API")
+
+files: dict[str, dict] = {}
+uploads: dict[str, dict] = {}
+stats = {"uploads": 0, "generate_calls": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+@app.post("/upload/v1beta/files")
+async def upload_file(request: Request, upload_id: str = ""):
+    if not upload_id:
+        # Start of a resumable upload: hand out the URL the bytes are posted to
+        upload_id = uuid.uuid4().hex
+        body = await request.json()
+        uploads[upload_id] = {
+            "size": int(request.headers.get("x-goog-upload-header-content-length", "0")),
+            "mime_type": request.headers.get("x-goog-upload-header-content-type"),
+            "display_name": (body.get("file") or {}).get("displayName"),
+            "received": 0,
+        }
+        upload_url = f"{str(request.base_url)}upload/v1beta/files?upload_id={upload_id}"
+        return JSONResponse({}, headers={"x-goog-upload-url": upload_url, "x-goog-upload-status": "active"})
+
+    upload = uploads[upload_id]
+    upload["received"] += len(await request.body())
+    if "finalize" not in request.headers.get("x-goog-upload-command", ""):
+        return JSONResponse({}, headers={"x-goog-upload-status": "active"})
+
+    uploads.pop(upload_id)
+    stats["uploads"] += 1
+    name = f"files/{uuid.uuid4().hex[:12]}"
+    created = datetime.now(timezone.utc)
+    files[name] = {
+        "name": name,
+        "displayName": upload["display_name"],
+        "mimeType": upload["mime_type"],
+        "sizeBytes": str(upload["received"]),
+        "createTime": _now(),
+        "updateTime": _now(),
+        "expirationTime": (created + timedelta(hours=48)).isoformat().replace("+00:00", "Z"),
+        "state": "ACTIVE",
+        "uri": f"{str(request.base_url)}v1beta/{name}",
+    }
+    return JSONResponse({"file": files[name]}, headers={"x-goog-upload-status": "final"})
+
+
+@app.get("/v1beta/files/{file_id}")
+async def get_file(file_id: str):
+    name = f"files/{file_id}"
+    if name not in files:
+        return JSONResponse(status_code=404, content={"error": {"code": 404, "message": f"{name} not found", "status": "NOT_FOUND"}})
+    return files[name]
+
+
+@app.delete("/v1beta/files/{file_id}")
+async def delete_file(file_id: str):
+    files.pop(f"files/{file_id}", None)
+    return {}
+
+
+def _response(text: str, prompt_tokens: int, output_tokens: int, finished: bool) -> dict:
+    response = {
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}],
+        "modelVersion": "fake-gemini",
+    }
+    if finished:
+        response["candidates"][0]["finishReason"] = "STOP"
+        response["usageMetadata"] = {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        }
+    return response
+
+
+@app.post("/v1beta/models/{target}")
+async def generate_content(target: str, request: Request):
+    model, _, method = target.partition(":")
+    body = await request.json()
+    parts = [part for content in body.get("contents", []) for part in content.get("parts", [])]
+    prompt = " ".join(part["text"] for part in parts if "text" in part)
+    attached = [part["fileData"]["fileUri"] for part in parts if "fileData" in part]
+    missing = [uri for uri in attached if uri.rsplit("/v1beta/", 1)[-1] not in files]
+    if missing:
+        return JSONResponse(status_code=403, content={"error": {
+            "code": 403,
+            "message": f"You do not have permission to access the File {missing[0]} or it may not exist.",
+            "status": "PERMISSION_DENIED",
+        }})
+    text = f"[{model}] {len(attached)} file(s), prompt: {prompt[:80]}"
+    prompt_tokens = len(prompt.split()) + 32 * len(attached)
+
+    stats["generate_calls"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        if method == "streamGenerateContent":
+            words = text.split()
+            size = max(1, len(words) // STREAM_CHUNKS)
+            chunks = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+            async def events():
+                try:
+                    for index, chunk in enumerate(chunks):
+                        await asyncio.sleep(LATENCY / len(chunks))
+                        last = index == len(chunks) - 1
+                        yield f"data: {json.dumps(_response(chunk, prompt_tokens, len(words), last))}\r\n\r\n"
+                finally:
+                    stats["in_flight"] -= 1
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+        await asyncio.sleep(LATENCY)
+        stats["in_flight"] -= 1
+        return _response(text, prompt_tokens, len(text.split()), True)
+    except BaseException:
+        stats["in_flight"] -= 1
+        raise
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "files": len(files), "time": time.time()}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("FAKE_GEMINI_PORT", "8090")))
@@ -0,0 +1,54 @@
+"""
+Synthetic audio fixtures for the benchmarks.
+
+The clips alternate speech-like bursts (a few harmonics with a syllable-rate envelope
+and a little noise) with pauses, so VAD, silence splitting and the long-audio path see
+realistic structure. They are generated from a fixed seed and cached on disk, so every
+run sends byte-identical inputs.
+"""
+import io
+import os
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_speech(seconds: float, seed: int = 0) -> np.ndarray:
+    """float32 mono samples at 16 kHz: ~3s voiced phrases separated by ~0.8s pauses"""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    samples = np.zeros(total, dtype=np.float32)
+    position = 0
+    while position < total:
+        phrase = int(rng.uniform(1.5, 4.0) * SAMPLE_RATE)
+        end = min(total, position + phrase)
+        t = np.arange(end - position) / SAMPLE_RATE
+        pitch = rng.uniform(110, 220)
+        voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        syllables = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 5) * t))
+        noise = rng.normal(0, 0.02, len(t))
+        samples[position:end] = (0.3 * voice * syllables + noise).astype(np.float32)
+        position = end + int(rng.uniform(0.5, 1.2) * SAMPLE_RATE)
+    return np.clip(samples, -1.0, 1.0)
+
+
+def wav_bytes(samples: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((samples * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def fixture(seconds: float, directory: str) -> str:
+    """Path of a WAV fixture of the given length, generating it on first use"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"speech-{seconds:g}s.wav")
+    if not os.path.exists(path):
+        with open(path, "wb") as out:
+            out.write(wav_bytes(synthetic_speech(seconds, seed=int(seconds))))
+    return path
@@ -0,0 +1,106 @@
+"""
+Check that /ivrit/ws keeps finished utterances while the inference queue is full.
+
+Occupies the only inference worker and its one queue slot with jobs that block until
+released, streams synthetic speech through run_live_session and releases the pool after
+--hold seconds. Every utterance must still arrive as a 'final' event, none as 'error'.
+Uses the tiny Whisper model, which must already be in the Hugging Face cache when
+running without network access.
+
+    python benchmarks/live_saturation.py --seconds 8 --hold 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+
+from fixtures import SAMPLE_RATE, synthetic_speech
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+SETTINGS = {
+    "ivrit_workers": "1",
+    "ivrit_queue_size": "1",
+    "ivrit_batching": "false",
+    "ivrit_live_partial_seconds": "0",
+    "ivrit_models": json.dumps({"tiny": "Systran/faster-whisper-tiny"}),
+    "ivrit_default_model": "tiny",
+    "ivrit_compute_type": "int8",
+    "preload_models": "false",
+    "log_level": "WARNING",
+}
+
+
+class FakeWebSocket:
+    """Feeds options, 100ms PCM frames and "end" to the session and records what it sends"""
+
+    def __init__(self, pcm: bytes):
+        frame = SAMPLE_RATE // 10 * 2
+        self.messages = [{"type": "websocket.receive", "text": json.dumps({"language": "en"})}]
+        self.messages += [
+            {"type": "websocket.receive", "bytes": pcm[offset:offset + frame]}
+            for offset in range(0, len(pcm), frame)
+        ]
+        self.messages.append({"type": "websocket.receive", "text": "end"})
+        self.sent: list[dict] = []
+
+    async def receive(self) -> dict:
+        await asyncio.sleep(0)
+        return self.messages.pop(0)
+
+    async def send_json(self, data: dict):
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def check(seconds: float, hold: float) -> dict:
+    from routers import ivrit
+
+    pool = ivrit.get_pool()
+    release = threading.Event()
+    blockers = [pool.enqueue(release.wait) for _ in range(pool.workers)]
+    while pool.stats()["queue_depth"]:  # Wait for the workers to pick them up
+        await asyncio.sleep(0.01)
+    blockers += [pool.enqueue(release.wait) for _ in range(pool.max_queue)]
+
+    pcm = (synthetic_speech(seconds) * 32767).astype("<i2").tobytes()
+    websocket = FakeWebSocket(pcm)
+    asyncio.get_running_loop().call_later(hold, release.set)
+    await asyncio.wait_for(ivrit.run_live_session(websocket), timeout=hold + 120)
+    await asyncio.gather(*blockers)
+    pool.shutdown()
+
+    events = [message["event"] for message in websocket.sent]
+    summary = next(message["data"] for message in websocket.sent if message["event"] == "summary")
+    return {
+        "utterances": summary["utterances"],
+        "finals": events.count("final"),
+        "errors": [message["data"] for message in websocket.sent if message["event"] == "error"],
+        "ok": events.count("final") == summary["utterances"] > 0 and "error" not in events,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=8.0, help="Length of the streamed speech")
+    parser.add_argument("--hold", type=float, default=3.0, help="Seconds the inference pool stays full")
+    args = parser.parse_args()
+
+    os.environ.update(SETTINGS)
+    from routers import ivrit
+
+    # Load the model first, so the session is only held up by the full queue
+    with ivrit.get_registry().acquire(*ivrit.resolve_model(None)):
+        pass
+    report = asyncio.run(check(args.seconds, args.hold))
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Micro-benchmark for the settings provider on the request hot path.
+
+Measures nanoseconds per call of config.get_settings() against the closure wrapper
+AppSettings used to sit behind (a call plus a dict lookup), a thread-safe
+metaclass singleton and a plain global read. It then checks that concurrent first
+calls construct the settings once, and that reload_settings() under concurrent readers
+never hands out a missing instance.
+
+    python benchmarks/settings_bench.py --calls 1000000 --threads 32
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import config  # noqa: E402
+
+
+def legacy_singleton(cls):
+    """The wrapper AppSettings was decorated with before get_settings()"""
+    instances = {}
+
+    def wrapper(*args, **kwargs):
+        if cls not in instances:
+            instances[cls] = cls(*args, **kwargs)
+        return instances[cls]
+
+    return wrapper
+
+
+class SingleInstanceMetaClass(type):
+    """The thread-safe metaclass singleton, with a double-checked lock like get_settings()"""
+
+    def __init__(self, name, bases, dic):
+        self.__single_instance = None
+        self.__lock = threading.Lock()
+        super().__init__(name, bases, dic)
+
+    def __call__(cls, *args, **kwargs):
+        instance = cls.__single_instance
+        if instance is not None:
+            return instance
+        with cls.__lock:
+            if cls.__single_instance is None:
+                cls.__single_instance = super().__call__(*args, **kwargs)
+            return cls.__single_instance
+
+
+class MetaSingleton(metaclass=SingleInstanceMetaClass):
+    pass
+
+
+def per_call_ns(fn, calls: int, repeat: int) -> float:
+    """Best of repeat runs, in nanoseconds per call"""
+    return round(min(timeit.repeat(fn, number=calls, repeat=repeat)) / calls * 1e9, 1)
+
+
+def hot_path(calls: int, repeat: int) -> dict:
+    legacy = legacy_singleton(config.AppSettings)
+    legacy()
+    config.get_settings()
+    MetaSingleton()
+    settings = config.get_settings()
+    return {
+        "get_settings_ns": per_call_ns(config.get_settings, calls, repeat),
+        "legacy_singleton_ns": per_call_ns(legacy, calls, repeat),
+        "single_instance_metaclass_ns": per_call_ns(MetaSingleton, calls, repeat),
+        "global_read_ns": per_call_ns(lambda: settings, calls, repeat),
+    }
+
+
+def first_call_race(threads: int) -> dict:
+    """Start threads on a barrier so they all hit an empty provider at once; count constructions"""
+    constructed = []
+    original = config.AppSettings
+
+    class CountingSettings(original):
+        def __init__(self, **values):
+            constructed.append(threading.get_ident())
+            super().__init__(**values)
+
+    config.AppSettings = CountingSettings
+    config.reset_settings()
+    barrier = threading.Barrier(threads)
+    seen = set()
+
+    def first_call():
+        barrier.wait()
+        seen.add(id(config.get_settings()))
+
+    try:
+        workers = [threading.Thread(target=first_call) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        config.AppSettings = original
+        config.reset_settings()
+    return {"threads": threads, "constructed": len(constructed), "distinct_instances": len(seen)}
+
+
+def reload_under_readers(threads: int, reloads: int) -> dict:
+    """Readers spin on get_settings() while the main thread reloads; none may see None"""
+    stop = threading.Event()
+    reads = [0] * threads
+    missing = [0] * threads
+
+    def reader(index: int):
+        while not stop.is_set():
+            settings = config.get_settings()
+            reads[index] += 1
+            if settings is None or not settings.log_level:
+                missing[index] += 1
+
+    workers = [threading.Thread(target=reader, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    instances = [config.reload_settings() for _ in range(reloads)]
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return {"reloads": reloads, "reads": sum(reads), "missing": sum(missing), "distinct_instances": len({id(settings) for settings in instances})}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1_000_000, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs, the fastest is reported")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--reloads", type=int, default=50)
+    args = parser.parse_args()
+
+    report = {
+        "python": sys.version.split()[0],
+        "hot_path": hot_path(args.calls, args.repeat),
+        "first_call_race": first_call_race(args.threads),
+        "reload_under_readers": reload_under_readers(min(args.threads, 8), args.reloads),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,13 +8,44 @@ WORKERS=$([ "$ENV" = "dev" ] && echo 1 || echo 4)
 
 echo "Environment: $ENV, Running with workers: $WORKERS"
 
+# Model hosts own the Whisper models; the uvicorn workers forward audio to them,
+# so adding workers does not add model copies. MODEL_HOSTS=0 loads models in every worker.
+MODEL_HOSTS=${MODEL_HOSTS:-$([ "$ENV" = "dev" ] && echo 0 || echo 1)}
+
 export PYTHONPATH=/app/src/
 PORT=${PORT:-8080}
 
 echo "Running on port $PORT"
 
-# Start the FastAPI application with Uvicorn
 source /app/.venv/bin/activate
+
+# Keep a model host running: restart it when it exits (crash, OOM kill), after a short pause.
+# Workers reconnect on their next request; /ready fails while any host is unreachable.
+supervise_model_host() {
+    local socket=$1 status
+    while true; do
+        # Each host sizes its CTranslate2 thread pool to its share of the CPU quota
+        WEB_CONCURRENCY=$MODEL_HOSTS python /app/src/model_host.py --socket "$socket" && status=0 || status=$?
+        echo "Model host on $socket exited with status $status, restarting in ${MODEL_HOST_RESTART_DELAY:-2}s" >&2
+        sleep "${MODEL_HOST_RESTART_DELAY:-2}"
+    done
+}
+
+if [ "$MODEL_HOSTS" -gt 0 ]; then
+    SOCKETS=()
+    for i in $(seq 0 $((MODEL_HOSTS - 1))); do
+        SOCKET="/tmp/model-host-$i.sock"
+        supervise_model_host "$SOCKET" &
+        SOCKETS+=("\"$SOCKET\"")
+    done
+    echo "Started $MODEL_HOSTS model host(s)"
+    export MODEL_HOST_SOCKETS="[$(IFS=,; echo "${SOCKETS[*]}")]"
+else
+    # Each worker sizes its CTranslate2 thread pool to its share of the CPU quota
+    export WEB_CONCURRENCY=$WORKERS
+fi
+
+# Start the FastAPI application with Uvicorn
 exec uvicorn src.main:app \
     --host 0.0.0.0 \
     --port "$PORT" \
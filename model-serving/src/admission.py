@@ -0,0 +1,263 @@
+"""
+Admission control in front of the inference backends.
+
+Every transcription and Gemini request is admitted with a priority class, the client it
+came from and an optional deadline:
+
+    priority  'interactive' or 'batch', from the priority field or the X-Priority header
+    client    the X-Client-Id header, else the peer address
+    deadline  now plus the X-Request-Timeout header (seconds), the time the client gives up
+
+Clients over their concurrency quota are turned away with 429 right here. The
+admission then rides along in a context variable, so the inference pool and the
+Gemini limiter can order queued work by class (and expected cost) and refuse jobs that
+cannot finish before the client's deadline, without threading it through every call.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from fastapi import HTTPException
+from fastapi.requests import HTTPConnection
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)  # Highest first
+
+
+class Admission:
+    """Priority class, client and deadline (wall clock, so it survives the trip to a model host) of a request"""
+
+    __slots__ = ("priority", "client", "deadline", "_control")
+
+    def __init__(self, priority: str = INTERACTIVE, client: str = "", deadline: Optional[float] = None):
+        self.priority = priority
+        self.client = client
+        self.deadline = deadline
+        self._control: Optional["AdmissionControl"] = None
+
+    @property
+    def rank(self) -> int:
+        """Position of the priority class, lower is served first"""
+        return PRIORITIES.index(self.priority)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline, None without one"""
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def release(self):
+        """Give back the client's quota slot; safe to call more than once"""
+        control, self._control = self._control, None
+        if control is not None:
+            control.release(self)
+
+    def to_dict(self) -> dict:
+        return {"priority": self.priority, "client": self.client, "deadline": self.deadline}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["Admission"]:
+        return cls(data["priority"], data["client"], data["deadline"]) if data else None
+
+
+# Admission of the request being handled; None (e.g. live sessions) counts as interactive without a deadline
+current_admission: ContextVar[Optional[Admission]] = ContextVar("current_admission", default=None)
+
+
+def most_urgent(admissions: list[Optional[Admission]]) -> Optional[Admission]:
+    """
+    Admission for work shared by several requests (a micro-batch): the highest class among
+    them, and a deadline only if every request has one, the latest of them.
+    """
+    present = [admission for admission in admissions if admission is not None]
+    if not present:
+        return None
+    deadlines = [admission.deadline for admission in present]
+    return Admission(
+        min(present, key=lambda admission: admission.rank).priority,
+        "batch of requests",
+        max(deadlines) if None not in deadlines else None,
+    )
+
+
+@contextmanager
+def scheduled(admission: Optional[Admission]) -> Iterator[None]:
+    """Schedule the pool and Gemini work started inside the block under admission"""
+    token = current_admission.set(admission)
+    try:
+        yield
+    finally:
+        current_admission.reset(token)
+
+
+class ClientQuotaExceeded(HTTPException):
+    def __init__(self, client: str, limit: int):
+        super().__init__(
+            status_code=429,
+            detail=f"Client {client} already has {limit} requests in progress",
+            headers={"Retry-After": "1"},
+        )
+
+
+class AdmissionControl:
+    """
+    Per-client concurrency quotas, per priority class, for this worker process.
+
+    max_in_flight maps a priority class to the number of requests one client may have in
+    progress at once; a missing or 0 entry leaves the class unlimited.
+    """
+
+    def __init__(self, max_in_flight: dict[str, int], default_priority: str = INTERACTIVE):
+        self.max_in_flight = max_in_flight
+        self.default_priority = default_priority
+        self._in_flight: dict[tuple[str, str], int] = {}
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.rejected = {priority: 0 for priority in PRIORITIES}
+
+    def acquire(self, request: HTTPConnection, priority: Optional[str] = None) -> Admission:
+        """Admit a request or raise 400 (bad priority or timeout) / 429 (client over its quota)"""
+        priority = priority or request.headers.get("x-priority") or self.default_priority
+        if priority not in PRIORITIES:
+            raise HTTPException(status_code=400, detail=f"priority must be one of {list(PRIORITIES)}")
+        client = request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+        deadline = None
+        timeout = request.headers.get("x-request-timeout")
+        if timeout:
+            try:
+                deadline = time.time() + float(timeout)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="X-Request-Timeout must be a number of seconds")
+
+        key = (priority, client)
+        limit = self.max_in_flight.get(priority, 0)
+        if limit and self._in_flight.get(key, 0) >= limit:
+            self.rejected[priority] += 1
+            logger.warning(f"Client {client} is over its {priority} quota of {limit}, rejecting request")
+            raise ClientQuotaExceeded(client, limit)
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        self.admitted[priority] += 1
+        admission = Admission(priority, client, deadline)
+        admission._control = self
+        return admission
+
+    def release(self, admission: Admission):
+        key = (admission.priority, admission.client)
+        remaining = self._in_flight.get(key, 0) - 1
+        if remaining > 0:
+            self._in_flight[key] = remaining
+        else:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        in_flight = {priority: 0 for priority in PRIORITIES}
+        for (priority, _), count in self._in_flight.items():
+            in_flight[priority] += count
+        return {
+            "in_flight": in_flight,
+            "clients": len({client for _, client in self._in_flight}),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "max_in_flight_per_client": dict(self.max_in_flight),
+        }
+
+
+# Global admission control of this worker process
+admission_control: Optional[AdmissionControl] = None
+
+
+def get_admission_control() -> AdmissionControl:
+    global admission_control
+    if admission_control is None:
+        settings = get_settings()
+        admission_control = AdmissionControl(
+            settings.admission_client_max_in_flight, settings.admission_default_priority
+        )
+    return admission_control
+
+
+@contextmanager
+def admit(request: HTTPConnection, priority: Optional[str] = None) -> Iterator[Admission]:
+    """Admit the request for the duration of the block and schedule its work accordingly"""
+    admission = get_admission_control().acquire(request, priority)
+    try:
+        with scheduled(admission):
+            yield admission
+    finally:
+        admission.release()
+
+
+class DeadlineExceededError(HTTPException):
+    """Raised while waiting for an upstream slot once the request's deadline has passed"""
+
+    def __init__(self):
+        super().__init__(status_code=504, detail="Request deadline passed while waiting for an upstream slot")
+
+
+class PrioritySemaphore:
+    """
+    asyncio.Semaphore that hands free slots to the most urgent waiter instead of the first.
+
+    Waiters are ordered by the priority class of their admission, then by arrival. A
+    waiter whose deadline passes gives up with DeadlineExceededError instead of taking a
+    slot for a response nobody waits for anymore.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    def locked(self) -> bool:
+        return self._value == 0
+
+    async def acquire(self):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        admission = current_admission.get()
+        rank = admission.rank if admission is not None else 0
+        remaining = admission.remaining() if admission is not None else None
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (rank, next(self._order), waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max(0.0, remaining) if remaining is not None else None)
+        except asyncio.TimeoutError:
+            self._forget(entry)
+            raise DeadlineExceededError()
+        except BaseException:
+            self._forget(entry)
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)  # The slot passes straight to this waiter
+                return
+        self._value += 1
+
+    def _forget(self, entry: tuple[int, int, asyncio.Future]):
+        waiter = entry[2]
+        if waiter.done() and not waiter.cancelled():
+            # Woken up just as it gave up: hand the slot on
+            self.release()
+            return
+        waiter.cancel()
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,215 @@
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Optional, Union
+
+import numpy as np
+
+from config import get_settings
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # What Whisper and Silero VAD expect
+OPUS_FRAME_SAMPLES = 320  # 20ms at 16 kHz
+
+
+def shift_segment(segment: dict, offset: float) -> dict:
+    """A segment dict (and its words, if any) moved by offset seconds"""
+    shifted = {**segment, "start": round(segment["start"] + offset, 3), "end": round(segment["end"] + offset, 3)}
+    if segment.get("words"):
+        shifted["words"] = [
+            {**word, "start": round(word["start"] + offset, 3), "end": round(word["end"] + offset, 3)}
+            for word in segment["words"]
+        ]
+    return shifted
+
+
+class PreparedAudio:
+    """
+    A recording decoded to 16 kHz mono float32, ready for Whisper and VAD.
+
+    When leading silence was trimmed, offset is where the samples start in the original
+    recording, in seconds; rebase() maps timestamps back onto the original.
+    """
+
+    def __init__(self, samples: np.ndarray, offset: float = 0.0, original_duration: Optional[float] = None):
+        self.samples = samples
+        self.offset = offset
+        self.original_duration = original_duration if original_duration is not None else len(samples) / SAMPLE_RATE
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / SAMPLE_RATE
+
+    def rebase(self, result: dict) -> dict:
+        """Shift a transcription result's segments onto the original timeline"""
+        if self.offset:
+            result["segments"] = [shift_segment(segment, self.offset) for segment in result["segments"]]
+        result["duration"] = self.original_duration
+        return result
+
+
+class AudioCache:
+    """Decoded audio keyed by content hash and preprocessing options, LRU-bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, PreparedAudio]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[PreparedAudio]:
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prepared
+
+    def set(self, key: tuple, prepared: PreparedAudio):
+        size = prepared.samples.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.samples.nbytes
+            self._entries[key] = prepared
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.samples.nbytes
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_mb": round(self._size / (1024 * 1024), 1),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global decoded audio cache, shared by all transcription paths
+audio_cache: Optional[AudioCache] = None
+
+
+def get_audio_cache() -> AudioCache:
+    global audio_cache
+    if audio_cache is None:
+        audio_cache = AudioCache(get_settings().audio_cache_mb * 1024 * 1024)
+    return audio_cache
+
+
+def normalize_peak(samples: np.ndarray, peak: float = 0.95) -> np.ndarray:
+    """Scale so the loudest sample sits at peak; quiet recordings decode better"""
+    loudest = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    if loudest <= 0.0:
+        return samples
+    return (samples * (peak / loudest)).astype(np.float32)
+
+
+def trim_silence(samples: np.ndarray, top_db: float) -> tuple[np.ndarray, int]:
+    """Cut leading and trailing silence; returns the trimmed samples and the index they start at"""
+    # librosa pulls in numba, so it is only imported when trimming is enabled
+    import librosa
+
+    trimmed, (start, _) = librosa.effects.trim(samples, top_db=top_db)
+    return trimmed, int(start)
+
+
+def preprocessing_options() -> dict:
+    """Preprocessing prepare_audio applies by default; part of every result cache key built on it"""
+    settings = get_settings()
+    return {
+        "normalize": settings.audio_normalize,
+        "trim_silence": settings.audio_trim_silence,
+        "trim_top_db": settings.audio_trim_top_db,
+    }
+
+
+def prepare_audio(
+    source: Union[str, BinaryIO, np.ndarray],
+    sha256: Optional[str] = None,
+    normalize: Optional[bool] = None,
+    trim: Optional[bool] = None,
+    router: str = "ivrit",
+) -> PreparedAudio:
+    """
+    Decode a recording once into 16 kHz mono float32 and apply the optional preprocessing.
+
+    With a content hash the result is cached, so re-running the same audio with other
+    options (model, task, language, prompt) skips the decode. normalize and trim default
+    to the audio_normalize and audio_trim_silence settings.
+    """
+    settings = get_settings()
+    normalize = settings.audio_normalize if normalize is None else normalize
+    trim = settings.audio_trim_silence if trim is None else trim
+    cache = get_audio_cache() if sha256 and settings.audio_cache_mb > 0 else None
+    key = (sha256, normalize, trim, settings.audio_trim_top_db if trim else None)
+    if cache is not None:
+        prepared = cache.get(key)
+        if prepared is not None:
+            return prepared
+
+    if isinstance(source, np.ndarray):
+        samples = source
+    else:
+        # Imported on first decode, so processes that never decode do not load faster-whisper
+        from faster_whisper import decode_audio
+
+        with stage(router, "decode"):
+            samples = decode_audio(source, sampling_rate=SAMPLE_RATE)
+    original_duration = len(samples) / SAMPLE_RATE
+    offset = 0.0
+    if trim:
+        samples, start = trim_silence(samples, settings.audio_trim_top_db)
+        offset = start / SAMPLE_RATE
+    if normalize:
+        samples = normalize_peak(samples)
+    prepared = PreparedAudio(samples, offset, original_duration)
+    if cache is not None:
+        cache.set(key, prepared)
+    return prepared
+
+
+def encode_opus(samples: np.ndarray, bitrate: int, directory: Optional[str] = None) -> str:
+    """
+    Encode 16 kHz mono samples as Opus in an Ogg container; returns the path of a temp file.
+
+    Speech at 16-32 kbps is a small fraction of the size of the WAV or MP3 it came from,
+    which makes uploads to Gemini correspondingly faster.
+    """
+    import av
+
+    fd, path = tempfile.mkstemp(suffix=".ogg", dir=directory)
+    os.close(fd)
+    try:
+        with av.open(path, "w", format="ogg") as container:
+            stream = container.add_stream("libopus", rate=SAMPLE_RATE, layout="mono")
+            stream.bit_rate = bitrate
+            for start in range(0, len(samples), OPUS_FRAME_SAMPLES):
+                chunk = samples[start:start + OPUS_FRAME_SAMPLES]
+                if len(chunk) < OPUS_FRAME_SAMPLES:
+                    chunk = np.pad(chunk, (0, OPUS_FRAME_SAMPLES - len(chunk)))
+                frame = av.AudioFrame.from_ndarray(chunk.reshape(1, -1), format="flt", layout="mono")
+                frame.sample_rate = SAMPLE_RATE
+                frame.pts = start
+                for packet in stream.encode(frame):
+                    container.mux(packet)
+            for packet in stream.encode(None):
+                container.mux(packet)
+    except BaseException:
+        os.unlink(path)
+        raise
+    logger.info(f"Encoded {len(samples) / SAMPLE_RATE:.0f}s of audio as Opus ({os.path.getsize(path)} bytes)")
+    return path
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Any, Callable, Hashable, Optional
+
+from admission import current_admission, most_urgent
+from inference import InferencePool, PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingBatch:
+    __slots__ = ("items", "futures", "admissions", "cost", "timer")
+
+    def __init__(self):
+        self.items: list[Any] = []
+        self.futures: list[asyncio.Future] = []
+        self.admissions: list = []
+        self.cost: Optional[float] = 0.0  # Seconds of audio, None once an item's is unknown
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests that share a group key for up to max_wait seconds (or
+    until max_batch of them arrived) and runs them as a single inference pool job.
+
+    run_batch(group_key, items) runs on a pool worker and must return one entry per item,
+    in order; an entry that is an Exception fails only that item's request. The batch is
+    queued with the combined cost of its items, under the most urgent of their admissions.
+    """
+
+    def __init__(
+        self,
+        pool: InferencePool,
+        run_batch: Callable[[Hashable, list], list],
+        max_batch: int = 8,
+        max_wait: float = 0.01,
+    ):
+        self._pool = pool
+        self._run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._pending: dict[Hashable, _PendingBatch] = {}
+        self.batches = 0
+        self.batched_items = 0
+
+    async def submit(self, group_key: Hashable, item: Any, cost: Optional[float] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(group_key)
+        if batch is None:
+            batch = self._pending[group_key] = _PendingBatch()
+            batch.timer = loop.call_later(self.max_wait, self._flush, group_key)
+        batch.items.append(item)
+        batch.futures.append(future)
+        batch.admissions.append(current_admission.get())
+        batch.cost = batch.cost + cost if batch.cost is not None and cost is not None else None
+        if len(batch.items) >= self.max_batch:
+            self._flush(group_key)
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "pending": sum(len(batch.items) for batch in self._pending.values()),
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+    def _flush(self, group_key: Hashable):
+        batch = self._pending.pop(group_key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        items, futures = batch.items, batch.futures
+        self.batches += 1
+        self.batched_items += len(items)
+        logger.debug(f"Flushing batch of {len(items)} for {group_key}")
+        try:
+            job = self._pool.enqueue(
+                lambda: self._run_batch(group_key, items), batch.cost, most_urgent(batch.admissions)
+            )
+        except PoolSaturatedError as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(type(e)(e.retry_after, str(e)))
+            return
+        job.add_done_callback(lambda done: self._scatter(done, futures))
+
+    @staticmethod
+    def _scatter(job: asyncio.Future, futures: list[asyncio.Future]):
+        error = job.exception() if not job.cancelled() else asyncio.CancelledError()
+        results = job.result() if error is None else [error] * len(futures)
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,114 @@
+import json
+from typing import Optional
+
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import AppSettings
+
+MULTIPART_OVERHEAD = 1024 * 1024  # Room for form fields and part headers around an upload of max_upload_size
+
+
+class BodyTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds maximum allowed size of {limit} bytes")
+
+
+class BodyLimitMiddleware:
+    """
+    Rejects request bodies over a per-route byte limit with 413, before anything parses them.
+
+    A pure ASGI middleware: a declared Content-Length over the limit is answered without
+    reading the body at all, and requests whose Content-Length fits are passed through
+    untouched (the server never delivers more than it declared). Only chunked bodies are
+    counted as they arrive; the first message that crosses the limit fails the read, so
+    neither the multipart parser nor the spool files see the rest. Whatever the app makes
+    of that error, the client gets the 413, and the connection is closed rather than
+    drained.
+
+    limits maps path prefixes to byte limits; the longest matching prefix wins, paths
+    that match none get default_limit, and a limit of 0 disables the check.
+    """
+
+    def __init__(self, app: ASGIApp, default_limit: int, limits: Optional[dict[str, int]] = None):
+        self.app = app
+        self.default_limit = default_limit
+        # Longest prefix first, so the first match is the most specific one
+        self.limits = sorted((limits or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def limit_for(self, path: str) -> int:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return self.default_limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limit_for(scope["path"])
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+        content_length = None
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                content_length = int(value) if value.isdigit() else None
+                break
+        if content_length is not None:
+            if content_length > limit:
+                await self.reject(send, limit)
+            else:
+                await self.app(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise BodyTooLarge(limit)
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal response_started
+            if exceeded and not response_started:
+                return  # Replaced by the 413 below
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded or response_started:
+                raise
+        if exceeded and not response_started:
+            await self.reject(send, limit)
+
+    @staticmethod
+    async def reject(send: Send, limit: int):
+        body = json.dumps({"detail": BodyTooLarge(limit).detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def body_limits(settings: AppSettings) -> tuple[int, dict[str, int]]:
+    """Default and per-route body limits from the settings"""
+    default_limit = settings.request_body_limit
+    if default_limit is None:
+        default_limit = settings.max_upload_size + MULTIPART_OVERHEAD
+    return default_limit, settings.request_body_limits
@@ -0,0 +1,44 @@
+import logging
+from typing import BinaryIO, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+def audio_duration(source: Union[str, BinaryIO]) -> Optional[float]:
+    """Duration in seconds from the container header, without decoding; None if unknown"""
+    import av
+
+    try:
+        with av.open(source) as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+            stream = container.streams.audio[0]
+            if stream.duration is not None and stream.time_base is not None:
+                return float(stream.duration * stream.time_base)
+    except Exception as e:
+        logger.debug(f"Could not probe audio duration: {e}")
+    finally:
+        if not isinstance(source, str):
+            source.seek(0)
+    return None
+
+
+def split_at_silence(speech_chunks: list[dict], total_samples: int, target_samples: int) -> list[tuple[int, int]]:
+    """
+    Group VAD speech chunks into (start, end) sample ranges of roughly target_samples.
+
+    Cuts are placed in the middle of the silence between two speech chunks, so no word is
+    split across ranges. The ranges cover the whole audio without gaps, which keeps the
+    per-range timestamps easy to rebase.
+    """
+    if not speech_chunks:
+        return [(0, total_samples)]
+    bounds = []
+    start = 0
+    for current, following in zip(speech_chunks, speech_chunks[1:]):
+        if current["end"] - start >= target_samples:
+            cut = (current["end"] + following["start"]) // 2
+            bounds.append((start, cut))
+            start = cut
+    bounds.append((start, total_samples))
+    return bounds
@@ -1,13 +1,194 @@
+import logging
+import threading
+from typing import Annotated, Optional
+
+from fastapi import Depends
+from pydantic import ValidationError
 from pydantic_settings import BaseSettings
-from single_instance_metaclass import singleton
 
-@singleton
+logger = logging.getLogger(__name__)
+
+
 class AppSettings(BaseSettings):
     gemini_api: str = ""
     log_level: str = "INFO"
 
+    # Gemini client: created once per process, HTTP connections are pooled and kept alive
+    gemini_base_url: Optional[str] = None  # e.g. http://localhost:8090/ for the fake Gemini server (benchmarks/fake_gemini.py)
+    gemini_max_concurrency: int = 16  # Concurrent upstream Gemini calls, others wait their turn
+    gemini_max_connections: int = 32
+    gemini_timeout_seconds: int = 600
+    gemini_batch_max_items: int = 32  # (file, prompt) pairs per /gemini/batch request
+    gemini_upload_opus: bool = False  # Upload audio re-encoded as 16 kHz mono Opus instead of the original file
+    gemini_opus_bitrate: int = 32000
+    # Handles of files already uploaded to Gemini, reused until shortly before the server deletes them (48h)
+    gemini_file_cache_path: str = "data/gemini-files.sqlite3"
+    gemini_file_expiry_margin_seconds: int = 3600
+
+    # Whisper inference pool: one model per worker thread, bounded request queue
+    ivrit_workers: int = 1
+    ivrit_queue_size: int = 8
+    ivrit_batch_queue_share: float = 0.5  # Share of the queue batch-priority jobs may fill, the rest is kept for interactive ones
+
+    # Admission control for /ivrit/transcribe* and /gemini/execute|batch: priority classes, per-client quotas, deadlines
+    admission_default_priority: str = "interactive"  # For requests without a priority field or X-Priority header
+    admission_client_max_in_flight: dict[str, int] = {  # Requests one client (X-Client-Id, else address) may have in progress per worker, 0 is unlimited
+        "interactive": 0,
+        "batch": 2,
+    }
+
+    # Whisper model registry: aliases callers can pick with local_model, kept resident under a RAM budget
+    ivrit_models: dict[str, str] = {
+        "turbo": "ivrit-ai/whisper-large-v3-turbo-ct2",
+        "small": "Systran/faster-whisper-small",
+        "distil": "Systran/faster-distil-whisper-large-v3",
+    }
+    ivrit_default_model: str = "turbo"
+    ivrit_compute_type: str = "int8"
+    model_memory_budget_mb: int = 4096
+    model_default_size_mb: int = 1600  # Assumed size of a model that has not been loaded yet
+
+    # CTranslate2 execution: threads default to the CPU quota divided across uvicorn workers and model replicas
+    ivrit_device: str = "cpu"  # "cpu", "cuda" or "auto"
+    ivrit_cpu_threads: int = 0  # Threads per model replica, 0 derives them from the CPU quota
+    ivrit_num_workers: int = 0  # Concurrent transcribe calls one loaded model serves, 0 follows ivrit_workers
+    ivrit_beam_size: int = 5
+    ivrit_best_of: int = 5  # Candidates sampled at each temperature fallback
+    ivrit_vad_min_silence_ms: int = 500
+    web_concurrency: int = 1  # uvicorn worker processes on this host, read from the same WEB_CONCURRENCY uvicorn uses
+
+    # Model hosts: processes that own the models; uvicorn workers forward decoded audio to them over Unix sockets
+    model_host_sockets: list[str] = []  # e.g. ["/tmp/model-host-0.sock"], empty runs inference in-process
+    model_host_shm_dir: str = "/dev/shm"  # PCM handed to the hosts is written here, falls back to the temp dir
+
+    # Opt-in micro-batching: concurrent /ivrit/transcribe requests are decoded together
+    ivrit_batching: bool = False
+    ivrit_batch_max_size: int = 8
+    ivrit_batch_max_wait_ms: int = 10
+    ivrit_batch_max_audio_seconds: float = 30.0  # Longer clips skip the batch decode
+
+    # Recordings longer than this are split at silences and transcribed in parallel chunks (0 disables)
+    ivrit_long_audio_seconds: float = 600.0
+    ivrit_chunk_seconds: float = 120.0
+
+    # Audio preprocessing: recordings are decoded once to 16 kHz mono float32, cached by content hash
+    audio_cache_mb: int = 512  # 0 disables the decoded audio cache
+    audio_normalize: bool = False  # Peak-normalize before transcription
+    audio_trim_silence: bool = False  # Cut leading/trailing silence; timestamps still refer to the original
+    audio_trim_top_db: float = 40.0
+
+    # /ivrit/transcribe/url: downloads stream into a local cache, revalidated with ETag/Last-Modified
+    url_cache_dir: str = "data/url-cache"
+    url_cache_max_bytes: int = 2 * 1024 * 1024 * 1024  # 2GB
+    url_download_timeout_seconds: float = 30.0
+    url_download_retries: int = 3  # Interrupted downloads are resumed with Range requests
+    url_max_connections: int = 16
+
+    # /ivrit/ws live transcription: audio is cut into utterances at VAD pauses and each is transcribed on the shared model
+    ivrit_live_max_streams: int = 8  # Concurrent live connections per process, others are closed with 1013
+    ivrit_live_max_utterance_seconds: float = 30.0  # Speech without a pause is cut here; bounds the per-connection buffer
+    ivrit_live_max_pending_utterances: int = 2  # Utterances waiting for the model before the connection stops reading
+    ivrit_live_max_frame_bytes: int = 256 * 1024
+    ivrit_live_step_ms: int = 250  # VAD runs whenever this much new audio arrived
+    ivrit_live_partial_seconds: float = 1.0  # Interval between partial hypotheses of the utterance in progress, 0 disables them
+
+    # Asynchronous job API: persistent sqlite queue, inputs kept on disk until the job finishes
+    job_store_path: str = "data/jobs.sqlite3"
+    job_spool_dir: str = "data/job-inputs"
+    job_workers: int = 1
+    job_retry_backoff_seconds: int = 30
+    job_lease_seconds: int = 60  # A running job is requeued once its worker stops renewing the lease for this long
+
+    # Routers this process serves; faster-whisper is only imported with ivrit, google-genai only with gemini
+    enabled_routers: list[str] = ["ivrit", "gemini", "jobs"]
+
+    # Load models during startup instead of on the first request, then prime them with a short synthetic clip
+    preload_models: bool = True
+    warmup_models: bool = True
+    warmup_audio_seconds: float = 2.0
+
+    # Uploads are hashed and size-checked in 1MB chunks, spool_dir can point at tmpfs (e.g. /dev/shm)
+    max_upload_size: int = 200 * 1024 * 1024  # 200MB
+    upload_spool_dir: Optional[str] = None
+
+    # Request bodies are counted as they arrive and rejected with 413 once over the limit, before multipart parsing
+    request_body_limit: Optional[int] = None  # Bytes, None allows max_upload_size plus multipart framing, 0 disables
+    request_body_limits: dict[str, int] = {  # Path prefix -> bytes, the longest matching prefix wins
+        "/gemini/batch": 1024 * 1024 * 1024,  # Several files per request
+    }
+
+    # Content-addressed result cache: in-memory LRU plus an optional sqlite tier
+    result_cache_entries: int = 256  # 0 disables the memory tier
+    result_cache_ttl_seconds: int = 7 * 24 * 3600
+    result_cache_path: Optional[str] = None  # e.g. /app/models/result-cache.sqlite3
+    result_cache_max_disk_bytes: int = 512 * 1024 * 1024
+
     class Config:
         env_file = ".env"  # Optional: load from .env file if present
         env_file_encoding = "utf-8"
         extra = "allow"
         case_sensitive = False  #
+
+
+# Settings of this process, created on first use and replaced as a whole by reload_settings()
+_settings: Optional[AppSettings] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> AppSettings:
+    """
+    The settings of this process, read from the environment and .env on first use.
+
+    After the first call this is a single global read; the lock only serializes the first
+    calls, so handlers racing on the threadpool still build (and read .env) once.
+    """
+    settings = _settings
+    if settings is None:
+        settings = _load_settings()
+    return settings
+
+
+def _load_settings() -> AppSettings:
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            _settings = AppSettings()
+        return _settings
+
+
+def reload_settings() -> AppSettings:
+    """
+    Read the environment and .env again and swap the new settings in with one assignment.
+
+    Callers holding the old instance keep a consistent view until their next
+    get_settings(). Raises ValidationError when the new values do not validate, leaving
+    the current settings in place; callers handle it (see handle_reload_signal).
+    Only values read per request change: pools, models and routers built at startup do not.
+    """
+    global _settings
+    settings = AppSettings()
+    with _settings_lock:
+        _settings = settings
+    return settings
+
+
+def reset_settings():
+    """Forget the current settings, so the next get_settings() reads them again"""
+    global _settings
+    with _settings_lock:
+        _settings = None
+
+
+def handle_reload_signal():
+    """SIGHUP handler for uvicorn workers and model hosts"""
+    try:
+        settings = reload_settings()
+    except ValidationError as e:
+        logger.error(f"Settings reload failed, keeping the current settings: {e}")
+        return
+    logging.getLogger().setLevel(settings.log_level)
+    logger.info("Settings reloaded")
+
+
+# FastAPI dependency for endpoints that read the settings
+SettingsDep = Annotated[AppSettings, Depends(get_settings)]
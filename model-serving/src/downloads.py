@@ -0,0 +1,415 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from config import get_settings
+from metrics import BYTES_INGESTED, stage
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+LOCK_POLL_SECONDS = 0.1  # Wait for another worker's download without tying up a thread
+
+
+class DownloadedMedia:
+    """A remote file available at a local path; owned by the URL cache, so callers must not delete it"""
+
+    def __init__(self, url: str, path: str, size: int, sha256: str, content_type: Optional[str], from_cache: bool):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.content_type = content_type
+        self.from_cache = from_cache
+
+    def reused(self) -> "DownloadedMedia":
+        return DownloadedMedia(self.url, self.path, self.size, self.sha256, self.content_type, True)
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(urlparse(self.url).path) or self.url
+
+
+def _too_large(size: int, max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Remote file size ({size} bytes) exceeds maximum allowed size of {max_size} bytes"
+    )
+
+
+def _lock_file(lock_path: str, operation: int) -> int:
+    """
+    Open lock_path and flock it (LOCK_NB raises BlockingIOError while another holds it).
+
+    An evicting process unlinks lock files it holds exclusively, so a lock taken on an
+    unlinked file is dropped and taken again on the file now at the path.
+    """
+    while True:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            if _holds(fd, lock_path):
+                return fd
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+
+
+def _holds(fd: int, lock_path: str) -> bool:
+    """Whether the locked fd is still the file at lock_path"""
+    try:
+        return os.fstat(fd).st_ino == os.stat(lock_path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class _UrlState:
+    """This process's requests for one URL: one fetch at a time, then shared by its readers"""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+        self.readers = 0
+        self.fd: Optional[int] = None  # Shared flock on the URL's lock file while readers use the file
+        self.media: Optional[DownloadedMedia] = None
+
+
+def _hash_file(path: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as part:
+        while chunk := part.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest
+
+
+class UrlFetcher:
+    """
+    Downloads remote media into a local cache with one pooled async HTTP client.
+
+    Downloads stream straight to disk in chunks and stop with 413 once max_size is
+    crossed. A download that breaks off keeps its partial file and is resumed with a
+    Range request (guarded by If-Range), both on retry within the request and on the
+    next request for the same URL. Finished files are kept with their ETag and
+    Last-Modified, so a later request only sends a conditional GET and reuses the file on
+    304. The cache is bounded by total bytes; least recently used files are evicted,
+    except those a request is still reading.
+
+    The cache directory is shared by all uvicorn workers, so each URL has a lock file:
+    a download holds it exclusively, requests reading the file hold it shared, and
+    eviction skips every file whose lock it cannot take at once.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        timeout: float = 30.0,
+        retries: int = 3,
+        max_connections: int = 16,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.retries = max(0, retries)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=True,
+        )
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            "url TEXT PRIMARY KEY, path TEXT NOT NULL, complete INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "sha256 TEXT, etag TEXT, last_modified TEXT, content_type TEXT, "
+            "fetched_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._urls: dict[str, _UrlState] = {}
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.resumed = 0
+
+    @asynccontextmanager
+    async def fetch(self, url: str, max_size: int) -> AsyncIterator[DownloadedMedia]:
+        """Make a URL available locally for the duration of the block"""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            raise HTTPException(status_code=400, detail="audio_url must be an http(s) URL")
+        state = self._urls.get(url)
+        if state is None:
+            state = self._urls[url] = _UrlState()
+        state.users += 1
+        try:
+            # One download per URL at a time; concurrent requests wait and then reuse it
+            async with state.lock:
+                if state.fd is None:
+                    state.fd, state.media = await self._fetch_locked(url, max_size)
+                    media = state.media
+                else:
+                    # Fetched (and revalidated) for a request of this process still reading it
+                    self.hits += 1
+                    await run_in_threadpool(self._touch, url)
+                    media = state.media.reused()
+                state.readers += 1
+            try:
+                yield media
+            finally:
+                state.readers -= 1
+                if not state.readers:
+                    os.close(state.fd)
+                    state.fd = state.media = None
+        finally:
+            state.users -= 1
+            if not state.users:
+                del self._urls[url]
+
+    def _lock_path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".lock")
+
+    async def _fetch_locked(self, url: str, max_size: int) -> tuple[int, DownloadedMedia]:
+        """Fetch under the URL's exclusive lock; returns the lock downgraded to shared, and the media"""
+        lock_path = self._lock_path(url)
+        while True:
+            try:
+                fd = _lock_file(lock_path, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+                continue
+            try:
+                media = await self._fetch(url, max_size)
+            except BaseException:
+                if await run_in_threadpool(self._get, url) is None:
+                    _unlink(lock_path)
+                os.close(fd)
+                raise
+            # Not atomic: another process may lock or evict the file in between, then fetch again
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                if _holds(fd, lock_path) and os.path.exists(media.path):
+                    return fd, media
+            except BlockingIOError:
+                pass
+            os.close(fd)
+
+    async def _fetch(self, url: str, max_size: int) -> DownloadedMedia:
+        entry = await run_in_threadpool(self._get, url)
+        headers = {}
+        if entry and entry["complete"] and os.path.exists(entry["path"]):
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        attempt = 0
+        while True:
+            try:
+                with stage("url", "download"):
+                    return await self._download(url, max_size, entry, headers)
+            except httpx.TransportError as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise HTTPException(status_code=502, detail=f"Download of {url} failed: {e}")
+                logger.warning(f"Download of {url} interrupted ({e}), resuming (attempt {attempt})")
+                entry = await run_in_threadpool(self._get, url)
+                headers = {}
+                await asyncio.sleep(min(2 ** attempt, 10) * 0.25)
+
+    async def _download(self, url: str, max_size: int, entry: Optional[dict], headers: dict) -> DownloadedMedia:
+        path = os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest())
+        part_path = f"{path}.part"
+        offset = 0
+        digest = hashlib.sha256()
+        if not headers and entry and not entry["complete"] and os.path.exists(part_path):
+            validator = entry["etag"] or entry["last_modified"]
+            if validator and os.path.getsize(part_path):
+                # Continue the interrupted download if the remote file did not change since
+                offset = os.path.getsize(part_path)
+                headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+                digest = await run_in_threadpool(_hash_file, part_path)
+
+        async with self._client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                self.revalidated += 1
+                await run_in_threadpool(self._touch, url)
+                logger.info(f"{url} not modified, reusing cached download")
+                return DownloadedMedia(url, entry["path"], entry["size"], entry["sha256"], entry["content_type"], True)
+            if response.status_code == 416 and offset:
+                # The partial file is no longer valid for the remote one; start over
+                logger.warning(f"Cannot resume download of {url}, starting over")
+                os.unlink(part_path)
+                await run_in_threadpool(self._delete, url)
+                return await self._download(url, max_size, None, {})
+            if response.status_code >= 400:
+                raise HTTPException(status_code=502, detail=f"Fetching {url} returned HTTP {response.status_code}")
+
+            if response.status_code == 206 and offset:
+                self.resumed += 1
+                logger.info(f"Resuming download of {url} at byte {offset}")
+                mode = "ab"
+            else:
+                offset = 0
+                digest = hashlib.sha256()
+                mode = "wb"
+            total = response.headers.get("content-length")
+            if total is not None and offset + int(total) > max_size:
+                raise _too_large(offset + int(total), max_size)
+
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+            content_type = response.headers.get("content-type")
+            # Record the validators first, so a broken download can be resumed later
+            await run_in_threadpool(self._put, url, part_path, False, offset, None, etag, last_modified, content_type)
+
+            size = offset
+            pending = bytearray()
+            with open(part_path, mode) as part:
+                try:
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > max_size:
+                            pending.clear()
+                            part.close()
+                            os.unlink(part_path)
+                            await run_in_threadpool(self._delete, url)
+                            raise _too_large(size, max_size)
+                        pending += chunk
+                        if len(pending) >= CHUNK_SIZE:
+                            digest.update(pending)
+                            await run_in_threadpool(part.write, bytes(pending))
+                            pending.clear()
+                finally:
+                    # Keep whatever arrived before a broken connection, so the retry resumes after it
+                    if pending:
+                        digest.update(pending)
+                        await run_in_threadpool(part.write, bytes(pending))
+
+        os.replace(part_path, path)
+        sha256 = digest.hexdigest()
+        await run_in_threadpool(self._put, url, path, True, size, sha256, etag, last_modified, content_type)
+        self.downloads += 1
+        BYTES_INGESTED.inc(size - offset, router="url")
+        logger.info(f"Downloaded {url} ({size} bytes)")
+        await run_in_threadpool(self._evict, url)
+        return DownloadedMedia(url, path, size, sha256, content_type, False)
+
+    def _get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, complete, size, sha256, etag, last_modified, content_type FROM downloads WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("path", "complete", "size", "sha256", "etag", "last_modified", "content_type")
+        return dict(zip(keys, row))
+
+    def _put(self, url, path, complete, size, sha256, etag, last_modified, content_type):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO downloads "
+                "(url, path, complete, size, sha256, etag, last_modified, content_type, fetched_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, path, int(complete), size, sha256, etag, last_modified, content_type, now, now),
+            )
+            self._db.commit()
+
+    def _touch(self, url: str):
+        with self._lock:
+            self._db.execute("UPDATE downloads SET used_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+    def _delete(self, url: str):
+        with self._lock:
+            self._db.execute("DELETE FROM downloads WHERE url = ?", (url,))
+            self._db.commit()
+
+    def _evict(self, keep: str):
+        with self._lock:
+            rows = self._db.execute("SELECT url, path, size FROM downloads ORDER BY used_at").fetchall()
+            total = sum(size for _, _, size in rows)
+            for url, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if url == keep:
+                    continue
+                lock_path = self._lock_path(url)
+                try:
+                    fd = _lock_file(lock_path, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Being downloaded or read, here or in another worker
+                try:
+                    _unlink(path)
+                    self._db.execute("DELETE FROM downloads WHERE url = ?", (url,))
+                    _unlink(lock_path)
+                finally:
+                    os.close(fd)
+                total -= size
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM downloads WHERE complete = 1"
+            ).fetchone()
+        return {
+            "entries": rows,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "downloads": self.downloads,
+            "resumed": self.resumed,
+            "revalidated": self.revalidated,
+        }
+
+    async def close(self):
+        await self._client.aclose()
+        with self._lock:
+            self._db.close()
+
+
+# Global URL fetcher, shared by all routers
+url_fetcher: Optional[UrlFetcher] = None
+
+
+def get_url_fetcher() -> UrlFetcher:
+    global url_fetcher
+    if url_fetcher is None:
+        settings = get_settings()
+        url_fetcher = UrlFetcher(
+            settings.url_cache_dir,
+            settings.url_cache_max_bytes,
+            timeout=settings.url_download_timeout_seconds,
+            retries=settings.url_download_retries,
+            max_connections=settings.url_max_connections,
+        )
+    return url_fetcher
+
+
+async def close_url_fetcher():
+    global url_fetcher
+    if url_fetcher is not None:
+        await url_fetcher.close()
+        url_fetcher = None
@@ -0,0 +1,104 @@
+"""
+Output formats for transcription results.
+
+FastAPI runs a returned dict through jsonable_encoder, which walks every value of a
+transcript with thousands of segments in Python before json.dumps even starts. The
+renderers here serialize the plain result dict directly and return a ready Response:
+
+    json      the regular result, dumped once without the encoder pass
+    columnar  segments (and words) as parallel arrays instead of one dict per item
+    msgpack   the columnar form as MessagePack
+    srt, vtt  subtitles, generated cue by cue while the response is sent
+"""
+import json
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+OUTPUT_FORMATS = ("json", "columnar", "msgpack", "srt", "vtt")
+
+# Response media type per subtitle format
+SUBTITLE_MEDIA_TYPES = {
+    "srt": "application/x-subrip; charset=utf-8",
+    "vtt": "text/vtt",
+}
+
+SEGMENT_COLUMNS = ("start", "end", "text", "confidence")
+WORD_COLUMNS = ("start", "end", "word", "probability")
+
+
+def check_output_format(output_format: str):
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"output_format must be one of {list(OUTPUT_FORMATS)}")
+
+
+def dumps(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def subtitle_timestamp(seconds: float, fmt: str) -> str:
+    """00:01:02,345 for SRT, 00:01:02.345 for VTT"""
+    milliseconds = max(0, round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    separator = "," if fmt == "srt" else "."
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def subtitle_cue(index: int, segment: Mapping, fmt: str) -> str:
+    """One numbered cue; blank lines would end the cue early, so they are dropped from the text"""
+    start = subtitle_timestamp(segment["start"], fmt)
+    end = subtitle_timestamp(segment["end"], fmt)
+    text = "\n".join(line for line in segment["text"].strip().splitlines() if line.strip())
+    return f"{index}\n{start} --> {end}\n{text}\n\n"
+
+
+def iter_subtitles(segments: Iterable[Mapping], fmt: str) -> Iterator[str]:
+    """SRT or WebVTT document for the segments, one cue at a time"""
+    if fmt == "vtt":
+        yield "WEBVTT\n\n"
+    for index, segment in enumerate(segments, start=1):
+        yield subtitle_cue(index, segment, fmt)
+
+
+def to_columnar(result: Mapping) -> dict:
+    """
+    The result with its segments as parallel arrays.
+
+    Word timings, when present, become a second table whose 'segment' column is the
+    index of the segment each word belongs to.
+    """
+    segments = result.get("segments") or []
+    columns = {name: [segment.get(name) for segment in segments] for name in SEGMENT_COLUMNS}
+    words = {name: [] for name in ("segment", *WORD_COLUMNS)}
+    for index, segment in enumerate(segments):
+        for word in segment.get("words") or ():
+            words["segment"].append(index)
+            for name in WORD_COLUMNS:
+                words[name].append(word[name])
+    columnar = {key: value for key, value in result.items() if key != "segments"}
+    columnar["segments"] = columns
+    if words["segment"]:
+        columnar["words"] = words
+    return columnar
+
+
+def render(result: dict, output_format: str, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Serialize a transcription result in the requested format, keeping the given headers"""
+    headers = dict(headers or {})
+    headers.pop("content-length", None)
+    if output_format in SUBTITLE_MEDIA_TYPES:
+        return StreamingResponse(
+            iter_subtitles(result.get("segments") or [], output_format),
+            media_type=SUBTITLE_MEDIA_TYPES[output_format],
+            headers=headers,
+        )
+    if output_format == "msgpack":
+        import msgpack
+
+        return Response(msgpack.packb(to_columnar(result)), media_type="application/msgpack", headers=headers)
+    if output_format == "columnar":
+        result = to_columnar(result)
+    return Response(dumps(result), media_type="application/json", headers=headers)
@@ -0,0 +1,135 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Files uploaded to the Gemini Developer API are deleted after 48 hours
+DEFAULT_FILE_TTL_SECONDS = 48 * 3600
+
+
+class GeminiFileCache:
+    """
+    Gemini file handles keyed by content hash and mime type, persisted in sqlite.
+
+    Re-running a prompt against media that was already uploaded reuses the remote file
+    instead of uploading it again. Each entry records the remote file's expiration time
+    and is dropped expiry_margin_seconds before it, so a handle is never handed out for
+    a file the server is about to delete. Handles are also scoped to an account
+    fingerprint, since files are only visible to the API key that uploaded them.
+    """
+
+    def __init__(self, path: str, expiry_margin_seconds: int = 3600):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.expiry_margin_seconds = expiry_margin_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS gemini_files ("
+            "account TEXT NOT NULL, sha256 TEXT NOT NULL, mime_type TEXT NOT NULL, "
+            "name TEXT NOT NULL, uri TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (account, sha256, mime_type))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_gemini_files_expires_at ON gemini_files(expires_at)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, account: str, sha256: str, mime_type: str) -> Optional[dict]:
+        """Return the cached handle ({name, uri, mime_type, expires_at}) if it is still safe to use"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT name, uri, mime_type, expires_at FROM gemini_files "
+                "WHERE account = ? AND sha256 = ? AND mime_type = ? AND expires_at > ?",
+                (account, sha256, mime_type, time.time() + self.expiry_margin_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"name": row[0], "uri": row[1], "mime_type": row[2], "expires_at": row[3]}
+
+    def set(
+        self,
+        account: str,
+        sha256: str,
+        mime_type: str,
+        name: str,
+        uri: str,
+        size: int,
+        expires_at: Optional[float] = None,
+    ):
+        now = time.time()
+        expires_at = expires_at or now + DEFAULT_FILE_TTL_SECONDS
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO gemini_files "
+                "(account, sha256, mime_type, name, uri, size, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (account, sha256, mime_type, name, uri, size, now, expires_at),
+            )
+            self._db.execute(
+                "DELETE FROM gemini_files WHERE expires_at <= ?", (now + self.expiry_margin_seconds,)
+            )
+            self._db.commit()
+
+    def discard(self, account: str, sha256: str, mime_type: str):
+        """Forget a handle the server no longer accepts"""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM gemini_files WHERE account = ? AND sha256 = ? AND mime_type = ?",
+                (account, sha256, mime_type),
+            )
+            self._db.commit()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM gemini_files WHERE expires_at > ?",
+                (time.time() + self.expiry_margin_seconds,),
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": rows,
+            "uploaded_bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# Global file handle cache, shared by the gemini router and Gemini jobs
+file_cache: Optional[GeminiFileCache] = None
+
+
+def get_file_cache() -> GeminiFileCache:
+    global file_cache
+    if file_cache is None:
+        settings = get_settings()
+        file_cache = GeminiFileCache(
+            settings.gemini_file_cache_path,
+            expiry_margin_seconds=settings.gemini_file_expiry_margin_seconds,
+        )
+        logger.info(f"Gemini file cache at {settings.gemini_file_cache_path}")
+    return file_cache
+
+
+def close_file_cache():
+    global file_cache
+    if file_cache is not None:
+        file_cache.close()
+        file_cache = None
@@ -0,0 +1,307 @@
+import asyncio
+import itertools
+import logging
+import math
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Optional
+
+from admission import PRIORITIES, Admission, current_admission
+from metrics import QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the inference queue is full and the request should be retried later"""
+
+    def __init__(self, retry_after: int, detail: Optional[str] = None):
+        super().__init__(detail or f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineUnreachableError(PoolSaturatedError):
+    """Raised when a job would not finish before its request's deadline, so running it would only waste a worker"""
+
+
+class StreamClosedError(Exception):
+    """Raised inside a streaming job when the consumer went away, to stop decoding early"""
+
+
+_STREAM_DONE = object()
+
+
+class _Job:
+    __slots__ = ("fn", "loop", "future", "enqueued_at", "rank", "cost", "estimate", "deadline")
+
+    def __init__(
+        self,
+        fn: Callable[[], Any],
+        loop: asyncio.AbstractEventLoop,
+        future: asyncio.Future,
+        rank: int = 0,
+        cost: Optional[float] = None,
+        estimate: float = 1.0,
+        deadline: Optional[float] = None,
+    ):
+        self.fn = fn
+        self.loop = loop
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.rank = rank
+        self.cost = cost  # Seconds of audio, when known
+        self.estimate = estimate  # Expected service seconds
+        self.deadline = deadline
+
+    @property
+    def order(self) -> tuple[int, float]:
+        """
+        Queue position: priority class first, then expected finish time, so shorter jobs
+        overtake longer ones queued shortly before them but not ones that waited longer
+        than the difference in their lengths.
+        """
+        return self.rank, self.enqueued_at + self.estimate
+
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None):
+    # The awaiting request may have been cancelled (client disconnect) while the job ran
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class InferencePool:
+    """
+    Fixed set of inference worker threads fed by a bounded priority queue.
+
+    Jobs are plain callables that check their model out of a ModelRegistry. They run
+    entirely on the worker thread (including consuming lazy segment generators), so the
+    event loop only awaits the result and stays free for other requests.
+
+    Queued jobs are served by the priority class of the request that queued them
+    (interactive before batch), then by expected finish time: the cost a job is submitted
+    with (seconds of audio) times the observed seconds of service per second of audio.
+    Batch jobs may fill only batch_queue_share of the queue, leaving room for interactive
+    ones. A job whose request has a deadline is refused up front when the work queued ahead
+    of it plus its own would not finish in time, and dropped if the deadline passed while
+    it was queued.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 8, name: str = "inference", batch_queue_share: float = 1.0):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.batch_queue_limit = max(1, int(self.max_queue * batch_queue_share))
+        self._queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue(maxsize=self.max_queue)
+        self._order = itertools.count()
+        self._queued = [0] * len(PRIORITIES)
+        self._running: dict[int, tuple[float, float]] = {}  # Thread id -> (started, expected service seconds)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._last_wait = 0.0
+        self._avg_service = 0.0
+        self._avg_service_per_second = 0.0  # Service seconds per second of audio
+        self._deadline_rejected = 0
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        logger.info(f"Starting {self.name} pool with {self.workers} worker(s), queue size {self.max_queue}")
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"{self.name}-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, timeout: float = 5.0):
+        if not self._started:
+            return
+        logger.info(f"Stopping {self.name} pool")
+        for _ in self._threads:
+            # Sorts after every job, so the queue drains first
+            self._queue.put((len(PRIORITIES), math.inf, next(self._order), None))
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads.clear()
+        self._started = False
+
+    def retry_after(self) -> int:
+        """Estimate in seconds until a queue slot frees up"""
+        backlog = self._queue.qsize() + self._in_flight
+        service = self._avg_service or 1.0
+        return max(1, math.ceil(backlog * service / self.workers))
+
+    def estimate(self, cost: Optional[float]) -> float:
+        """Expected service seconds of a job over cost seconds of audio"""
+        if cost is not None and self._avg_service_per_second:
+            return cost * self._avg_service_per_second
+        return self._avg_service or 1.0
+
+    def expected_wait(self, order: tuple[int, float]) -> float:
+        """Seconds until a job queued at order would start, from the work queued ahead of it and running"""
+        now = time.monotonic()
+        with self._queue.mutex:
+            ahead = sum(entry[3].estimate for entry in self._queue.queue if entry[3] is not None and entry[:2] <= order)
+        running = sum(max(0.0, estimate - (now - started)) for started, estimate in list(self._running.values()))
+        return (ahead + running) / self.workers
+
+    def enqueue(self, fn: Callable[[], Any], cost: Optional[float] = None, admission: Optional[Admission] = None) -> asyncio.Future:
+        """
+        Queue fn() for a worker and return a future for its result.
+
+        cost is the job's audio in seconds, used to order it and to check its deadline;
+        admission defaults to the current request's. Raises PoolSaturatedError when full,
+        DeadlineUnreachableError when the job cannot finish before the deadline.
+        """
+        if not self._started:
+            self.start()
+        if admission is None:
+            admission = current_admission.get()
+        loop = asyncio.get_running_loop()
+        job = _Job(
+            fn,
+            loop,
+            loop.create_future(),
+            rank=admission.rank if admission is not None else 0,
+            cost=cost,
+            estimate=self.estimate(cost),
+            deadline=admission.deadline if admission is not None else None,
+        )
+        with self._lock:
+            if job.rank and self._queued[job.rank] >= self.batch_queue_limit:
+                logger.warning(f"{self.name} queue holds {self.batch_queue_limit} batch jobs, rejecting request")
+                raise PoolSaturatedError(self.retry_after())
+            if job.deadline is not None:
+                needed = self.expected_wait(job.order) + job.estimate
+                if time.time() + needed > job.deadline:
+                    self._deadline_rejected += 1
+                    logger.warning(f"{self.name} job needs ~{needed:.1f}s, past its deadline, rejecting request")
+                    raise DeadlineUnreachableError(
+                        self.retry_after(),
+                        f"Request needs about {needed:.1f}s and cannot finish within its timeout",
+                    )
+            try:
+                self._queue.put_nowait((*job.order, next(self._order), job))
+            except queue.Full:
+                logger.warning(f"{self.name} queue full ({self.max_queue}), rejecting request")
+                raise PoolSaturatedError(self.retry_after())
+            self._queued[job.rank] += 1
+        return job.future
+
+    async def submit(self, fn: Callable[[], Any], cost: Optional[float] = None) -> Any:
+        """Run fn() on a worker and await its result"""
+        return await self.enqueue(fn, cost)
+
+    def stream(self, fn: Callable[[Callable[[Any], None]], Any], cost: Optional[float] = None) -> AsyncIterator[Any]:
+        """
+        Run fn(emit) on a worker and return an async iterator over everything it emits.
+
+        The job is queued immediately, so PoolSaturatedError is raised here, while the
+        response can still be turned into a 503. Once the consumer stops iterating, the
+        next emit raises StreamClosedError inside the worker so it stops decoding early.
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        closed = threading.Event()
+
+        def emit(item: Any):
+            if closed.is_set():
+                raise StreamClosedError()
+            loop.call_soon_threadsafe(items.put_nowait, item)
+
+        future = self.enqueue(lambda: fn(emit), cost)
+        # Ends the stream once the job is resolved, also when fn never runs (e.g. dropped past its
+        # deadline); emitted items are queued before the resolution, so none are lost
+        future.add_done_callback(lambda _: items.put_nowait(_STREAM_DONE))
+
+        async def drain():
+            try:
+                while True:
+                    item = await items.get()
+                    if item is _STREAM_DONE:
+                        break
+                    yield item
+                await future
+            finally:
+                closed.set()
+                # Retrieve a late StreamClosedError so it isn't logged as never retrieved
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        return drain()
+
+    def stats(self) -> dict:
+        completed = self._completed + self._failed
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "queued": dict(zip(PRIORITIES, self._queued)),
+            "max_queue": self.max_queue,
+            "batch_queue_limit": self.batch_queue_limit,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "failed": self._failed,
+            "last_wait_seconds": round(self._last_wait, 4),
+            "avg_wait_seconds": round(self._total_wait / completed, 4) if completed else 0.0,
+            "avg_service_seconds": round(self._avg_service, 4),
+            "avg_service_per_audio_second": round(self._avg_service_per_second, 4),
+            "deadline_rejected": self._deadline_rejected,
+        }
+
+    def _run(self):
+        while True:
+            job = self._queue.get()[3]
+            if job is None:
+                break
+            wait = time.monotonic() - job.enqueued_at
+            with self._lock:
+                self._queued[job.rank] -= 1
+                self._last_wait = wait
+                self._total_wait += wait
+            QUEUE_WAIT.observe(wait, pool=self.name)
+            if job.deadline is not None and time.time() > job.deadline:
+                # The client has given up already
+                with self._lock:
+                    self._deadline_rejected += 1
+                    self._failed += 1
+                error = DeadlineUnreachableError(1, "Request timeout passed while it was queued")
+                job.loop.call_soon_threadsafe(_resolve, job.future, None, error)
+                continue
+            started = time.monotonic()
+            with self._lock:
+                self._in_flight += 1
+                self._running[threading.get_ident()] = (started, job.estimate)
+            try:
+                result = job.fn()
+            except BaseException as e:
+                with self._lock:
+                    self._failed += 1
+                job.loop.call_soon_threadsafe(_resolve, job.future, None, e)
+            else:
+                with self._lock:
+                    self._completed += 1
+                job.loop.call_soon_threadsafe(_resolve, job.future, result, None)
+            finally:
+                service = time.monotonic() - started
+                with self._lock:
+                    self._in_flight -= 1
+                    self._running.pop(threading.get_ident(), None)
+                    # Exponentially weighted so Retry-After and estimates track the current workload
+                    self._avg_service = service if not self._avg_service else 0.8 * self._avg_service + 0.2 * service
+                    if job.cost:
+                        per_second = service / job.cost
+                        self._avg_service_per_second = (
+                            per_second if not self._avg_service_per_second
+                            else 0.8 * self._avg_service_per_second + 0.2 * per_second
+                        )
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from job_store import FAILED, SUCCEEDED, JobStore
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[float], None]
+JobHandler = Callable[[dict, ProgressCallback], Awaitable[Any]]
+
+MAX_BACKOFF_SECONDS = 30.0  # Longest pause of a worker after the store failed (e.g. database is locked)
+
+
+class JobRunner:
+    """
+    Background tasks that drain the job store.
+
+    Each job kind has an async handler receiving the job and a progress callback taking a
+    0-100 percentage; progress writes are throttled. When a job reaches a final state its
+    input file is removed and its webhook (if any) is notified. Store calls run in threads,
+    as sqlite can block for seconds while other processes hold the write lock; a worker whose
+    store call fails backs off and keeps going.
+
+    A heartbeat renews the leases of the jobs this runner executes and requeues jobs whose
+    lease expired because the process running them died. On shutdown, jobs in progress
+    are released back to the queue.
+    """
+
+    def __init__(self, store: JobStore, handlers: dict[str, JobHandler], workers: int = 1, poll_interval: float = 1.0):
+        self.store = store
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._active: set[str] = set()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._run(index)) for index in range(self.workers)]
+        # Its first round requeues what a dead process left running
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def notify(self):
+        """Wake idle workers after a job was enqueued"""
+        self._wakeup.set()
+
+    async def _requeue_expired(self):
+        requeued = await asyncio.to_thread(self.store.requeue_expired)
+        if requeued:
+            logger.info(f"Requeued {requeued} job(s) whose worker stopped renewing their lease")
+            self.notify()
+
+    async def _heartbeat(self):
+        interval = self.store.lease_seconds / 3
+        while True:
+            try:
+                lost = await asyncio.to_thread(self.store.renew_leases, list(self._active))
+                for job_id in lost:
+                    logger.warning(f"Lost the lease of job {job_id}, another worker may run it again")
+                await self._requeue_expired()
+            except Exception as e:
+                logger.error(f"Job lease heartbeat failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def _run(self, index: int):
+        backoff = self.poll_interval
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim_next)
+                if job is not None:
+                    await self._execute(job)
+                backoff = self.poll_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} failed, retrying in {backoff:.1f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+                continue
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _execute(self, job: dict):
+        job_id = job["job_id"]
+        logger.info(f"Running job {job_id} ({job['kind']}), attempt {job['attempts']}")
+        last_write = {"at": 0.0, "progress": -1, "task": None}
+
+        def written(task: asyncio.Task):
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(f"Failed to record progress of job {job_id}: {task.exception()}")
+
+        def report_progress(percent: float):
+            progress = int(percent)
+            now = time.monotonic()
+            pending = last_write["task"] is not None and not last_write["task"].done()
+            # One write at a time, so they land in order; a skipped value is written by a later call
+            if not pending and progress != last_write["progress"] and (now - last_write["at"] >= 1.0 or progress >= 100):
+                last_write["task"] = asyncio.ensure_future(asyncio.to_thread(self.store.update_progress, job_id, progress))
+                last_write["task"].add_done_callback(written)
+                last_write.update(at=now, progress=progress)
+
+        self._active.add(job_id)
+        try:
+            handler = self.handlers[job["kind"]]
+            result = await handler(job, report_progress)
+            job = await asyncio.to_thread(self.store.complete, job_id, result)
+            if job is not None:
+                logger.info(f"Job {job_id} succeeded")
+        except asyncio.CancelledError:
+            # Shutdown: hand the job back so a live worker picks it up without waiting for the lease
+            if await asyncio.to_thread(self.store.release, job_id):
+                logger.info(f"Job {job_id} released back to the queue")
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            job = await asyncio.to_thread(self.store.fail, job_id, str(e))
+        finally:
+            self._active.discard(job_id)
+
+        if job is None:
+            # The lease expired and the job was requeued; its result belongs to the next attempt
+            logger.warning(f"Job {job_id} finished after losing its lease, discarding the result")
+            return
+        if job["status"] in (SUCCEEDED, FAILED):
+            self._cleanup(job)
+            await self._send_webhook(job)
+
+    @staticmethod
+    def _cleanup(job: dict):
+        if job["input_path"] and os.path.exists(job["input_path"]):
+            try:
+                os.unlink(job["input_path"])
+            except OSError as e:
+                logger.warning(f"Failed to remove input of job {job['job_id']}: {e}")
+
+    @staticmethod
+    async def _send_webhook(job: dict):
+        if not job["webhook_url"]:
+            return
+        payload = {
+            "job_id": job["job_id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "result": job["result"],
+            "error": job["last_error"],
+        }
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.post(job["webhook_url"], json=payload)
+                response.raise_for_status()
+            logger.info(f"Webhook for job {job['job_id']} delivered")
+        except Exception as e:
+            logger.warning(f"Webhook for job {job['job_id']} failed: {e}")
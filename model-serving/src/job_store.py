@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+DEFAULT_RETRY_SPEC = {"max_attempts": 3, "backoff_seconds": 30, "backoff_multiplier": 2.0}
+
+# Same layout as proxmox-jobs.sqlite3, with tool_name/node/upid replaced by model-server fields. Running
+# jobs are leased to the process executing them (owner, lease_expires_at); an expired lease means it is gone
+MIGRATIONS = [
+    """
+    CREATE TABLE jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        status TEXT NOT NULL,
+        progress INTEGER,
+        attempts INTEGER NOT NULL,
+        retry_count INTEGER NOT NULL,
+        next_attempt_at TEXT NOT NULL,
+        last_error TEXT,
+        completed_at TEXT,
+        input_path TEXT,
+        webhook_url TEXT,
+        result_json TEXT,
+        metadata_json TEXT NOT NULL,
+        audit_log_json TEXT NOT NULL,
+        retry_spec_json TEXT,
+        owner TEXT,
+        lease_expires_at TEXT
+    );
+    CREATE INDEX idx_jobs_created_at ON jobs (created_at DESC);
+    CREATE INDEX idx_jobs_status_created_at ON jobs (status, created_at DESC);
+    CREATE INDEX idx_jobs_kind_created_at ON jobs (kind, created_at DESC);
+    CREATE INDEX idx_jobs_status_lease_expires_at ON jobs (status, lease_expires_at);
+    """,
+]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.isoformat(timespec="milliseconds")
+
+
+class JobStore:
+    """
+    Persistent job queue in sqlite; every state change is recorded in the job's audit log.
+
+    Several processes (uvicorn workers) share one store. A claimed job is leased to its
+    claimer for lease_seconds and the claimer keeps renewing the lease while the job runs;
+    only jobs whose lease ran out are requeued, so a worker starting up never takes over
+    jobs a live sibling is executing.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 60):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self.lease_seconds = lease_seconds
+        # Unique per process start, so a recycled worker reusing a pid does not inherit leases
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._migrate()
+
+    def _migrate(self):
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, applied_at TEXT NOT NULL)"
+            )
+            # Every uvicorn worker opens the store at startup; the write lock makes the others wait
+            # for the first one's migrations instead of applying them a second time
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                applied = {row[0] for row in self._db.execute("SELECT version FROM schema_migrations")}
+                for version, script in enumerate(MIGRATIONS, start=1):
+                    if version in applied:
+                        continue
+                    logger.info(f"Applying job store migration {version}")
+                    # executescript would commit the open transaction first, so statements run one by one
+                    for statement in script.split(";"):
+                        if statement.strip():
+                            self._db.execute(statement)
+                    self._db.execute(
+                        "INSERT INTO schema_migrations (version, applied_at) VALUES (?, ?)",
+                        (version, _timestamp(_now())),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def create(
+        self,
+        kind: str,
+        summary: str,
+        metadata: dict,
+        input_path: Optional[str] = None,
+        webhook_url: Optional[str] = None,
+        retry_spec: Optional[dict] = None,
+    ) -> dict:
+        job_id = uuid.uuid4().hex
+        now = _timestamp(_now())
+        audit_log = [{"at": now, "event": "created"}]
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (job_id, kind, summary, created_at, updated_at, status, progress, attempts, "
+                "retry_count, next_attempt_at, input_path, webhook_url, metadata_json, audit_log_json, retry_spec_json) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, 0, 0, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, kind, summary, now, now, QUEUED, now, input_path, webhook_url,
+                    json.dumps(metadata), json.dumps(audit_log), json.dumps(retry_spec or DEFAULT_RETRY_SPEC),
+                ),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> list[dict]:
+        with self._lock:
+            if status:
+                rows = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+                ).fetchall()
+            else:
+                rows = self._db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _lease_expiry(self, now: datetime) -> str:
+        return _timestamp(now + timedelta(seconds=self.lease_seconds))
+
+    def claim_next(self) -> Optional[dict]:
+        """Atomically move the oldest due queued job to running, leased to this process"""
+        moment = _now()
+        now = _timestamp(moment)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT job_id FROM jobs WHERE status = ? AND next_attempt_at <= ? ORDER BY created_at LIMIT 1",
+                    (QUEUED, now),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, lease_expires_at = ?, "
+                    "updated_at = ? WHERE job_id = ?",
+                    (RUNNING, self.owner, self._lease_expiry(moment), now, row[0]),
+                )
+                self._append_audit(row[0], {"at": now, "event": "started", "owner": self.owner})
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(row[0])
+
+    def renew_leases(self, job_ids: Iterable[str]) -> set[str]:
+        """Extend the leases of running jobs this process owns; returns the ids it no longer owns"""
+        expires = self._lease_expiry(_now())
+        lost = set()
+        with self._lock:
+            for job_id in job_ids:
+                cursor = self._db.execute(
+                    "UPDATE jobs SET lease_expires_at = ? WHERE job_id = ? AND status = ? AND owner = ?",
+                    (expires, job_id, RUNNING, self.owner),
+                )
+                if cursor.rowcount == 0:
+                    lost.add(job_id)
+        return lost
+
+    def update_progress(self, job_id: str, progress: int):
+        with self._lock:
+            # Only while running here, so a late write never touches a finished or requeued job
+            self._db.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE job_id = ? AND status = ? AND owner = ?",
+                (max(0, min(100, progress)), _timestamp(_now()), job_id, RUNNING, self.owner),
+            )
+
+    def complete(self, job_id: str, result: Any) -> Optional[dict]:
+        """Mark an owned job succeeded; None when its lease was lost to another process"""
+        now = _timestamp(_now())
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, progress = 100, result_json = ?, last_error = NULL, owner = NULL, "
+                "lease_expires_at = NULL, completed_at = ?, updated_at = ? WHERE job_id = ? AND status = ? AND owner = ?",
+                (SUCCEEDED, json.dumps(result, ensure_ascii=False), now, now, job_id, RUNNING, self.owner),
+            )
+            if cursor.rowcount == 0:
+                return None
+            self._append_audit(job_id, {"at": now, "event": "succeeded"})
+        return self.get(job_id)
+
+    def fail(self, job_id: str, error: str) -> Optional[dict]:
+        """
+        Record a failed attempt of an owned job; requeue with exponential backoff while
+        attempts remain. None when its lease was lost to another process.
+        """
+        job = self.get(job_id)
+        spec = job["retry_spec"] or DEFAULT_RETRY_SPEC
+        now = _now()
+        with self._lock:
+            if job["attempts"] < spec.get("max_attempts", 1):
+                delay = spec.get("backoff_seconds", 30) * spec.get("backoff_multiplier", 2.0) ** (job["attempts"] - 1)
+                next_attempt = _timestamp(now + timedelta(seconds=delay))
+                cursor = self._db.execute(
+                    "UPDATE jobs SET status = ?, retry_count = retry_count + 1, last_error = ?, owner = NULL, "
+                    "lease_expires_at = NULL, next_attempt_at = ?, updated_at = ? WHERE job_id = ? AND status = ? AND owner = ?",
+                    (QUEUED, error, next_attempt, _timestamp(now), job_id, RUNNING, self.owner),
+                )
+                entry = {"at": _timestamp(now), "event": "retry_scheduled", "error": error, "next_attempt_at": next_attempt}
+            else:
+                cursor = self._db.execute(
+                    "UPDATE jobs SET status = ?, last_error = ?, owner = NULL, lease_expires_at = NULL, "
+                    "completed_at = ?, updated_at = ? WHERE job_id = ? AND status = ? AND owner = ?",
+                    (FAILED, error, _timestamp(now), _timestamp(now), job_id, RUNNING, self.owner),
+                )
+                entry = {"at": _timestamp(now), "event": "failed", "error": error}
+            if cursor.rowcount == 0:
+                return None
+            self._append_audit(job_id, entry)
+        return self.get(job_id)
+
+    def release(self, job_id: str) -> bool:
+        """Give an owned running job back to the queue right away (graceful shutdown)"""
+        now = _timestamp(_now())
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_expires_at = NULL, next_attempt_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = ? AND owner = ?",
+                (QUEUED, now, now, job_id, RUNNING, self.owner),
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._append_audit(job_id, {"at": now, "event": "released_on_shutdown", "owner": self.owner})
+        return True
+
+    def requeue_expired(self) -> int:
+        """Running jobs whose lease ran out (their process died) go back to the queue"""
+        now = _timestamp(_now())
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT job_id, owner FROM jobs WHERE status = ? AND lease_expires_at <= ?",
+                    (RUNNING, now),
+                ).fetchall()
+                for job_id, owner in rows:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, owner = NULL, lease_expires_at = NULL, next_attempt_at = ?, "
+                        "updated_at = ? WHERE job_id = ?",
+                        (QUEUED, now, now, job_id),
+                    )
+                    self._append_audit(job_id, {"at": now, "event": "requeued_after_lease_expired", "owner": owner})
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def close(self):
+        self._db.close()
+
+    def _append_audit(self, job_id: str, entry: dict):
+        # A single statement, so appends from other processes are never lost in between
+        self._db.execute(
+            "UPDATE jobs SET audit_log_json = json_insert(audit_log_json, '$[#]', json(?)) WHERE job_id = ?",
+            (json.dumps(entry), job_id),
+        )
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["metadata"] = json.loads(job.pop("metadata_json"))
+        job["audit_log"] = json.loads(job.pop("audit_log_json"))
+        result_json = job.pop("result_json")
+        job["result"] = json.loads(result_json) if result_json else None
+        retry_spec_json = job.pop("retry_spec_json")
+        job["retry_spec"] = json.loads(retry_spec_json) if retry_spec_json else None
+        return job
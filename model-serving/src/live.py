@@ -0,0 +1,183 @@
+"""
+Live audio for /ivrit/ws: incoming frames are decoded to 16 kHz float32 and cut into
+utterances at the pauses Silero VAD finds, so each utterance can be transcribed as soon
+as the speaker stops instead of when the recording ends.
+"""
+import logging
+from typing import Optional
+
+import numpy as np
+
+from audio import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("pcm_s16le", "opus")
+
+
+class FrameDecoder:
+    """
+    Decodes binary WebSocket frames to 16 kHz mono float32 samples.
+
+    pcm_s16le frames are raw little-endian 16-bit samples, mono, at sample_rate (frames may
+    split a sample). opus frames are single raw Opus packets, as produced by WebCodecs or
+    an RTP depacketizer; the decoder runs at sample_rate (48 kHz unless the client says
+    otherwise) and its output is resampled.
+    """
+
+    def __init__(self, encoding: str = "pcm_s16le", sample_rate: int = SAMPLE_RATE):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {list(ENCODINGS)}")
+        import av
+
+        self.sample_rate = sample_rate
+        self._codec = None
+        self._resampler = None
+        self._remainder = b""
+        if encoding == "opus":
+            self._codec = av.CodecContext.create("opus", "r")
+            self._codec.sample_rate = sample_rate
+        if encoding == "opus" or sample_rate != SAMPLE_RATE:
+            self._resampler = av.AudioResampler(format="flt", layout="mono", rate=SAMPLE_RATE)
+
+    def decode(self, data: bytes) -> np.ndarray:
+        import av
+
+        if self._codec is not None:
+            frames = self._codec.decode(av.Packet(data))
+        else:
+            data = self._remainder + data
+            usable = len(data) - len(data) % 2
+            self._remainder = data[usable:]
+            pcm = np.frombuffer(data[:usable], dtype="<i2")
+            if self._resampler is None:
+                return pcm.astype(np.float32) / 32768.0
+            frame = av.AudioFrame.from_ndarray(pcm.reshape(1, -1), format="s16", layout="mono")
+            frame.sample_rate = self.sample_rate
+            frames = [frame]
+        chunks = [
+            resampled.to_ndarray().reshape(-1)
+            for frame in frames
+            for resampled in self._resampler.resample(frame)
+        ]
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+
+
+class Utterance:
+    """A stretch of speech cut from the stream; start is its position in the stream, in seconds"""
+
+    def __init__(self, index: int, start: float, samples: np.ndarray):
+        self.index = index
+        self.start = start
+        self.samples = samples
+
+    @property
+    def end(self) -> float:
+        return self.start + len(self.samples) / SAMPLE_RATE
+
+
+class UtteranceSegmenter:
+    """
+    Rolling buffer of live audio, cut into utterances at pauses.
+
+    Each scan() runs VAD over the tail of the buffer only (the last step plus enough
+    context to see a full pause), so the cost per scan does not grow with the utterance.
+    Silence before speech is dropped as it arrives; speech is cut once it is followed by
+    min_silence of silence, or after max_utterance seconds without a pause. The buffer
+    therefore never holds much more than max_utterance seconds of audio.
+    """
+
+    def __init__(
+        self,
+        vad_parameters: dict,
+        min_silence_seconds: float,
+        max_utterance_seconds: float,
+        step_seconds: float,
+    ):
+        self.vad_parameters = vad_parameters
+        self.min_silence = int(min_silence_seconds * SAMPLE_RATE)
+        self.max_utterance = int(max_utterance_seconds * SAMPLE_RATE)
+        self.step = max(1, int(step_seconds * SAMPLE_RATE))
+        # Enough audio to see a whole pause after the last scan, plus a second of context for VAD
+        self.window = self.min_silence + self.step + SAMPLE_RATE
+        self._buffer = np.zeros(self.max_utterance + self.window, dtype=np.float32)
+        self._length = 0  # Samples in _buffer
+        self._offset = 0  # Stream position of _buffer[0], in samples
+        self._unscanned = 0
+        self._speech_start: Optional[int] = None  # Buffer positions of the utterance in progress
+        self._speech_end: Optional[int] = None
+        self.utterances = 0
+
+    @property
+    def duration(self) -> float:
+        """Seconds of audio received so far"""
+        return (self._offset + self._length) / SAMPLE_RATE
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._buffer.nbytes
+
+    def append(self, samples: np.ndarray) -> bool:
+        """Add audio; True once enough arrived since the last scan that the next one is due"""
+        needed = self._length + len(samples)
+        if needed > len(self._buffer):
+            grown = np.zeros(max(needed, 2 * len(self._buffer)), dtype=np.float32)
+            grown[:self._length] = self._buffer[:self._length]
+            self._buffer = grown
+        self._buffer[self._length:needed] = samples
+        self._length = needed
+        self._unscanned += len(samples)
+        return self._unscanned >= self.step
+
+    def scan(self, final: bool = False) -> Optional[Utterance]:
+        """Run VAD over the new audio and return the utterance it completed, if any; final flushes the rest"""
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        self._unscanned = 0
+        window_start = max(0, self._length - self.window)
+        if self._length > window_start:
+            speech = get_speech_timestamps(
+                self._buffer[window_start:self._length], VadOptions(**self.vad_parameters)
+            )
+            if speech:
+                if self._speech_start is None:
+                    self._speech_start = window_start + speech[0]["start"]
+                self._speech_end = window_start + speech[-1]["end"]
+
+        if self._speech_start is None:
+            # Nothing said yet: keep only the context the next scan needs
+            self._discard(max(0, self._length - self.window))
+            return None
+        if final:
+            return self._cut(self._speech_start, self._length)
+        if self._length - self._speech_end >= self.min_silence:
+            return self._cut(self._speech_start, self._speech_end)
+        if self._length - self._speech_start >= self.max_utterance:
+            return self._cut(self._speech_start, self._length)
+        return None
+
+    def partial(self) -> Optional[Utterance]:
+        """A copy of the utterance still in progress, for a partial hypothesis"""
+        if self._speech_start is None:
+            return None
+        return Utterance(
+            self.utterances,
+            (self._offset + self._speech_start) / SAMPLE_RATE,
+            self._buffer[self._speech_start:self._length].copy(),
+        )
+
+    def _cut(self, start: int, end: int) -> Utterance:
+        utterance = Utterance(self.utterances, (self._offset + start) / SAMPLE_RATE, self._buffer[start:end].copy())
+        self.utterances += 1
+        self._speech_start = self._speech_end = None
+        self._discard(end)
+        return utterance
+
+    def _discard(self, count: int):
+        """Drop the first count samples of the buffer"""
+        if count <= 0:
+            return
+        remaining = self._length - count
+        self._buffer[:remaining] = self._buffer[count:self._length]
+        self._length = remaining
+        self._offset += count
@@ -1,41 +1,89 @@
+import time
+from startup import process_uptime, startup_profile
+
+# Everything before this line: interpreter start-up and site-packages
+startup_profile.record("interpreter", process_uptime() or 0.0)
+imports_started = time.perf_counter()
+
+import asyncio
+import importlib
 import os
+import signal
+import threading
 from fastapi import FastAPI
-import faster_whisper
 import logging
 from contextlib import asynccontextmanager
-from config import AppSettings
-from routers import ivrit
-from routers import gemini
+from admission import get_admission_control
+from config import SettingsDep, get_settings, handle_reload_signal
+from metrics import PROCESS_RSS, register_collector, render
+from model_host import get_model_host
+from model_registry import current_rss_bytes
+from audio import get_audio_cache
+from body_limit import BodyLimitMiddleware, body_limits
+import downloads
+import gemini_files
+import result_cache
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+startup_profile.record("imports", time.perf_counter() - imports_started)
+
+with startup_profile.phase("settings"):
+    settings = get_settings()
 # Set up logging
-logging.basicConfig(level=AppSettings().log_level)
+logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger(__name__)
 
+# Only the enabled routers are imported, so their dependencies stay off the startup path otherwise
+routers = {}
+for router_name in settings.enabled_routers:
+    with startup_profile.phase(f"routers.{router_name}"):
+        routers[router_name] = importlib.import_module(f"routers.{router_name}")
+ivrit = routers.get("ivrit")
+gemini = routers.get("gemini")
+jobs = routers.get("jobs")
 
-class LargeFileMiddleware(BaseHTTPMiddleware):
-    """Middleware to handle large file uploads"""
-    
-    async def dispatch(self, request: Request, call_next):
-        # Set larger limits for multipart form data
-        if request.method == "POST" and "multipart/form-data" in request.headers.get("content-type", ""):
-            # Increase the maximum size for multipart requests
-            request.scope["max_content_size"] = 200 * 1024 * 1024  # 200MB
-        
-        response = await call_next(request)
-        return response
+
+def collect_metrics():
+    """Mirror process state into gauges before a /metrics scrape; routers register their own"""
+    PROCESS_RSS.set(current_rss_bytes())
+
+
+register_collector(collect_metrics)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager for the FastAPI application"""    
+    with startup_profile.phase("lifespan"):
+        if ivrit is not None and get_settings().preload_models:
+            # Workers load and warm up their models in the background; /ready flips once they are done
+            logger.info("Preloading models...")
+            ivrit.start_preload()
+        if gemini is not None:
+            gemini.start()
+        if jobs is not None:
+            jobs.start()
+        if threading.current_thread() is threading.main_thread():
+            # kill -HUP on a worker (not the uvicorn supervisor, which restarts its workers) re-reads .env
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, handle_reload_signal)
+    startup_profile.mark_serving()
+    logger.info(f"Startup: {startup_profile.summary()}")
     
     yield
     
     # Cleanup code (if needed)
     logger.info("Shutting down...")
+    if jobs is not None:
+        await jobs.stop()
+    if gemini is not None:
+        await gemini.stop()
+    if ivrit is not None and ivrit.pool is not None:
+        ivrit.pool.shutdown()
+    # Only what this worker created; the getters would create caches and clients just to close them
+    result_cache.close_result_cache()
+    gemini_files.close_file_cache()
+    await downloads.close_url_fetcher()
 
 app = FastAPI(
     title="Whisper Speech-to-Text API",
@@ -45,8 +93,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add middleware for large file uploads
-app.add_middleware(LargeFileMiddleware)
+# Reject oversized request bodies while they stream in, before multipart parsing spools them
+default_body_limit, route_body_limits = body_limits(settings)
+app.add_middleware(BodyLimitMiddleware, default_limit=default_body_limit, limits=route_body_limits)
 
 # Configure CORS
 app.add_middleware(
@@ -57,10 +106,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Set file size limits for FastAPI
-app.state.max_file_size = 200 * 1024 * 1024  # 200MB
-app.state.max_part_size = 100 * 1024 * 1024  # 100MB
-
 
 @app.get("/")
 async def root():
@@ -68,6 +113,30 @@ async def root():
     return {"message": "Model Server is running"}
 
 
+@app.get("/live", tags=["Health"])
+async def live():
+    """Liveness probe: the process is up and the event loop is responsive"""
+    return {"status": "alive"}
+
+
+@app.get("/ready", tags=["Health"])
+async def ready():
+    """Readiness probe: models are loaded and warmed up, so the container can take traffic"""
+    admission = get_admission_control().stats()
+    if ivrit is None:
+        return {"status": "ready", "admission": admission}
+    ivrit_ready, stats = await ivrit.readiness()
+    if not ivrit_ready:
+        return JSONResponse(status_code=503, content={"status": "not ready", "ivrit": stats, "admission": admission})
+    return {"status": "ready", "ivrit": stats, "admission": admission}
+
+
+@app.get("/startup", tags=["Health"])
+async def get_startup():
+    """Where this worker's cold start went: interpreter, imports, routers, lifespan and model load, in seconds"""
+    return {"enabled_routers": list(routers), **startup_profile.report()}
+
+
 @app.get(
     "/env",
     summary="Get environment variables",
@@ -75,12 +144,45 @@ async def root():
     response_description="A dictionary containing all environment variables",
     tags=["Health"],
 )
-def get_env():
-    return {"env": dict(os.environ), "settings": AppSettings().model_dump()}
+def get_env(settings: SettingsDep):
+    return {"env": dict(os.environ), "settings": settings.model_dump()}
+
+@app.get(
+    "/cache",
+    summary="Get result cache statistics",
+    description=(
+        "Returns hit/miss counters and sizes of the result, Gemini file, decoded audio and URL download "
+        "caches; a cache this worker has not used yet is left out"
+    ),
+    tags=["Health"],
+)
+def get_cache_stats():
+    stats = {}
+    if result_cache.result_cache is not None:
+        stats.update(result_cache.result_cache.stats())
+    if gemini_files.file_cache is not None:
+        stats["gemini_files"] = gemini_files.file_cache.stats()
+    stats["decoded_audio"] = get_audio_cache().stats()
+    if downloads.url_fetcher is not None:
+        stats["url_downloads"] = downloads.url_fetcher.stats()
+    return stats
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus metrics: per-stage latency, queue depth and wait, real-time factor, memory.
+
+    With model hosts, inference is timed in the hosts; their series are added labelled with
+    model_host, leaving out a host that does not answer.
+    """
+    host = get_model_host() if ivrit is not None else None
+    remote = await host.metrics() if host is not None else None
+    text = await run_in_threadpool(render, remote)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Include routers
-app.include_router(ivrit.router)
-app.include_router(gemini.router)
+for module in routers.values():
+    app.include_router(module.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+# Prometheus text exposition without an extra dependency. Values are per process: with
+# several uvicorn workers each one serves its own /metrics, and a worker in front of model
+# hosts adds their series (where inference actually runs) labelled with model_host.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+RATIO_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict = {}
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    bucket_labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+_registry: list[_Metric] = []
+# Callbacks refreshing gauges that mirror other components' state right before a scrape
+_collectors: list[Callable[[], None]] = []
+
+
+def register_collector(collector: Callable[[], None]):
+    _collectors.append(collector)
+
+
+def snapshot() -> dict[str, list[str]]:
+    """Sample lines of every metric by name, for a model host to hand to the worker scraping it"""
+    for collector in _collectors:
+        collector()
+    return {metric.name: metric.samples() for metric in _registry}
+
+
+def _with_label(line: str, label: str) -> str:
+    name, brace, rest = line.partition("{")
+    if brace and " " not in name:
+        return f"{name}{{{label},{rest}"
+    name, _, value = line.partition(" ")
+    return f"{name}{{{label}}} {value}"
+
+
+def render(remote: Optional[dict[str, dict[str, list[str]]]] = None) -> str:
+    """
+    The exposition of this process, followed in each family by the samples of the remote
+    processes in remote (snapshot() results by model host), labelled model_host="<name>"
+    """
+    local = snapshot()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.header())
+        lines.extend(local[metric.name])
+        for host, samples in (remote or {}).items():
+            label = f'model_host="{_escape(host)}"'
+            lines.extend(_with_label(line, label) for line in samples.get(metric.name, ()))
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "model_server_stage_seconds", "Wall time per request processing stage", ("router", "stage", "model")
+)
+REALTIME_FACTOR = Histogram(
+    "model_server_realtime_factor", "Audio seconds processed per wall second", ("router", "model"), RATIO_BUCKETS
+)
+IN_FLIGHT = Gauge("model_server_requests_in_flight", "Inference requests currently being handled", ("router",))
+BYTES_INGESTED = Counter("model_server_bytes_ingested_total", "Upload bytes accepted", ("router",))
+QUEUE_DEPTH = Gauge("model_server_queue_depth", "Jobs waiting for an inference worker", ("pool",))
+QUEUE_WAIT = Histogram("model_server_queue_wait_seconds", "Time jobs waited for an inference worker", ("pool",))
+MODEL_LOAD_SECONDS = Gauge("model_server_model_load_seconds", "Time the resident model took to load", ("model", "compute_type"))
+MODEL_RESIDENT_BYTES = Gauge("model_server_model_resident_bytes", "Estimated memory of resident models")
+PROCESS_RSS = Gauge("process_resident_memory_bytes", "Resident memory size in bytes")
+
+
+@contextmanager
+def stage(router: str, name: str, model: str = "") -> Iterator[None]:
+    """Time a processing stage into model_server_stage_seconds"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, router=router, stage=name, model=model)
+
+
+@contextmanager
+def in_flight(router: str) -> Iterator[None]:
+    """Count a request in model_server_requests_in_flight while it is being handled"""
+    IN_FLIGHT.inc(router=router)
+    try:
+        yield
+    finally:
+        IN_FLIGHT.dec(router=router)
+
+
+def observe_realtime_factor(router: str, model: str, audio_seconds: Optional[float], wall_seconds: float):
+    if audio_seconds and wall_seconds > 0:
+        REALTIME_FACTOR.observe(audio_seconds / wall_seconds, router=router, model=model)
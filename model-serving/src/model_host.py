@@ -0,0 +1,389 @@
+"""
+Model host: one process owns the Whisper models, uvicorn workers forward audio to it.
+
+With `uvicorn --workers N` every worker would otherwise load its own copy of each
+model, so RAM rather than CPU caps the number of HTTP workers. Instead, entrypoint.sh
+starts one (or a few) model hosts and lists their Unix sockets in model_host_sockets;
+the HTTP workers then only decode audio and forward it:
+
+    python src/model_host.py --socket /tmp/model-host-0.sock
+
+The decoded 16 kHz float32 PCM is written once to a file in shared memory (/dev/shm)
+and the host maps that file instead of receiving the samples over the socket, so the
+array is handed over without being copied through the IPC channel. Requests and
+replies are length-prefixed JSON frames, multiplexed by request id over one
+connection per worker and host.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import struct
+import tempfile
+from typing import Any, AsyncIterator, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+from admission import Admission, current_admission
+from config import get_settings, handle_reload_signal
+from inference import DeadlineUnreachableError, PoolSaturatedError
+from metrics import PROCESS_RSS, register_collector, snapshot
+from model_registry import current_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+STATUS_TIMEOUT_SECONDS = 5.0  # A host that does not answer a status request in time counts as down
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[dict]:
+    """Next frame from the stream, None once the peer closed the connection"""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+        return json.loads(await reader.readexactly(_HEADER.unpack(header)[0]))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def write_frame(writer: asyncio.StreamWriter, frame: dict):
+    # One write per frame, so frames of concurrent requests never interleave
+    body = json.dumps(frame, ensure_ascii=False).encode("utf-8")
+    writer.write(_HEADER.pack(len(body)) + body)
+
+
+def share_samples(samples: np.ndarray, directory: Optional[str]) -> str:
+    """
+    Write float32 samples to a shared memory file for the host to map.
+
+    When the shared memory directory is full (a container's /dev/shm is 64MB unless
+    shm_size is raised), the file goes to the temp dir instead: slower, but it works.
+    """
+    try:
+        return _write_samples(samples, directory)
+    except OSError as e:
+        if directory is None:
+            raise
+        logger.warning(f"Cannot write {samples.nbytes} bytes of PCM to {directory} ({e}), using the temp dir")
+        return _write_samples(samples, None)
+
+
+def _write_samples(samples: np.ndarray, directory: Optional[str]) -> str:
+    fd, path = tempfile.mkstemp(prefix="pcm-", suffix=".f32", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            np.ascontiguousarray(samples, dtype=np.float32).tofile(out)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def map_samples(path: str) -> np.ndarray:
+    """
+    Map a shared PCM file without copying it, then unlink the file.
+
+    Copy-on-write, so inference code may modify the array without touching the sender's
+    file. The mapping outlives the file and is released with the array; unlinking here
+    means the file is gone even when the sender never gets to clean up (a streaming
+    response abandoned by a disconnecting client is only finalized by the GC).
+    """
+    try:
+        if not os.path.getsize(path):
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="c")
+    finally:
+        os.unlink(path)
+
+
+def raise_error(error: dict):
+    """Re-raise an error reported by the host the way the local code path would"""
+    if error.get("retry_after") is not None:
+        error_type = DeadlineUnreachableError if error.get("deadline") else PoolSaturatedError
+        raise error_type(error["retry_after"], error["detail"])
+    if error.get("status", 500) < 500 or error.get("headers"):
+        raise HTTPException(status_code=error["status"], detail=error["detail"], headers=error.get("headers"))
+    raise RuntimeError(error["detail"])
+
+
+class _Connection:
+    """One multiplexed connection to a model host; replies are routed to per-request queues"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.in_flight = 0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._replies: dict[int, asyncio.Queue] = {}
+        self._ids = itertools.count()
+        self._connect_lock = asyncio.Lock()
+
+    async def request(self, frame: dict) -> tuple[int, asyncio.Queue]:
+        async with self._connect_lock:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+                asyncio.create_task(self._read_replies(self._reader))
+                logger.info(f"Connected to model host at {self.path}")
+        request_id = next(self._ids)
+        replies: asyncio.Queue = asyncio.Queue()
+        self._replies[request_id] = replies
+        write_frame(self._writer, {**frame, "id": request_id})
+        await self._writer.drain()
+        return request_id, replies
+
+    def finish(self, request_id: int, cancel: bool = False):
+        self._replies.pop(request_id, None)
+        if cancel and self._writer is not None and not self._writer.is_closing():
+            write_frame(self._writer, {"id": request_id, "op": "cancel"})
+
+    async def _read_replies(self, reader: asyncio.StreamReader):
+        try:
+            while (frame := await read_frame(reader)) is not None:
+                replies = self._replies.get(frame["id"])
+                if replies is not None:
+                    replies.put_nowait(frame)
+        except Exception as e:
+            logger.warning(f"Model host connection {self.path} failed: {e}")
+        finally:
+            logger.warning(f"Lost connection to model host at {self.path}")
+            if self._writer is not None:
+                self._writer.close()
+            self._reader = self._writer = None
+            lost = {"error": {"status": 500, "detail": "Lost connection to the model host"}}
+            for request_id, replies in list(self._replies.items()):
+                replies.put_nowait({**lost, "id": request_id})
+            self._replies.clear()
+
+
+class ModelHostClient:
+    """
+    Forwards inference to model host processes; used by HTTP workers.
+
+    Each request goes to the host with the fewest requests in flight from this worker.
+    Connections are opened lazily and re-opened after a host restarts.
+    """
+
+    def __init__(self, sockets: list[str], shm_dir: Optional[str] = None):
+        self._connections = [_Connection(path) for path in sockets]
+        self.shm_dir = shm_dir if shm_dir and os.path.isdir(shm_dir) else None
+
+    def _pick(self) -> _Connection:
+        return min(self._connections, key=lambda connection: connection.in_flight)
+
+    async def call(
+        self, op: str, payload: dict, samples: Optional[np.ndarray] = None, connection: Optional[_Connection] = None
+    ) -> Any:
+        """Run a request/response operation on a host (the least busy unless given) and return its result"""
+        result = None
+        async for data in self.stream(op, payload, samples, connection):
+            result = data
+        return result
+
+    async def status(self, payload: dict) -> dict[str, Any]:
+        """The status reply of every host by socket path, or the exception of a host that did not answer"""
+        replies = await asyncio.gather(
+            *(
+                asyncio.wait_for(self.call("status", payload, connection=connection), STATUS_TIMEOUT_SECONDS)
+                for connection in self._connections
+            ),
+            return_exceptions=True,
+        )
+        return {connection.path: reply for connection, reply in zip(self._connections, replies)}
+
+    async def metrics(self) -> dict[str, dict[str, list[str]]]:
+        """The metric samples of every host that answers in time, by socket path"""
+        replies = await asyncio.gather(
+            *(
+                asyncio.wait_for(self.call("metrics", {}, connection=connection), STATUS_TIMEOUT_SECONDS)
+                for connection in self._connections
+            ),
+            return_exceptions=True,
+        )
+        samples = {}
+        for connection, reply in zip(self._connections, replies):
+            if isinstance(reply, BaseException):
+                logger.warning(f"Model host {connection.path} did not return metrics: {reply!r}")
+            else:
+                samples[connection.path] = reply
+        return samples
+
+    async def stream(
+        self, op: str, payload: dict, samples: Optional[np.ndarray] = None, connection: Optional[_Connection] = None
+    ) -> AsyncIterator[Any]:
+        """Run an operation and yield everything the host sends until it is done"""
+        connection = connection or self._pick()
+        # The host queues the job by the request's priority class and checks its deadline
+        admission = current_admission.get()
+        if admission is not None:
+            payload = {**payload, "admission": admission.to_dict()}
+        path = await asyncio.to_thread(share_samples, samples, self.shm_dir) if samples is not None else None
+        connection.in_flight += 1
+        request_id = None
+        done = False
+        try:
+            try:
+                request_id, replies = await connection.request({"op": op, **payload, "pcm": path})
+            except OSError as e:
+                raise RuntimeError(f"Model host at {connection.path} is unavailable: {e}")
+            while True:
+                frame = await replies.get()
+                if "error" in frame:
+                    done = True
+                    raise_error(frame["error"])
+                if frame.get("done"):
+                    done = True
+                    return
+                yield frame["data"]
+        finally:
+            connection.in_flight -= 1
+            if request_id is not None:
+                # Stops the host's work when the consumer went away early
+                connection.finish(request_id, cancel=not done)
+            if path is not None and os.path.exists(path):
+                os.unlink(path)  # The host did not get to map it
+
+
+class ModelHostServer:
+    """Serves the ivrit inference operations over a Unix socket, in the process that owns the models"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, self.path)
+        logger.info(f"Model host listening on {self.path}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        tasks: dict[int, asyncio.Task] = {}
+        try:
+            while (frame := await read_frame(reader)) is not None:
+                if frame.get("op") == "cancel":
+                    task = tasks.get(frame["id"])
+                    if task is not None:
+                        task.cancel()
+                    continue
+                task = asyncio.create_task(self._dispatch(frame, writer))
+                tasks[frame["id"]] = task
+                task.add_done_callback(lambda _, request_id=frame["id"]: tasks.pop(request_id, None))
+        except asyncio.CancelledError:
+            pass  # Host shutting down
+        finally:
+            # The worker went away: stop everything it asked for
+            for task in list(tasks.values()):
+                task.cancel()
+            writer.close()
+
+    async def _dispatch(self, frame: dict, writer: asyncio.StreamWriter):
+        from routers import ivrit
+
+        request_id = frame["id"]
+
+        def send(reply: dict):
+            if not writer.is_closing():
+                write_frame(writer, {**reply, "id": request_id})
+
+        try:
+            samples = map_samples(frame["pcm"]) if frame.get("pcm") else None
+            model_key = tuple(frame["model_key"]) if frame.get("model_key") else None
+            current_admission.set(Admission.from_dict(frame.get("admission")))  # This task serves only this request
+            if frame["op"] == "status":
+                ready, stats = ivrit.local_readiness(frame.get("local_model"))
+                send({"data": {"ready": ready, "stats": stats}})
+            elif frame["op"] == "metrics":
+                send({"data": snapshot()})
+            elif frame["op"] == "transcribe":
+                send({"data": await ivrit.transcribe_routed(
+                    model_key, samples, frame["language"], frame["task"],
+                    word_timestamps=frame.get("word_timestamps", False),
+                )})
+            elif frame["op"] == "stream":
+                events = ivrit.local_stream(
+                    model_key, samples, frame["language"], frame["task"],
+                    word_timestamps=frame.get("word_timestamps", False),
+                )
+                send({"data": ["accepted", None]})
+                try:
+                    async for event in events:
+                        send({"data": list(event)})
+                        await writer.drain()
+                finally:
+                    await events.aclose()
+            elif frame["op"] == "profile":
+                send({"data": await asyncio.to_thread(
+                    ivrit.local_profile, frame["model_name"], frame["compute_types"], samples
+                )})
+            else:
+                raise HTTPException(status_code=400, detail=f"Unknown model host operation {frame['op']}")
+            send({"done": True})
+        except asyncio.CancelledError:
+            pass
+        except PoolSaturatedError as e:
+            send({"error": {
+                "status": 503,
+                "detail": str(e),
+                "retry_after": e.retry_after,
+                "deadline": isinstance(e, DeadlineUnreachableError),
+            }})
+        except HTTPException as e:
+            send({"error": {"status": e.status_code, "detail": e.detail, "headers": e.headers}})
+        except Exception as e:
+            logger.error(f"Model host {frame.get('op')} failed: {e}")
+            send({"error": {"status": 500, "detail": str(e)}})
+
+
+# Client for the configured model hosts, None when models are served in-process
+model_host: Optional[ModelHostClient] = None
+
+
+def get_model_host() -> Optional[ModelHostClient]:
+    global model_host
+    settings = get_settings()
+    if model_host is None and settings.model_host_sockets:
+        model_host = ModelHostClient(settings.model_host_sockets, settings.model_host_shm_dir)
+    return model_host
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Whisper models to uvicorn workers over a Unix socket")
+    parser.add_argument("--socket", required=True, help="Unix socket path to listen on")
+    args = parser.parse_args()
+
+    # This process runs inference itself, it must not forward to other hosts
+    os.environ["MODEL_HOST_SOCKETS"] = "[]"
+    settings = get_settings()
+    logging.basicConfig(level=settings.log_level)
+
+    from routers import ivrit
+
+    register_collector(lambda: PROCESS_RSS.set(current_rss_bytes()))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        server = asyncio.create_task(ModelHostServer(args.socket).serve())
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, server.cancel)
+        # Picks up .env changes without reloading the models
+        loop.add_signal_handler(signal.SIGHUP, handle_reload_signal)
+        if settings.preload_models:
+            ivrit.start_preload()
+        try:
+            await server
+        except asyncio.CancelledError:
+            logger.info("Model host shutting down")
+        finally:
+            if ivrit.pool is not None:
+                ivrit.pool.shutdown()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+ModelKey = tuple[str, str]  # (model name, compute_type)
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process, 0 when /proc is not available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _Resident:
+    def __init__(self):
+        self.model: Any = None
+        self.size = 0
+        self.refs = 0
+        self.error: Optional[BaseException] = None
+        self.loaded = threading.Event()
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+
+
+class ModelRegistry:
+    """
+    Loaded models keyed by (name, compute_type), kept in LRU order under a RAM budget.
+
+    Each model is loaded at most once, even when several threads ask for it at the same
+    time: the first caller loads, the others wait for it. Before a load, least recently
+    used models that are not checked out are evicted until the new one fits the budget.
+    Model sizes are measured as the RSS growth during the load; until a model has been
+    loaded once its size is assumed to be default_size_bytes.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str, str], Any],
+        memory_budget_bytes: int,
+        default_size_bytes: int,
+    ):
+        self._loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.default_size_bytes = default_size_bytes
+        self._models: "OrderedDict[ModelKey, _Resident]" = OrderedDict()
+        self._known_sizes: dict[ModelKey, int] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.evictions = 0
+
+    @contextmanager
+    def acquire(self, name: str, compute_type: str) -> Iterator[Any]:
+        """Check out a model, loading it if needed; it cannot be evicted while checked out"""
+        key = (name, compute_type)
+        entry = self._checkout(key)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.refs -= 1
+
+    def preload(self, name: str, compute_type: str, warmup: Optional[Callable[[Any], None]] = None):
+        """Load a model ahead of traffic and optionally prime it"""
+        with self.acquire(name, compute_type) as model:
+            if warmup is None:
+                return
+            started = time.monotonic()
+            warmup(model)
+            warmup_seconds = time.monotonic() - started
+            logger.info(f"Model {name} ({compute_type}) warmed up in {warmup_seconds:.2f}s")
+            with self._lock:
+                self._models[(name, compute_type)].warmup_seconds = warmup_seconds
+
+    def key_of(self, model: Any) -> Optional[ModelKey]:
+        """Registry key of a loaded model instance, e.g. for labelling metrics"""
+        with self._lock:
+            for key, entry in self._models.items():
+                if entry.model is model:
+                    return key
+        return None
+
+    def is_loaded(self, name: str, compute_type: str) -> bool:
+        entry = self._models.get((name, compute_type))
+        return entry is not None and entry.model is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = [
+                {
+                    "name": name,
+                    "compute_type": compute_type,
+                    "loaded": entry.model is not None,
+                    "size_mb": round(entry.size / (1024 * 1024), 1),
+                    "in_use": entry.refs,
+                    "load_seconds": round(entry.load_seconds, 3) if entry.load_seconds is not None else None,
+                    "warmup_seconds": round(entry.warmup_seconds, 3) if entry.warmup_seconds is not None else None,
+                }
+                for (name, compute_type), entry in self._models.items()
+            ]
+            resident = sum(entry.size for entry in self._models.values())
+        return {
+            "models": models,
+            "resident_mb": round(resident / (1024 * 1024), 1),
+            "memory_budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 1),
+            "evictions": self.evictions,
+        }
+
+    def _checkout(self, key: ModelKey) -> _Resident:
+        with self._lock:
+            entry = self._models.get(key)
+            owner = entry is None
+            if owner:
+                entry = _Resident()
+                self._models[key] = entry
+            entry.refs += 1
+            self._models.move_to_end(key)
+
+        if owner:
+            try:
+                self._load(key, entry)
+            except BaseException as e:
+                with self._lock:
+                    entry.refs -= 1
+                    self._models.pop(key, None)
+                entry.error = e
+                raise
+            finally:
+                entry.loaded.set()
+        else:
+            entry.loaded.wait()
+            if entry.error is not None:
+                with self._lock:
+                    entry.refs -= 1
+                raise RuntimeError(f"Model {key[0]} ({key[1]}) failed to load: {entry.error}")
+        return entry
+
+    def _load(self, key: ModelKey, entry: _Resident):
+        name, compute_type = key
+        # Loads are serialized so the RSS delta can be attributed to this model
+        with self._load_lock:
+            self._make_room(key, self._known_sizes.get(key, self.default_size_bytes))
+            logger.info(f"Loading model {name} ({compute_type})")
+            rss_before = current_rss_bytes()
+            started = time.monotonic()
+            model = self._loader(name, compute_type)
+            load_seconds = time.monotonic() - started
+            measured = current_rss_bytes() - rss_before
+            size = measured if measured > 0 else self._known_sizes.get(key, self.default_size_bytes)
+            self._known_sizes[key] = size
+        with self._lock:
+            entry.model = model
+            entry.size = size
+            entry.load_seconds = load_seconds
+        logger.info(f"Model {name} ({compute_type}) loaded in {load_seconds:.2f}s, ~{size / (1024 * 1024):.0f}MB")
+
+    def _make_room(self, key: ModelKey, needed: int):
+        evicted = False
+        with self._lock:
+            resident = sum(entry.size for entry in self._models.values())
+            for candidate_key in list(self._models):
+                if resident + needed <= self.memory_budget_bytes:
+                    break
+                candidate = self._models[candidate_key]
+                if candidate_key == key or candidate.refs > 0 or candidate.model is None:
+                    continue
+                logger.info(f"Evicting model {candidate_key[0]} ({candidate_key[1]}) to stay within memory budget")
+                del self._models[candidate_key]
+                resident -= candidate.size
+                self.evictions += 1
+                evicted = True
+            if resident + needed > self.memory_budget_bytes:
+                logger.warning(
+                    f"Loading {key[0]} ({key[1]}) exceeds the model memory budget, all resident models are in use"
+                )
+        if evicted:
+            gc.collect()
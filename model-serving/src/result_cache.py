@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(namespace: str, **params: Any) -> str:
+    """Build a content-addressed cache key from a namespace and the parameters that affect the result"""
+    payload = json.dumps({"namespace": namespace, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for inference results.
+
+    The memory tier is an LRU bounded by entry count. The optional disk tier is a sqlite
+    table bounded by total payload bytes (least recently used rows are evicted first).
+    Both tiers expire entries after ttl_seconds. Values must be JSON serializable.
+
+    get and set are called from the event loop: the memory tier is looked up there, while
+    every sqlite read, write and eviction runs on the threadpool under its own lock, so a
+    slow disk never stalls the other requests of the worker.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: int = 7 * 24 * 3600,
+        disk_path: Optional[str] = None,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()  # Memory tier and counters, only ever held briefly
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed_at ON results(accessed_at)")
+            self._db.commit()
+            logger.info(f"Result cache disk tier at {disk_path}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        if self._db is not None:
+            value = await run_in_threadpool(self._get_disk, key, now)
+            if value is not None:
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self._db is not None:
+            await run_in_threadpool(self._set_disk, key, value, now)
+
+    def _get_disk(self, key: str, now: float) -> Optional[Any]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                return None
+            self._db.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        value = json.loads(row[0])
+        with self._lock:
+            self._remember(key, row[1], value)
+            self.hits += 1
+            self.disk_hits += 1
+        return value
+
+    def _set_disk(self, key: str, value: Any, now: float):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._evict_disk(now)
+            self._db.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self._db is not None:
+            with self._db_lock:
+                rows, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            stats.update({"disk_entries": rows, "disk_bytes": size, "max_disk_bytes": self.max_disk_bytes})
+        return stats
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, stored_at: float, value: Any):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        self._db.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        while total > self.max_disk_bytes:
+            row = self._db.execute("SELECT key, size FROM results ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM results WHERE key = ?", (row[0],))
+            total -= row[1]
+
+
+# Global result cache, shared by all routers
+result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    global result_cache
+    if result_cache is None:
+        settings = get_settings()
+        result_cache = ResultCache(
+            max_entries=settings.result_cache_entries,
+            ttl_seconds=settings.result_cache_ttl_seconds,
+            disk_path=settings.result_cache_path,
+            max_disk_bytes=settings.result_cache_max_disk_bytes,
+        )
+    return result_cache
+
+
+def close_result_cache():
+    global result_cache
+    if result_cache is not None:
+        result_cache.close()
+        result_cache = None
@@ -1,13 +1,29 @@
+import asyncio
+import hashlib
 import logging
-from google import genai
-from google.genai.types import UploadFileConfig
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-import tempfile
+import httpx
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Request, Response
+from fastapi.responses import StreamingResponse
 import os
+import time
 import mimetypes
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+from starlette.concurrency import run_in_threadpool
 from starlette.formparsers import MultiPartParser
 
-from config import AppSettings
+from admission import Admission, PrioritySemaphore, current_admission, get_admission_control, scheduled
+from audio import encode_opus, prepare_audio
+from config import SettingsDep, get_settings
+from gemini_files import get_file_cache
+from result_cache import get_result_cache, make_key
+from metrics import STAGE_SECONDS, in_flight, stage
+from startup import startup_profile
+from streaming import STREAM_HEADERS, STREAM_MEDIA_TYPES, format_event
+from uploads import ingest_upload, link_or_copy, spool_upload
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai.types import Part
 
 router = APIRouter(
     prefix="/gemini",
@@ -20,28 +36,381 @@ logger = logging.getLogger(__name__)
 MultiPartParser.max_file_size = 200 * 1024 * 1024  # 200MB
 MultiPartParser.max_part_size = 100 * 1024 * 1024  # 100MB
 
+DEFAULT_PROMPT = "Translate this audio clip in hebrew. Note there are two people in it, and transcribe the conversation in detail in hebrew."
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Errors the API answers a generation with when a referenced file was deleted or has expired
+STALE_FILE_CODES = (403, 404)
+
+# Process-wide Gemini client (created on first use) and upstream concurrency limit (created in the lifespan)
+client: Optional["genai.Client"] = None
+semaphore: Optional[PrioritySemaphore] = None
+
+
+def start():
+    """Set up the upstream concurrency limit; the client itself is created by the first request"""
+    global semaphore
+    settings = get_settings()
+    # Free slots go to interactive requests before batch ones
+    semaphore = PrioritySemaphore(settings.gemini_max_concurrency)
+    logger.info(f"Gemini router ready, up to {settings.gemini_max_concurrency} concurrent upstream calls")
+
+
+async def stop():
+    """Close the client's pooled upstream connections and drop it"""
+    global client, semaphore
+    if client is not None:
+        aclose = getattr(client.aio, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        else:
+            # google-genai releases before AsyncClient.aclose() only expose the httpx client
+            await client.aio._api_client._async_httpx_client.aclose()
+    client = None
+    semaphore = None
+
+
+def create_client() -> Optional["genai.Client"]:
+    """
+    Create the shared Gemini client; its async httpx transport keeps connections alive between calls.
+
+    google-genai and its pydantic models take a while to import, so this happens on the
+    first Gemini request rather than at startup.
+    """
+    with startup_profile.phase("import google.genai"):
+        from google import genai
+        from google.genai.types import HttpOptions
+
+    settings = get_settings()
+    limits = httpx.Limits(
+        max_connections=settings.gemini_max_connections,
+        max_keepalive_connections=settings.gemini_max_connections,
+    )
+    try:
+        with startup_profile.phase("gemini_client"):
+            return genai.Client(
+                api_key=settings.gemini_api or None,  # None falls back to GOOGLE_API_KEY
+                http_options=HttpOptions(
+                    base_url=settings.gemini_base_url,
+                    timeout=settings.gemini_timeout_seconds * 1000,
+                    async_client_args={"limits": limits},
+                ),
+            )
+    except ValueError as e:
+        # No API key: the rest of the server still works, Gemini requests get a 503
+        logger.warning(f"Gemini client not configured: {e}")
+        return None
+
+
+def get_client() -> "genai.Client":
+    global client
+    if semaphore is None:
+        start()
+    if client is None:
+        client = create_client()
+        if client is None:
+            raise HTTPException(status_code=503, detail="Gemini API key is not configured")
+    return client
+
+
+def account_fingerprint() -> str:
+    """Files are only visible to the key that uploaded them, so cached handles are scoped per key"""
+    settings = get_settings()
+    return hashlib.sha256(f"{settings.gemini_base_url}|{settings.gemini_api}".encode("utf-8")).hexdigest()[:16]
+
+
+# Uploads in progress, so concurrent requests for the same media share a single upload
+pending_uploads: dict[tuple[str, str, str], asyncio.Future] = {}
+
+
+def use_opus(mime_type: Optional[str], opus: Optional[bool]) -> bool:
+    """Whether an upload is re-encoded as Opus; only audio is, by default per gemini_upload_opus"""
+    if opus is None:
+        opus = get_settings().gemini_upload_opus
+    return opus and bool(mime_type) and mime_type.startswith("audio/")
+
+
+def file_key(sha256: str, mime_type: Optional[str], opus: bool) -> tuple[str, str, str]:
+    """File cache key; Opus re-encodes are cached separately from the original media"""
+    if opus:
+        return account_fingerprint(), f"{sha256}:opus:{get_settings().gemini_opus_bitrate}", "audio/ogg"
+    return account_fingerprint(), sha256, mime_type or ""
+
+
+async def upload_file(
+    path: str, mime_type: Optional[str], local_model: str, sha256: Optional[str], opus: bool
+):
+    """Upload a file to Gemini, optionally as a compact Opus re-encode of its audio"""
+    from google.genai.types import UploadFileConfig
+
+    encoded = None
+    try:
+        if opus:
+            settings = get_settings()
+            # Shares the decoded audio with the transcription paths when the same content was seen there
+            prepared = await run_in_threadpool(prepare_audio, path, sha256, False, False, "gemini")
+            with stage("gemini", "opus_encode", local_model):
+                encoded = await run_in_threadpool(
+                    encode_opus, prepared.samples, settings.gemini_opus_bitrate, settings.upload_spool_dir
+                )
+            path, mime_type = encoded, "audio/ogg"
+        aio = get_client().aio
+        async with semaphore:
+            with stage("gemini", "gemini_upload", local_model):
+                return await aio.files.upload(file=path, config=UploadFileConfig(mime_type=mime_type))
+    finally:
+        if encoded is not None:
+            os.unlink(encoded)
+
+
+async def upload_and_remember(path: str, mime_type: Optional[str], local_model: str, sha256: str, opus: bool) -> "Part":
+    """Upload a file and remember the handle for later prompts on the same content"""
+    from google.genai.types import Part
+
+    myfile = await upload_file(path, mime_type, local_model, sha256, opus)
+    expires_at = myfile.expiration_time.timestamp() if myfile.expiration_time else None
+    await run_in_threadpool(
+        lambda: get_file_cache().set(
+            *file_key(sha256, mime_type, opus), myfile.name, myfile.uri, myfile.size_bytes or 0, expires_at
+        )
+    )
+    return Part.from_uri(file_uri=myfile.uri, mime_type=myfile.mime_type)
+
+
+async def upload_shared(path: str, mime_type: Optional[str], local_model: str, sha256: str, opus: bool) -> "Part":
+    """upload_and_remember for an upload other requests may wait on; it owns path and deletes it when done"""
+    try:
+        return await upload_and_remember(path, mime_type, local_model, sha256, opus)
+    finally:
+        await run_in_threadpool(os.unlink, path)
+
+
+async def own_input(path: str) -> str:
+    """A copy of path for a shared upload, linked off the loop; removed again if the caller is cancelled meanwhile"""
+    linking = asyncio.ensure_future(run_in_threadpool(link_or_copy, path))
+    try:
+        return await asyncio.shield(linking)
+    except asyncio.CancelledError:
+        linking.add_done_callback(lambda f: f.cancelled() or f.exception() or os.unlink(f.result()))
+        raise
+
+
+async def gemini_file(
+    path: str, mime_type: Optional[str], local_model: str, sha256: Optional[str], opus: bool = False
+) -> tuple["Part", bool]:
+    """
+    Reference the file's content on Gemini's side, uploading it only when needed.
+
+    Returns:
+        The part to pass as content, and whether it came from the file cache
+    """
+    from google.genai.types import Part
+
+    if sha256 is None:
+        myfile = await upload_file(path, mime_type, local_model, None, opus)
+        return Part.from_uri(file_uri=myfile.uri, mime_type=myfile.mime_type), False
+
+    key = file_key(sha256, mime_type, opus)
+    handle = await run_in_threadpool(lambda: get_file_cache().get(*key))
+    if handle is not None:
+        logger.info(f"Reusing Gemini file {handle['name']} for {sha256[:12]}")
+        return Part.from_uri(file_uri=handle["uri"], mime_type=handle["mime_type"] or None), True
+
+    upload = pending_uploads.get(key)
+    if upload is None:
+        # The upload outlives this request, whose spool file is deleted when it ends, so it gets its own
+        owned = await own_input(path)
+        upload = pending_uploads.get(key)  # Another request may have started it meanwhile
+        if upload is None:
+            upload = asyncio.ensure_future(upload_shared(owned, mime_type, local_model, sha256, opus))
+            pending_uploads[key] = upload
+            upload.add_done_callback(lambda _: pending_uploads.pop(key, None))
+        else:
+            await run_in_threadpool(os.unlink, owned)
+    # Shielded: a client disconnecting must not cancel an upload other requests are waiting for
+    return await asyncio.shield(upload), False
+
+
+async def generate_content(local_model: str, contents: list):
+    aio = get_client().aio
+    async with semaphore:
+        with stage("gemini", "gemini_generate", local_model):
+            return await aio.models.generate_content(model=local_model, contents=contents)
+
+
+async def generate(
+    path: str,
+    mime_type: Optional[str],
+    prompt: str,
+    local_model: str,
+    sha256: Optional[str] = None,
+    opus: Optional[bool] = None,
+) -> dict:
+    """
+    Run the prompt against a file with Gemini, without blocking the event loop.
+
+    With the content's sha256 the upload is skipped when the same media (and mime type)
+    was uploaded before and the remote file has not expired yet. With opus, audio is
+    uploaded re-encoded as Opus instead of the original file.
+    """
+    from google.genai import errors
+
+    opus = use_opus(mime_type, opus)
+    myfile, cached = await gemini_file(path, mime_type, local_model, sha256, opus)
+    try:
+        generated = await generate_content(local_model, [prompt, myfile])
+    except errors.ClientError as e:
+        if not cached or e.code not in STALE_FILE_CODES:
+            raise
+        # The remote file went away before its recorded expiry (e.g. deleted): upload it again
+        logger.warning(f"Cached Gemini file rejected ({e.code}), uploading again")
+        await run_in_threadpool(lambda: get_file_cache().discard(*file_key(sha256, mime_type, opus)))
+        myfile, _ = await gemini_file(path, mime_type, local_model, sha256, opus)
+        generated = await generate_content(local_model, [prompt, myfile])
+
+    return {
+        "text": generated.text
+    }
+
+
+async def open_stream(local_model: str, contents: list):
+    """
+    Start a streamed generation under the concurrency limit and wait for its first chunk.
+
+    The semaphore slot stays taken while the stream is consumed; the caller releases it.
+    Returns the first chunk (None for an empty stream) and the iterator over the rest.
+    """
+    aio = get_client().aio
+    await semaphore.acquire()
+    try:
+        chunks = await aio.models.generate_content_stream(model=local_model, contents=contents)
+        return await anext(chunks, None), chunks
+    except BaseException:
+        semaphore.release()
+        raise
+
+
+def usage_to_dict(usage) -> Optional[dict]:
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_token_count,
+        "output_tokens": usage.candidates_token_count,
+        "thoughts_tokens": usage.thoughts_token_count,
+        "cached_tokens": usage.cached_content_token_count,
+        "total_tokens": usage.total_token_count,
+    }
+
+
+async def generate_stream(
+    path: str,
+    mime_type: Optional[str],
+    prompt: str,
+    local_model: str,
+    sha256: Optional[str] = None,
+    opus: Optional[bool] = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Run the prompt with streamed generation, yielding (event, data) pairs.
+
+    One 'delta' event per chunk of text as it arrives, then a 'summary' event with the
+    full text, token usage and timing (upload, time to first token, total).
+    """
+    from google.genai import errors
+
+    started = time.monotonic()
+    opus = use_opus(mime_type, opus)
+    myfile, cached = await gemini_file(path, mime_type, local_model, sha256, opus)
+    uploaded = time.monotonic()
+    try:
+        chunk, chunks = await open_stream(local_model, [prompt, myfile])
+    except errors.ClientError as e:
+        if not cached or e.code not in STALE_FILE_CODES:
+            raise
+        logger.warning(f"Cached Gemini file rejected ({e.code}), uploading again")
+        await run_in_threadpool(lambda: get_file_cache().discard(*file_key(sha256, mime_type, opus)))
+        myfile, _ = await gemini_file(path, mime_type, local_model, sha256, opus)
+        uploaded = time.monotonic()
+        chunk, chunks = await open_stream(local_model, [prompt, myfile])
+    first_token = time.monotonic()
+    STAGE_SECONDS.observe(first_token - uploaded, router="gemini", stage="gemini_first_token", model=local_model)
+
+    text_parts = []
+    usage = None
+    finish_reason = None
+    model_version = None
+    try:
+        while chunk is not None:
+            usage = chunk.usage_metadata or usage
+            model_version = chunk.model_version or model_version
+            if chunk.candidates and chunk.candidates[0].finish_reason:
+                finish_reason = chunk.candidates[0].finish_reason
+            if chunk.text:
+                text_parts.append(chunk.text)
+                yield "delta", {"text": chunk.text}
+            chunk = await anext(chunks, None)
+    finally:
+        semaphore.release()
+        await chunks.aclose()
+        STAGE_SECONDS.observe(time.monotonic() - uploaded, router="gemini", stage="gemini_generate", model=local_model)
+
+    finished = time.monotonic()
+    yield "summary", {
+        "text": "".join(text_parts),
+        "model": local_model,
+        "model_version": model_version,
+        "finish_reason": getattr(finish_reason, "value", finish_reason),
+        "usage": usage_to_dict(usage),
+        "timing": {
+            "upload_seconds": round(uploaded - started, 3),
+            "time_to_first_token_seconds": round(first_token - started, 3),
+            "generation_seconds": round(finished - uploaded, 3),
+            "total_seconds": round(finished - started, 3),
+        },
+        "cached": False,
+    }
+
+
+def result_cache_key(sha256: str, mime_type: Optional[str], prompt: str, local_model: str, opus: bool = False) -> str:
+    # The Opus bitrate changes what Gemini hears, so results at another bitrate are not reused
+    opus_bitrate = get_settings().gemini_opus_bitrate if opus else None
+    return make_key(
+        "gemini", sha256=sha256, mime_type=mime_type, prompt=prompt, model=local_model, opus=opus, opus_bitrate=opus_bitrate
+    )
+
+
 @router.post("/test-upload")
 async def test_upload(file: UploadFile = File(...)):
     """Test endpoint to verify file upload limits"""
     try:
-        content = await file.read()
-        file_size = len(content)
+        upload = await ingest_upload(file, router="gemini")
+        file_size = upload.size
         return {
             "filename": file.filename,
             "size_bytes": file_size,
             "size_mb": round(file_size / (1024 * 1024), 2),
             "content_type": file.content_type,
+            "sha256": upload.sha256,
             "status": "success"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
 
 @router.post("/execute")
 async def execute(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...),
-    prompt: str = Form("Translate this audio clip in hebrew. Note there are two people in it, and transcribe the conversation in detail in hebrew."),
+    prompt: str = Form(DEFAULT_PROMPT),
     mime_type: str = Form(default=None),    
     local_model: str = Form(default=None),    
+    no_cache: bool = Form(default=False),
+    stream: bool = Form(default=False),
+    stream_format: str = Form(default="sse"),
+    opus: Optional[bool] = Form(default=None),
+    priority: Optional[str] = Form(default=None),
 ):
     """
     Execute Gemini model inference on an uploaded file with a custom prompt.
@@ -58,10 +427,20 @@ async def execute(
                                   will be guessed from the filename.
         local_model (str, optional): The Gemini model to use. 
                                    Defaults to "gemini-2.5-flash".
+        no_cache (bool, optional): Skip the result cache lookup and always call Gemini.
+        stream (bool, optional): Relay the response as it is generated instead of waiting for all of it.
+        stream_format (str, optional): 'sse' for Server-Sent Events or 'ndjson' for newline-delimited JSON.
+        opus (bool, optional): Upload audio re-encoded as 16 kHz mono Opus, typically a tenth of
+                               the original size. Defaults to the gemini_upload_opus setting.
+        priority (str, optional): 'interactive' or 'batch'; batch calls wait while interactive
+                                  ones need the upstream slots. Defaults to X-Priority or the
+                                  admission_default_priority setting.
     
     Returns:
         dict: A dictionary containing the model's response text.
               Format: {"text": "model_response"}
+        With stream=true: one 'delta' event ({"text": ...}) per chunk as it arrives, then a
+        'summary' event with the full text, token usage and timing, or an 'error' event.
     
     Raises:
         HTTPException: If there's an error processing the file or calling the Gemini API.
@@ -86,48 +465,53 @@ async def execute(
              -F "file=@/path/to/your/audio.mp3"
         ```
     """
-    # Validate file size (200MB limit)
-    MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB
-    
     logger.info(f"Received file upload request: {file.filename}")
+    if stream and stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"stream_format must be one of {list(STREAM_MEDIA_TYPES)}")
     logger.info(f"Content-Type: {file.content_type}")
     logger.info(f"File size: {file.size if hasattr(file, 'size') else 'unknown'}")
     
     if not local_model:
-        local_model = "gemini-2.5-flash"
+        local_model = DEFAULT_MODEL
     if not mime_type:
         logger.info(f"No mime_type provided, attempting to guess from filename: {file.filename}")
         mime_type, _ = mimetypes.guess_type(file.filename)
-    client = genai.Client(api_key=AppSettings().gemini_api)
     file_extension = os.path.splitext(file.filename)[1]
     logger.info(f"Processing file: {file.filename} with model: {local_model} and mime_type: {mime_type}")
     logger.info(f"Using prompt: {prompt}")
     
-    temp_file_path = None
+    admission = get_admission_control().acquire(request, priority)
+    upload = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            logger.info(f"Writing temporary file to: {temp_file.name}")
-            content = await file.read()
-            
-            # Check file size
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=413, 
-                    detail=f"File size ({len(content)} bytes) exceeds maximum allowed size of {MAX_FILE_SIZE} bytes"
-                )
-            
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # Streams the upload to disk in chunks, rejecting it as soon as it crosses the size limit
+        upload = await spool_upload(file, suffix=file_extension, router="gemini")
 
-        myfile = client.files.upload(file=temp_file_path, config=UploadFileConfig(mime_type=mime_type))
+        cache = get_result_cache()
+        opus = use_opus(mime_type, opus)
+        cache_key = result_cache_key(upload.sha256, mime_type, prompt, local_model, opus)
+        cached = None
+        if no_cache:
+            cache.record_bypass()
+        else:
+            cached = await cache.get(cache_key)
+        response.headers["X-Cache"] = "HIT" if cached is not None else "MISS"
+        if stream:
+            stream_response = StreamingResponse(
+                stream_events(upload, mime_type, prompt, local_model, opus, cache_key, cached, stream_format, admission),
+                media_type=STREAM_MEDIA_TYPES[stream_format],
+                headers={**STREAM_HEADERS, "X-Cache": response.headers["X-Cache"]},
+            )
+            # The stream owns the spool file and the admission from here on
+            upload = admission = None
+            return stream_response
+        if cached is not None:
+            logger.info(f"Returning cached Gemini response for {file.filename}")
+            return cached
 
-        response = client.models.generate_content(
-            model=local_model, contents=[prompt, myfile]
-        )
-
-        return {
-            "text": response.text
-        }
+        with scheduled(admission), in_flight("gemini"):
+            result = await generate(upload.path, mime_type, prompt, local_model, upload.sha256, opus)
+        await cache.set(cache_key, result)
+        return result
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
@@ -136,9 +520,177 @@ async def execute(
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
     finally:
         # Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.info(f"Cleaned up temporary file: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up temporary file {temp_file_path}: {e}")
+        if upload is not None:
+            upload.close()
+        if admission is not None:
+            admission.release()
+
+
+async def stream_events(
+    upload,
+    mime_type: Optional[str],
+    prompt: str,
+    local_model: str,
+    opus: bool,
+    cache_key: str,
+    cached: Optional[dict],
+    stream_format: str,
+    admission: Admission,
+) -> AsyncIterator[str]:
+    """Response body of a streamed /gemini/execute; closes the spool file and releases the admission when done"""
+    # The body runs in the request's own task, so this does not leak into other requests
+    current_admission.set(admission)
+    try:
+        if cached is not None:
+            yield format_event("delta", {"text": cached["text"]}, stream_format)
+            yield format_event("summary", {**cached, "model": local_model, "cached": True}, stream_format)
+            return
+        with in_flight("gemini"):
+            async for event, data in generate_stream(upload.path, mime_type, prompt, local_model, upload.sha256, opus):
+                if event == "summary":
+                    await get_result_cache().set(cache_key, {"text": data["text"]})
+                yield format_event(event, data, stream_format)
+        logger.info(f"Streamed Gemini response for {upload.filename}")
+    except Exception as e:
+        logger.error(f"Streaming Gemini error: {e}")
+        yield format_event("error", {"detail": f"Error processing file: {str(e)}"}, stream_format)
+    finally:
+        upload.close()
+        admission.release()
+
+
+@router.post("/batch")
+async def execute_batch(
+    request: Request,
+    settings: SettingsDep,
+    files: list[UploadFile] = File(...),
+    prompts: list[str] = Form(default=[DEFAULT_PROMPT]),
+    mime_type: str = Form(default=None),
+    local_model: str = Form(default=None),
+    no_cache: bool = Form(default=False),
+    stream: bool = Form(default=False),
+    stream_format: str = Form(default="sse"),
+    opus: Optional[bool] = Form(default=None),
+    priority: Optional[str] = Form(default=None),
+):
+    """
+    Run several prompts against one file, or one prompt against several files, in one call.
+
+    Every file is uploaded to Gemini once and each (file, prompt) pair becomes one
+    generate_content call. The calls run concurrently, limited by gemini_max_concurrency,
+    so the whole batch takes about as long as its slowest prompt.
+
+    Args:
+        files (list[UploadFile]): One or more files (repeat the 'files' form field).
+        prompts (list[str], optional): One or more prompts (repeat the 'prompts' form field).
+                                       Every prompt runs against every file.
+        mime_type (str, optional): MIME type of all files. Guessed per filename if not provided.
+        local_model (str, optional): The Gemini model to use. Defaults to "gemini-2.5-flash".
+        no_cache (bool, optional): Skip the result cache lookup and always call Gemini.
+        stream (bool, optional): Stream each result as soon as it completes.
+        stream_format (str, optional): 'sse' for Server-Sent Events or 'ndjson' for newline-delimited JSON.
+        opus (bool, optional): Upload audio re-encoded as Opus, see /gemini/execute.
+        priority (str, optional): 'interactive' or 'batch', see /gemini/execute.
+
+    Returns:
+        {"results": [...]} with one entry per (file, prompt) pair, in request order:
+        {"index", "filename", "prompt", "text", "cached"}, or "error" instead of "text" when
+        that pair failed. When streaming, each entry is sent as a 'result' event in completion
+        order, followed by a 'summary' event.
+
+    Example:
+        ```bash
+        curl -X POST "http://localhost:8000/gemini/batch" \
+             -F "files=@/path/to/your/audio.mp3" \
+             -F "prompts=Transcribe the conversation in hebrew" \
+             -F "prompts=Summarize the conversation" \
+             -F "prompts=List the action items"
+        ```
+    """
+    if stream and stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"stream_format must be one of {list(STREAM_MEDIA_TYPES)}")
+    if len(files) * len(prompts) > settings.gemini_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch runs at most {settings.gemini_batch_max_items} (file, prompt) pairs, got {len(files) * len(prompts)}",
+        )
+    if not local_model:
+        local_model = DEFAULT_MODEL
+    logger.info(f"Received Gemini batch request: {len(files)} file(s) x {len(prompts)} prompt(s) with model {local_model}")
+
+    admission = get_admission_control().acquire(request, priority)
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(await spool_upload(file, suffix=os.path.splitext(file.filename)[1], router="gemini"))
+    except BaseException:
+        for upload in uploads:
+            upload.close()
+        admission.release()
+        raise
+
+    items = [
+        (upload, mime_type or mimetypes.guess_type(upload.filename)[0], prompt)
+        for upload in uploads
+        for prompt in prompts
+    ]
+    cache = get_result_cache()
+
+    async def run_item(index: int, upload, item_mime_type: Optional[str], prompt: str) -> dict:
+        entry = {"index": index, "filename": upload.filename, "prompt": prompt}
+        item_opus = use_opus(item_mime_type, opus)
+        cache_key = result_cache_key(upload.sha256, item_mime_type, prompt, local_model, item_opus)
+        cached = None
+        if no_cache:
+            cache.record_bypass()
+        else:
+            cached = await cache.get(cache_key)
+        if cached is not None:
+            return {**entry, **cached, "cached": True}
+        try:
+            # Pairs sharing a file wait on the same upload (see gemini_file)
+            result = await generate(upload.path, item_mime_type, prompt, local_model, upload.sha256, item_opus)
+        except Exception as e:
+            logger.error(f"Batch item {index} ({upload.filename}) failed: {e}")
+            return {**entry, "error": str(e), "cached": False}
+        await cache.set(cache_key, result)
+        return {**entry, **result, "cached": False}
+
+    def close_uploads():
+        for upload in uploads:
+            upload.close()
+        admission.release()
+
+    started = time.monotonic()
+    if not stream:
+        try:
+            with scheduled(admission), in_flight("gemini"):
+                results = await asyncio.gather(*(run_item(index, *item) for index, item in enumerate(items)))
+        finally:
+            close_uploads()
+        return {"results": results, "elapsed_seconds": round(time.monotonic() - started, 3)}
+
+    async def body():
+        # The body runs in the request's own task; the item tasks inherit the admission from it
+        current_admission.set(admission)
+        tasks = [asyncio.ensure_future(run_item(index, *item)) for index, item in enumerate(items)]
+        failed = 0
+        try:
+            with in_flight("gemini"):
+                for completed in asyncio.as_completed(tasks):
+                    result = await completed
+                    failed += "error" in result
+                    yield format_event("result", result, stream_format)
+            yield format_event("summary", {
+                "count": len(tasks),
+                "failed": failed,
+                "elapsed_seconds": round(time.monotonic() - started, 3),
+            }, stream_format)
+        finally:
+            # The client may disconnect mid-batch; stop the remaining calls
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            close_uploads()
+
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES[stream_format], headers=STREAM_HEADERS)
@@ -1,11 +1,38 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from typing import Optional
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
+from typing import BinaryIO, Optional, Union
 import tempfile
 import os
+import json
+import asyncio
+import gc
 import logging
-import requests
-from fastapi.responses import JSONResponse
-import faster_whisper
+import threading
+import time
+from fastapi import Response
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+import bisect
+import numpy as np
+
+from admission import admit, get_admission_control, scheduled
+from config import get_settings
+from cpus import available_cpus, cpus_per_process
+from downloads import get_url_fetcher
+from audio import SAMPLE_RATE, prepare_audio, preprocessing_options, shift_segment
+from batching import MicroBatcher
+from chunking import audio_duration, split_at_silence
+from inference import DeadlineUnreachableError, InferencePool, PoolSaturatedError
+from live import FrameDecoder, Utterance, UtteranceSegmenter
+from metrics import (
+    MODEL_LOAD_SECONDS, MODEL_RESIDENT_BYTES, QUEUE_DEPTH, in_flight, observe_realtime_factor, register_collector, stage,
+)
+from model_host import get_model_host
+from model_registry import ModelKey, ModelRegistry, current_rss_bytes
+from formats import SUBTITLE_MEDIA_TYPES, check_output_format, render, subtitle_cue
+from streaming import STREAM_HEADERS, STREAM_MEDIA_TYPES, format_event
+from result_cache import get_result_cache, make_key
+from startup import startup_profile
+from uploads import ingest_upload, spool_upload
 
 router = APIRouter(
     prefix="/ivrit",
@@ -15,53 +42,824 @@ router = APIRouter(
 logger = logging.getLogger(__name__)
 
 
-# Global model variable
-model = None
-model_name = None
+compute_types = {"int8", "int8_float32", "int8_float16", "int8_bfloat16", "int16", "float16", "bfloat16", "float32"}
+
+# Global inference pool; workers check models out of the registry per job
+pool: Optional[InferencePool] = None
+registry: Optional[ModelRegistry] = None
+batcher: Optional[MicroBatcher] = None
+preload_thread: Optional[threading.Thread] = None
+preload_error: Optional[Exception] = None
+live_streams = 0  # Open /ivrit/ws connections in this process
+profile_lock = threading.Lock()
+
+
+def collect_metrics():
+    """Mirror pool and model state into gauges before a scrape, in whichever process runs the models"""
+    if pool is not None:
+        QUEUE_DEPTH.set(pool.stats()["queue_depth"], pool=pool.name)
+    if registry is not None:
+        stats = registry.stats()
+        for model in stats["models"]:
+            if model["load_seconds"] is not None:
+                MODEL_LOAD_SECONDS.set(model["load_seconds"], model=model["name"], compute_type=model["compute_type"])
+        MODEL_RESIDENT_BYTES.set(stats["resident_mb"] * 1024 * 1024)
+
+
+register_collector(collect_metrics)
+
+
+def decode_options() -> dict:
+    """Beam search options for every transcribe call"""
+    settings = get_settings()
+    return {"beam_size": settings.ivrit_beam_size, "best_of": settings.ivrit_best_of}
+
+
+def vad_parameters() -> dict:
+    return dict(min_silence_duration_ms=get_settings().ivrit_vad_min_silence_ms)
+
+
+def execution_options() -> dict:
+    """
+    Device and threading for a model load.
+
+    num_workers replicas of the model run concurrently, each with cpu_threads threads.
+    Unless set explicitly, the threads are this process's share of the CPU quota (split
+    across uvicorn workers) divided by the replicas, so the host is not oversubscribed.
+    """
+    settings = get_settings()
+    num_workers = settings.ivrit_num_workers or settings.ivrit_workers
+    cpu_threads = settings.ivrit_cpu_threads or max(1, cpus_per_process(settings.web_concurrency) // num_workers)
+    return {"device": settings.ivrit_device, "cpu_threads": cpu_threads, "num_workers": num_workers}
 
 
-def load_model():
-    global model
-    global model_name
+def load_model(name: str, compute_type: str):
     logger.info("Starting model loading process...")
     try:    
-        logger.info("Loading Whisper model...")
+        # faster-whisper pulls in CTranslate2 and tokenizers; importing it on first use
+        # keeps it off the startup path, and out of workers that forward to a model host
+        with startup_profile.phase("import faster_whisper"):
+            import faster_whisper
+
+        options = execution_options()
+        logger.info(
+            f"Loading Whisper model {name} ({compute_type}) on {options['device']}, "
+            f"{options['num_workers']} worker(s) x {options['cpu_threads']} thread(s)..."
+        )
         model = faster_whisper.WhisperModel(
-            "ivrit-ai/whisper-large-v3-turbo-ct2",
-            device="cpu",  # Change to "cuda" if you have GPU
-            compute_type="int8"  # Options: int8, int16, float16, float32
+            name,
+            compute_type=compute_type,  # Options: int8, int16, float16, float32
+            **options
         )
-        model_name = "ivrit-ai/whisper-large-v3-turbo-ct2"
-        logger.info(f"Model {model_name} loaded successfully!")
+        logger.info(f"Model {name} loaded successfully!")
+        return model
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
         raise e
 
+
+def warm_up(model):
+    """Run a short synthetic clip through the model so CTranslate2 kernels and buffers are primed"""
+    sample_rate = 16000
+    audio = np.random.default_rng(0).normal(0, 0.01, int(sample_rate * get_settings().warmup_audio_seconds))
+    segments, _ = model.transcribe(
+        audio.astype(np.float32),
+        vad_filter=False,  # VAD would drop the noise and skip the decoder
+        **decode_options()
+    )
+    for _ in segments:
+        pass
+
+
+def get_registry() -> ModelRegistry:
+    global registry
+    if registry is None:
+        settings = get_settings()
+        registry = ModelRegistry(
+            load_model,
+            memory_budget_bytes=settings.model_memory_budget_mb * 1024 * 1024,
+            default_size_bytes=settings.model_default_size_mb * 1024 * 1024,
+        )
+    return registry
+
+
+def resolve_model(local_model: Optional[str] = None, compute_type: Optional[str] = None) -> ModelKey:
+    """Map a model alias (or full name) and compute_type to a registry key, 400 if not allowed"""
+    settings = get_settings()
+    local_model = local_model or settings.ivrit_default_model
+    compute_type = compute_type or settings.ivrit_compute_type
+    if local_model in settings.ivrit_models:
+        name = settings.ivrit_models[local_model]
+    elif local_model in settings.ivrit_models.values():
+        name = local_model
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown model '{local_model}', available: {sorted(settings.ivrit_models)}"
+        )
+    if compute_type not in compute_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown compute_type '{compute_type}', available: {sorted(compute_types)}"
+        )
+    return name, compute_type
+
+
+def with_model(model_key: ModelKey, fn):
+    """Wrap fn(model, ...) as a pool job that checks the model out of the registry while it runs"""
+    def job(*args):
+        with get_registry().acquire(*model_key) as model:
+            return fn(model, *args)
+    return job
+
+
+def get_pool() -> InferencePool:
+    """Return the inference pool, starting its workers on first use"""
+    global pool
+    if pool is None:
+        settings = get_settings()
+        pool = InferencePool(
+            workers=settings.ivrit_workers,
+            max_queue=settings.ivrit_queue_size,
+            name="ivrit",
+            batch_queue_share=settings.ivrit_batch_queue_share,
+        )
+        pool.start()
+    return pool
+
+
+def get_batcher() -> MicroBatcher:
+    """Micro-batcher in front of the pool; batches share a (model, task, word_timestamps) group"""
+    global batcher
+    if batcher is None:
+        settings = get_settings()
+        batcher = MicroBatcher(
+            get_pool(),
+            lambda group_key, items: with_model(group_key[0], transcribe_batch)(items, *group_key[1:]),
+            max_batch=settings.ivrit_batch_max_size,
+            max_wait=settings.ivrit_batch_max_wait_ms / 1000,
+        )
+    return batcher
+
+
+def start_preload():
+    """Load and warm up the default model in the background"""
+    global preload_thread
+    if get_model_host() is not None:
+        # The model host loads the models
+        return
+    get_pool()
+    if preload_thread is not None:
+        return
+    settings = get_settings()
+    model_key = resolve_model()
+
+    def preload():
+        global preload_error
+        try:
+            with startup_profile.phase("model_load"):
+                get_registry().preload(*model_key, warmup=warm_up if settings.warmup_models else None)
+            logger.info(f"Startup: {startup_profile.summary()}")
+        except Exception as e:
+            logger.error(f"Failed to preload model {model_key[0]}: {e}")
+            preload_error = e
+
+    preload_thread = threading.Thread(target=preload, name="ivrit-preload", daemon=True)
+    preload_thread.start()
+
+
+async def readiness(local_model: Optional[str] = None) -> tuple[bool, dict]:
+    """
+    Whether the given (default) model is loaded and warm, asking the model hosts when there
+    are any: every configured host must answer and be ready, since requests go to all of them.
+    """
+    host = get_model_host()
+    if host is None:
+        return local_readiness(local_model)
+    resolve_model(local_model)
+    ready = True
+    stats: dict = {}
+    hosts = {}
+    for path, status in (await host.status({"local_model": local_model})).items():
+        if isinstance(status, BaseException):
+            ready = False
+            hosts[path] = f"unavailable: {status!r}"
+            continue
+        ready = ready and status["ready"]
+        hosts[path] = "ready" if status["ready"] else "loading"
+        stats = stats or status["stats"]
+    return ready, {**stats, "model_hosts": hosts}
+
+
+def local_readiness(local_model: Optional[str] = None) -> tuple[bool, dict]:
+    """
+    Whether the given (default) model is loaded and warm in this process, plus pool and registry stats.
+
+    Without preload_models nothing loads until the first request, which loads the model
+    itself, so the process is ready as soon as it is up.
+    """
+    model_key = resolve_model(local_model)
+    lazy = local_model is None and preload_thread is None and not get_settings().preload_models
+    warm = preload_thread is not None and not preload_thread.is_alive()
+    if local_model is not None:
+        warm = True
+    ready = lazy or (warm and get_registry().is_loaded(*model_key))
+    stats = {
+        "model_name": model_key[0],
+        "compute_type": model_key[1],
+        "preload": "disabled" if lazy else "enabled",
+        "queue": get_pool().stats(),
+        "models": get_registry().stats(),
+    }
+    if batcher is not None:
+        stats["batching"] = batcher.stats()
+    return ready, stats
+
+
+async def run_inference(model_key: ModelKey, fn, cost: Optional[float] = None):
+    """
+    Run fn(model) over cost seconds of audio on the inference pool.
+
+    A full queue raises PoolSaturatedError, which HTTP endpoints map to 503 + Retry-After
+    and the live and background paths wait out.
+    """
+    return await get_pool().submit(with_model(model_key, fn), cost)
+
+
+def segment_to_dict(segment) -> dict:
+    data = {
+        "start": segment.start,
+        "end": segment.end,
+        "text": segment.text.strip(),
+        "confidence": getattr(segment, 'avg_logprob', None)
+    }
+    words = getattr(segment, 'words', None)
+    if words:
+        data["words"] = [
+            {"start": word.start, "end": word.end, "word": word.word, "probability": word.probability}
+            for word in words
+        ]
+    return data
+
+
+def info_to_dict(info) -> dict:
+    return {
+        "language": info.language,
+        "language_probability": info.language_probability,
+        "duration": info.duration,
+        "duration_after_vad": getattr(info, 'duration_after_vad', None),
+    }
+
+
+def model_label(local_model) -> str:
+    key = get_registry().key_of(local_model)
+    return key[0] if key else ""
+
+
+def transcribe_segments(
+    local_model,
+    audio: Union[str, BinaryIO, np.ndarray],
+    language: Optional[str],
+    task: str,
+    word_timestamps: bool = False,
+):
+    """Start a transcription; returns faster-whisper's lazy segment generator and info"""
+    logger.debug("Starting transcription process")
+    # transcribe() decodes the audio, runs VAD and detects the language before returning
+    with stage("ivrit", "decode_vad", model_label(local_model)):
+        return local_model.transcribe(
+            audio,
+            language=language,
+            task=task,
+            vad_filter=True,  # Voice activity detection
+            vad_parameters=vad_parameters(),
+            word_timestamps=word_timestamps,
+            **decode_options()
+        )
+
+
+def transcribe_file(
+    local_model,
+    audio: Union[str, BinaryIO, np.ndarray],
+    language: Optional[str],
+    task: str,
+    word_timestamps: bool = False,
+) -> dict:
+    """Transcribe a file and collect the segments; runs on an inference worker thread"""
+    started = time.perf_counter()
+    label = model_label(local_model)
+    segments, info = transcribe_segments(local_model, audio, language, task, word_timestamps)
+
+    # Collect results; the segment generator runs the decoder as it is consumed
+    logger.debug("Processing transcription results")
+    with stage("ivrit", "inference", label):
+        transcription_segments = [segment_to_dict(segment) for segment in segments]
+    observe_realtime_factor("ivrit", label, info.duration, time.perf_counter() - started)
+
+    return {
+        "language": info.language,
+        "language_probability": info.language_probability,
+        "duration": info.duration,
+        "full_text": " ".join(segment["text"] for segment in transcription_segments),
+        "segments": transcription_segments,
+    }
+
+
+def transcribe_upload(
+    local_model,
+    audio: Union[str, BinaryIO],
+    sha256: Optional[str],
+    language: Optional[str],
+    task: str,
+    word_timestamps: bool = False,
+) -> dict:
+    """Decode (or reuse the decoded) audio once and transcribe it; runs on an inference worker thread"""
+    prepared = prepare_audio(audio, sha256)
+    return prepared.rebase(transcribe_file(local_model, prepared.samples, language, task, word_timestamps))
+
+
+class BatchItem:
+    """One request's audio waiting for a micro-batch"""
+
+    def __init__(self, audio: Union[str, BinaryIO], language: Optional[str], sha256: Optional[str] = None):
+        self.audio = audio
+        self.language = language
+        self.sha256 = sha256
+
+
+def transcribe_batch(local_model, items: list[BatchItem], task: str, word_timestamps: bool = False) -> list:
+    """
+    Transcribe several short clips with one batched decode; runs on an inference worker thread.
+
+    BatchedInferencePipeline batches the VAD chunks of a single audio array, so the clips of
+    each language are laid end to end and passed as clip_timestamps built from each clip's
+    own VAD chunks. Chunks never cross clip boundaries, so every segment maps back to
+    exactly one clip. Clips longer than one Whisper window take the regular path.
+    """
+    from faster_whisper import BatchedInferencePipeline
+    from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+
+    sample_rate = SAMPLE_RATE
+    settings = get_settings()
+    started = time.perf_counter()
+    label = model_label(local_model)
+    vad_options = VadOptions(**vad_parameters(), max_speech_duration_s=30)
+    results: list = [None] * len(items)
+    prepared = [None] * len(items)
+    groups: dict[str, list[tuple[int, np.ndarray, float]]] = {}
+
+    for index, item in enumerate(items):
+        try:
+            prepared[index] = prepare_audio(item.audio, item.sha256)
+            audio = prepared[index].samples
+            if len(audio) > settings.ivrit_batch_max_audio_seconds * sample_rate:
+                results[index] = prepared[index].rebase(
+                    transcribe_file(local_model, audio, item.language, task, word_timestamps)
+                )
+                continue
+            if item.language:
+                language, probability = item.language, 1.0
+            else:
+                language, probability, _ = local_model.detect_language(audio)
+            groups.setdefault(language, []).append((index, audio, probability))
+        except Exception as e:
+            results[index] = e
+
+    pipeline = BatchedInferencePipeline(local_model)
+    for language, clips in groups.items():
+        offsets = []
+        clip_timestamps = []
+        position = 0
+        for index, audio, _ in clips:
+            offsets.append(position)
+            with stage("ivrit", "vad", label):
+                speech = merge_segments(get_speech_timestamps(audio, vad_options), vad_options)
+            clip_timestamps.extend(
+                {"start": chunk["start"] + position, "end": chunk["end"] + position} for chunk in speech
+            )
+            position += len(audio)
+        collected = {index: [] for index, _, _ in clips}
+        if clip_timestamps:
+            with stage("ivrit", "batch_inference", label):
+                segments, _ = pipeline.transcribe(
+                    np.concatenate([audio for _, audio, _ in clips]),
+                    language=language,
+                    task=task,
+                    clip_timestamps=clip_timestamps,
+                    batch_size=settings.ivrit_batch_max_size,
+                    word_timestamps=word_timestamps,
+                    **decode_options()
+                )
+                segments = list(segments)
+            for segment in segments:
+                slot = bisect.bisect_right(offsets, int(segment.start * sample_rate)) - 1
+                offset = offsets[slot] / sample_rate
+                collected[clips[slot][0]].append(shift_segment(segment_to_dict(segment), -offset))
+        for index, audio, probability in clips:
+            transcription_segments = collected[index]
+            results[index] = prepared[index].rebase({
+                "language": language,
+                "language_probability": probability,
+                "duration": len(audio) / sample_rate,
+                "full_text": " ".join(segment["text"] for segment in transcription_segments),
+                "segments": transcription_segments,
+            })
+    decoded_seconds = sum(len(audio) for clips in groups.values() for _, audio, _ in clips) / sample_rate
+    observe_realtime_factor("ivrit", label, decoded_seconds, time.perf_counter() - started)
+    return results
+
+
+def prepare_long_audio(local_model, audio: Union[str, BinaryIO], sha256: Optional[str], language: Optional[str]):
+    """Decode once, find silence-aligned chunk bounds and fix the language for all chunks"""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    sample_rate = SAMPLE_RATE
+    label = model_label(local_model)
+    prepared = prepare_audio(audio, sha256)
+    decoded = prepared.samples
+    with stage("ivrit", "vad", label):
+        speech = get_speech_timestamps(decoded, VadOptions(**vad_parameters()))
+    bounds = split_at_silence(speech, len(decoded), int(get_settings().ivrit_chunk_seconds * sample_rate))
+    probability = 1.0
+    if not language:
+        language, probability, _ = local_model.detect_language(
+            decoded, vad_filter=True, vad_parameters=vad_parameters()
+        )
+    return prepared, bounds, language, probability
+
+
+async def transcribe_long(
+    model_key: ModelKey,
+    audio: Union[str, BinaryIO],
+    language: Optional[str],
+    task: str,
+    sha256: Optional[str] = None,
+    word_timestamps: bool = False,
+) -> dict:
+    """
+    Transcribe a long recording as silence-aligned chunks spread across the inference workers.
+
+    Chunks are fed to the pool no faster than it has workers, so one long file does not
+    fill the queue for everyone else; segment timestamps are rebased onto the full file.
+    """
+    sample_rate = SAMPLE_RATE
+    started = time.perf_counter()
+    prepared, bounds, language, probability = await run_inference(
+        model_key, lambda worker_model: prepare_long_audio(worker_model, audio, sha256, language)
+    )
+    decoded = prepared.samples
+    logger.info(f"Long audio ({len(decoded) / sample_rate:.0f}s) split into {len(bounds)} chunks")
+    inference_pool = get_pool()
+    slots = asyncio.Semaphore(inference_pool.workers)
+
+    async def run_chunk(start: int, end: int) -> list:
+        async with slots:
+            while True:
+                try:
+                    result = await inference_pool.submit(with_model(
+                        model_key,
+                        lambda worker_model: transcribe_file(
+                            worker_model, decoded[start:end], language, task, word_timestamps
+                        )
+                    ), (end - start) / sample_rate)
+                    break
+                except DeadlineUnreachableError:
+                    raise
+                except PoolSaturatedError as e:
+                    # Already admitted; wait for room instead of failing the whole file
+                    await asyncio.sleep(min(e.retry_after, 5))
+        return [shift_segment(segment, start / sample_rate) for segment in result["segments"]]
+
+    chunk_segments = await asyncio.gather(*(run_chunk(start, end) for start, end in bounds))
+    transcription_segments = [segment for segments in chunk_segments for segment in segments]
+    observe_realtime_factor("ivrit_long", model_key[0], len(decoded) / sample_rate, time.perf_counter() - started)
+    return prepared.rebase({
+        "language": language,
+        "language_probability": probability,
+        "duration": len(decoded) / sample_rate,
+        "full_text": " ".join(segment["text"] for segment in transcription_segments),
+        "segments": transcription_segments,
+    })
+
+
+def stream_file(
+    local_model,
+    audio: Union[str, BinaryIO],
+    language: Optional[str],
+    task: str,
+    emit,
+    sha256: Optional[str] = None,
+    word_timestamps: bool = False,
+):
+    """Emit (event, data) pairs as segments are decoded; runs on an inference worker thread"""
+    started = time.monotonic()
+    prepared = prepare_audio(audio, sha256)
+    segments, info = transcribe_segments(local_model, prepared.samples, language, task, word_timestamps)
+    emit(("info", {**info_to_dict(info), "duration": prepared.original_duration}))
+    segment_count = 0
+    for segment in segments:
+        data = segment_to_dict(segment)
+        if prepared.offset:
+            data = shift_segment(data, prepared.offset)
+        emit(("segment", data))
+        segment_count += 1
+    observe_realtime_factor("ivrit", model_label(local_model), info.duration, time.monotonic() - started)
+    emit(("summary", {
+        **info_to_dict(info),
+        "duration": prepared.original_duration,
+        "task": task,
+        "segment_count": segment_count,
+        "processing_seconds": round(time.monotonic() - started, 3),
+    }))
+
+
+def local_stream(
+    model_key: ModelKey, audio: Union[str, BinaryIO, np.ndarray], language: Optional[str], task: str,
+    sha256: Optional[str] = None, word_timestamps: bool = False, duration: Optional[float] = None
+):
+    """Queue a streaming transcription on this process's pool; raises PoolSaturatedError when full"""
+    if isinstance(audio, np.ndarray):
+        duration = len(audio) / SAMPLE_RATE
+    return get_pool().stream(with_model(
+        model_key,
+        lambda worker_model, emit: stream_file(worker_model, audio, language, task, emit, sha256, word_timestamps)
+    ), duration)
+
+
+async def open_stream(
+    model_key: ModelKey, audio: Union[str, BinaryIO], language: Optional[str], task: str,
+    sha256: Optional[str] = None, word_timestamps: bool = False
+):
+    """
+    Start a streaming transcription and return an async iterator of (event, data) pairs.
+
+    With a model host the audio is decoded here and the samples are forwarded; like the
+    local path this raises PoolSaturatedError before any event when the queue is full.
+    """
+    host = get_model_host()
+    if host is None:
+        # Read from the container header, so the pool can order the job by its length
+        duration = await run_in_threadpool(audio_duration, audio)
+        return local_stream(model_key, audio, language, task, sha256, word_timestamps, duration)
+    # Trimming and normalization are left to the host, as they would be for a local job
+    prepared = await run_in_threadpool(prepare_audio, audio, sha256, False, False)
+    events = host.stream(
+        "stream",
+        {"model_key": list(model_key), "language": language, "task": task, "word_timestamps": word_timestamps},
+        prepared.samples,
+    )
+    await anext(events)  # The host accepted the job
+    return events
+
+
 @router.get("/health")
-async def health_check(local_model=None):
-    """Check if model is loaded and ready"""
+async def health_check(local_model: Optional[str] = None):
+    """Check if model is loaded and ready, without blocking on the model load"""
     logger.info("Health check requested")
     if local_model is None:
-        global model
-        if model is None:
-            logger.info("Model not loaded, attempting to load...")
-            load_model()
-        if model is None:
-            logger.error("Model failed to load during health check")
-            return JSONResponse(
-                status_code=503,
-                content={"status": "unhealthy", "message": "Model not loaded"}
-            )
-    global model_name
+        start_preload()
+    ready, stats = await readiness(local_model)
+    if not ready:
+        message = "Model failed to load" if preload_error and local_model is None else "Model not loaded"
+        logger.warning(f"Health check: {message}")
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unhealthy", "message": message, **stats}
+        )
     logger.info("Health check successful")
-    return {"status": "healthy", "message": "Model is ready", "model_name": model_name} 
+    return {"status": "healthy", "message": "Model is ready", **stats}
+
+
+def profile_compute_types(name: str, requested: list[str], audio: np.ndarray) -> list[dict]:
+    """
+    Load a private copy of the model per compute_type and time one transcription of audio.
+
+    Runs on a plain thread, outside the registry and the inference pool, so it competes
+    with live traffic for CPU; models are loaded one at a time and released right after.
+    """
+    # ctranslate2 comes with faster-whisper; it is only needed to list supported types
+    import ctranslate2
+    import faster_whisper
+
+    options = execution_options()
+    device = options["device"]
+    if device == "auto":
+        device = "cuda" if ctranslate2.get_cuda_device_count() else "cpu"
+    supported = ctranslate2.get_supported_compute_types(device)
+    audio_seconds = len(audio) / SAMPLE_RATE
+    results = []
+    for compute_type in requested:
+        if compute_type not in supported:
+            results.append({"compute_type": compute_type, "supported": False})
+            continue
+        rss_before = current_rss_bytes()
+        started = time.perf_counter()
+        model = faster_whisper.WhisperModel(name, compute_type=compute_type, **options)
+        load_seconds = time.perf_counter() - started
+        model_bytes = current_rss_bytes() - rss_before
+        warm_up(model)
+        started = time.perf_counter()
+        segments, _ = model.transcribe(audio, vad_filter=False, **decode_options())
+        segment_count = sum(1 for _ in segments)
+        transcribe_seconds = time.perf_counter() - started
+        del model, segments
+        gc.collect()
+        logger.info(f"Profiled {name} ({compute_type}): real-time factor {transcribe_seconds / audio_seconds:.3f}")
+        results.append({
+            "compute_type": compute_type,
+            "supported": True,
+            "load_seconds": round(load_seconds, 3),
+            "transcribe_seconds": round(transcribe_seconds, 3),
+            "realtime_factor": round(transcribe_seconds / audio_seconds, 4),
+            "model_mb": round(max(model_bytes, 0) / (1024 * 1024), 1),
+            "segments": segment_count,
+        })
+    return results
+
+
+@router.post("/profile")
+async def profile(
+    file: Optional[UploadFile] = File(None),
+    local_model: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    seconds: float = 10.0,
+):
+    """
+    Dry run that reports the real-time factor of each compute_type on this host
+    
+    Args:
+        file: Optional audio to time; synthetic noise of `seconds` length if omitted
+        local_model: Model alias or full name. Server default if None
+        compute_type: Comma-separated compute types to try (e.g. 'int8,float32'). All known types if None
+        seconds: Length of the synthetic clip
+
+    Each compute type loads a separate copy of the model with the configured device and
+    threads, so run it on an idle server. Unsupported types are reported, not tried. With
+    model hosts the profile runs in a host, which owns the models and their threads.
+    """
+    model_key = resolve_model(local_model)
+    requested = [t.strip() for t in compute_type.split(",") if t.strip()] if compute_type else sorted(compute_types)
+    unknown = [t for t in requested if t not in compute_types]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown compute_type {unknown}, available: {sorted(compute_types)}")
+    if file is not None:
+        upload = await ingest_upload(file, router="ivrit")
+        audio = (await run_in_threadpool(prepare_audio, upload.source, upload.sha256)).samples
+    else:
+        audio = np.random.default_rng(0).normal(0, 0.01, int(SAMPLE_RATE * seconds)).astype(np.float32)
+    host = get_model_host()
+    if host is not None:
+        return await host.call("profile", {"model_name": model_key[0], "compute_types": requested}, audio)
+    return await run_in_threadpool(local_profile, model_key[0], requested, audio)
+
+
+def local_profile(name: str, requested: list[str], audio: np.ndarray) -> dict:
+    """Profile report of this process; one run at a time, a concurrent one gets 409"""
+    if not profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile run is already in progress")
+    try:
+        logger.info(f"Profiling {name} with compute types {requested}")
+        results = profile_compute_types(name, requested, audio)
+    finally:
+        profile_lock.release()
+
+    settings = get_settings()
+    timed = [result for result in results if result["supported"]]
+    return {
+        "model_name": name,
+        "audio_seconds": round(len(audio) / SAMPLE_RATE, 3),
+        "available_cpus": available_cpus(),
+        "web_concurrency": settings.web_concurrency,
+        **execution_options(),
+        **decode_options(),
+        "results": results,
+        "fastest": min(timed, key=lambda result: result["realtime_factor"])["compute_type"] if timed else None,
+        "configured_compute_type": settings.ivrit_compute_type,
+    }
+
+
+async def transcribe_routed(
+    model_key: ModelKey,
+    audio: Union[str, BinaryIO, np.ndarray],
+    language: Optional[str],
+    task: str,
+    sha256: Optional[str] = None,
+    word_timestamps: bool = False,
+) -> dict:
+    """Transcribe in this process, picking the long-file, batched or plain path; raises PoolSaturatedError when full"""
+    settings = get_settings()
+    if isinstance(audio, np.ndarray):
+        duration = len(audio) / SAMPLE_RATE
+    else:
+        # From the container header; picks the long-file path and orders the job in the pool
+        duration = await run_in_threadpool(audio_duration, audio)
+    if settings.ivrit_long_audio_seconds and duration is not None and duration > settings.ivrit_long_audio_seconds:
+        # Long recordings are split at silences and transcribed in parallel
+        return await transcribe_long(model_key, audio, language, task, sha256, word_timestamps)
+    if settings.ivrit_batching:
+        # Short clips arriving together are decoded as one batch
+        return await get_batcher().submit(
+            (model_key, task, word_timestamps), BatchItem(audio, language, sha256), duration
+        )
+    # Transcribe using faster-whisper on an inference worker
+    return await run_inference(
+        model_key,
+        lambda worker_model: transcribe_upload(worker_model, audio, sha256, language, task, word_timestamps),
+        duration,
+    )
+
+
+async def transcribe_samples(
+    model_key: ModelKey,
+    samples: np.ndarray,
+    language: Optional[str],
+    task: str,
+    word_timestamps: bool = False,
+) -> dict:
+    """Transcribe decoded 16 kHz samples in this process or on the model host"""
+    host = get_model_host()
+    if host is None:
+        return await transcribe_routed(model_key, samples, language, task, word_timestamps=word_timestamps)
+    return await host.call(
+        "transcribe",
+        {"model_key": list(model_key), "language": language, "task": task, "word_timestamps": word_timestamps},
+        samples,
+    )
+
+
+async def transcribe_cached(
+    response: Response,
+    audio: Union[str, BinaryIO],
+    sha256: str,
+    model_key: ModelKey,
+    language: Optional[str],
+    task: str,
+    no_cache: bool,
+    word_timestamps: bool = False,
+) -> dict:
+    """
+    Transcribe through the result cache, in this process or on the model host.
+
+    Sets the X-Cache header and maps a full inference queue to 503 + Retry-After.
+    """
+    settings = get_settings()
+    batched = settings.ivrit_batching
+    cache = get_result_cache()
+    cache_key = make_key(
+        "ivrit",
+        sha256=sha256,
+        model=model_key[0],
+        compute_type=model_key[1],
+        language=language,
+        task=task,
+        vad_parameters=vad_parameters(),
+        batched=batched,
+        word_timestamps=word_timestamps,
+        preprocessing=preprocessing_options(),
+        **decode_options(),
+    )
+    result = None
+    if no_cache:
+        cache.record_bypass()
+    else:
+        result = await cache.get(cache_key)
+    response.headers["X-Cache"] = "HIT" if result is not None else "MISS"
+    if result is not None:
+        logger.info(f"Returning cached transcription for {sha256[:12]}")
+        return result
+
+    try:
+        with in_flight("ivrit"):
+            if get_model_host() is None:
+                result = await transcribe_routed(model_key, audio, language, task, sha256, word_timestamps)
+            else:
+                # Decoded here (and cached by content hash), preprocessed and transcribed by the host
+                prepared = await run_in_threadpool(prepare_audio, audio, sha256, False, False)
+                result = await transcribe_samples(model_key, prepared.samples, language, task, word_timestamps)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Transcription error: {e}")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    await cache.set(cache_key, result)
+    return result
+
 
 @router.post("/transcribe")
 async def transcribe_audio(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...),
     language: Optional[str] = None,
     task: str = "transcribe",  # "transcribe" or "translate"
-    local_model=None
+    local_model: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    no_cache: bool = False,
+    word_timestamps: bool = False,
+    output_format: str = "json",  # "json", "columnar", "msgpack", "srt" or "vtt"
+    priority: Optional[str] = None,  # "interactive" or "batch", else X-Priority or the server default
 ):
     """
     Transcribe audio file to text
@@ -70,24 +868,25 @@ async def transcribe_audio(
         file: Audio file (WAV, MP3, M4A, etc.)
         language: Language code (e.g., 'en', 'he', 'ar'). Auto-detect if None
         task: Either 'transcribe' or 'translate'
+        local_model: Model alias (e.g. 'turbo', 'small', 'distil') or full name. Server default if None
+        compute_type: CTranslate2 compute type (e.g. 'int8', 'float32'). Server default if None
+        no_cache: Skip the result cache lookup and always run inference
+        word_timestamps: Add a 'words' list with per-word start, end and probability to each segment
+        output_format: 'json', 'columnar' (segments as parallel arrays), 'msgpack' (columnar,
+            MessagePack encoded), or 'srt'/'vtt' subtitles
+        priority: 'interactive' or 'batch'; batch work waits while interactive work is queued.
+            An X-Request-Timeout header (seconds) turns away requests that could not finish in time
         
     Returns:
         JSON response containing:
             - detected_language: Detected language code
             - segments: List of transcribed segments with timing and confidence
             - text: Full transcribed text
+        or the same result in the requested output_format
     """
     logger.info(f"Received transcription request - File: {file.filename}, Language: {language}, Task: {task}")
-    if local_model is None:
-        global model
-        if model is None:
-            logger.info("Model not loaded, attempting to load...")
-            load_model()
-        
-        if model is None:
-            logger.error("Model failed to load during transcription request")
-            raise HTTPException(status_code=503, detail="Model not loaded")
-    local_model = model
+    check_output_format(output_format)
+    model_key = resolve_model(local_model, compute_type)
     
     # Check file type
     if not file.content_type.startswith('audio/'):
@@ -97,76 +896,433 @@ async def transcribe_audio(
             detail="File must be an audio file"
         )
     
-    try:
-        # Save uploaded file temporarily
-        logger.debug("Saving uploaded file to temporary location")
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".tmp") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        logger.info(f"Processing file: {file.filename}")
-        
-        # Transcribe using faster-whisper
-        logger.debug("Starting transcription process")
-        segments, info = local_model.transcribe(
-            temp_file_path,
-            language=language,
-            task=task,
-            beam_size=5,
-            vad_filter=True,  # Voice activity detection
-            vad_parameters=dict(min_silence_duration_ms=500)
+    with admit(request, priority):
+        # Hash and size-check the upload in place; Whisper decodes the spooled request file directly
+        upload = await ingest_upload(file, router="ivrit")
+        logger.info(f"Processing file: {file.filename} ({upload.size} bytes)")
+
+        result = await transcribe_cached(
+            response, upload.source, upload.sha256, model_key, language, task, no_cache, word_timestamps
         )
+    logger.info("Transcription completed successfully")
+    return render({
+        "filename": file.filename,
+        **result,
+        "task": task
+    }, output_format, response.headers)
+
+
+@router.post("/transcribe/stream")
+async def transcribe_audio_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    language: Optional[str] = None,
+    task: str = "transcribe",
+    stream_format: str = "sse",  # "sse", "ndjson", "srt" or "vtt"
+    local_model: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    word_timestamps: bool = False,
+    priority: Optional[str] = None,
+):
+    """
+    Transcribe audio file, streaming each segment as soon as it is decoded
+    
+    Args:
+        file: Audio file (WAV, MP3, M4A, etc.)
+        language: Language code (e.g., 'en', 'he', 'ar'). Auto-detect if None
+        task: Either 'transcribe' or 'translate'
+        stream_format: 'sse' for Server-Sent Events, 'ndjson' for newline-delimited JSON,
+            or 'srt'/'vtt' for subtitles written cue by cue
+        local_model: Model alias or full name. Server default if None
+        compute_type: CTranslate2 compute type. Server default if None
+        word_timestamps: Add per-word timings to each segment event
+        priority: 'interactive' or 'batch', as for /transcribe
         
-        # Collect results
-        logger.debug("Processing transcription results")
-        transcription_segments = []
-        full_text = ""
-        
-        for segment in segments:
-            segment_data = {
-                "start": segment.start,
-                "end": segment.end,
-                "text": segment.text.strip(),
-                "confidence": getattr(segment, 'avg_logprob', None)
-            }
-            transcription_segments.append(segment_data)
-            full_text += segment.text.strip() + " "
-        
-        # Clean up temporary file
-        logger.debug("Cleaning up temporary file")
-        os.unlink(temp_file_path)
-        
-        logger.info("Transcription completed successfully")
-        return {
-            "filename": file.filename,
-            "language": info.language,
-            "language_probability": info.language_probability,
-            "duration": info.duration,
-            "full_text": full_text.strip(),
-            "segments": transcription_segments,
-            "task": task
-        }
-        
+    Returns:
+        A stream of events: one 'info' event once the language is detected, one
+        'segment' event per decoded segment and a final 'summary' event carrying the
+        transcription info. Failures after the stream started are sent as an 'error' event.
+        Subtitle streams carry one cue per segment; a failure just ends the document.
+    """
+    logger.info(f"Received streaming transcription request - File: {file.filename}, Language: {language}, Task: {task}")
+    media_types = {**STREAM_MEDIA_TYPES, **SUBTITLE_MEDIA_TYPES}
+    if stream_format not in media_types:
+        raise HTTPException(status_code=400, detail=f"stream_format must be one of {list(media_types)}")
+    model_key = resolve_model(local_model, compute_type)
+    if not file.content_type.startswith('audio/'):
+        logger.warning(f"Invalid file type received: {file.content_type}")
+        raise HTTPException(status_code=400, detail="File must be an audio file")
+
+    # Counts against the client's quota until the stream ends, not just until the endpoint returns
+    admission = get_admission_control().acquire(request, priority)
+    try:
+        # The request's file is closed once the endpoint returns, so the stream needs its own spool copy
+        upload = await spool_upload(file, router="ivrit")
+    except BaseException:
+        admission.release()
+        raise
+
+    try:
+        with scheduled(admission):
+            events = await open_stream(model_key, upload.path, language, task, upload.sha256, word_timestamps)
+    except PoolSaturatedError as e:
+        upload.close()
+        admission.release()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except BaseException:
+        upload.close()
+        admission.release()
+        raise
+
+    async def body():
+        try:
+            if stream_format == "vtt":
+                yield "WEBVTT\n\n"
+            cues = 0
+            async for event, data in events:
+                if stream_format in SUBTITLE_MEDIA_TYPES:
+                    if event == "segment":
+                        cues += 1
+                        yield subtitle_cue(cues, data, stream_format)
+                else:
+                    yield format_event(event, data, stream_format)
+            logger.info("Streaming transcription completed successfully")
+        except Exception as e:
+            logger.error(f"Streaming transcription error: {e}")
+            if stream_format not in SUBTITLE_MEDIA_TYPES:
+                yield format_event("error", {"detail": f"Transcription failed: {str(e)}"}, stream_format)
+        finally:
+            await events.aclose()
+            upload.close()
+            admission.release()
+
+    return StreamingResponse(body(), media_type=media_types[stream_format], headers=STREAM_HEADERS)
+
+
+def parse_ws_options(text: str) -> Optional[dict]:
+    """Options from a WebSocket text frame; None unless it holds a JSON object"""
+    try:
+        options = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return options if isinstance(options, dict) else None
+
+
+INVALID_OPTIONS = "Text frames must be 'end' or a JSON object of options"
+
+
+@router.websocket("/transcribe/ws")
+async def transcribe_audio_ws(websocket: WebSocket, priority: Optional[str] = None):
+    """
+    Transcribe an audio file sent over a WebSocket, replying with segments as they are decoded
+    
+    Protocol:
+        1. Client optionally sends a JSON text frame:
+           {"language": "he", "task": "transcribe", "local_model": "turbo", "compute_type": "int8",
+            "word_timestamps": false}
+        2. Client sends the file content as one or more binary frames
+        3. Client sends the text frame "end"
+        4. Server sends {"event": ..., "data": ...} JSON frames ('info', 'segment'...,
+           'summary' or 'error') and closes the connection
+
+    The connection is admitted like /transcribe/stream (priority query parameter or
+    X-Priority header, X-Client-Id, X-Request-Timeout) for as long as it is open.
+    """
+    await websocket.accept()
+    try:
+        admission = get_admission_control().acquire(websocket, priority)
+    except HTTPException as e:
+        await websocket.send_json({"event": "error", "data": {"detail": e.detail}})
+        await websocket.close(code=1013 if e.status_code == 429 else 1008)  # Try again later / policy violation
+        return
+    try:
+        with scheduled(admission):
+            await run_upload_session(websocket)
+    finally:
+        admission.release()
+
+
+async def run_upload_session(websocket: WebSocket):
+    """Receive a whole file and options, then send its segments back as they are decoded"""
+    language = None
+    task = "transcribe"
+    local_model = None
+    compute_type = None
+    word_timestamps = False
+    max_size = get_settings().max_upload_size
+    size = 0
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".tmp", dir=get_settings().upload_spool_dir)
+    try:
+        with temp_file:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("bytes") is not None:
+                    size += len(message["bytes"])
+                    if size > max_size:
+                        await websocket.send_json({"event": "error", "data": {"detail": f"File exceeds maximum allowed size of {max_size} bytes"}})
+                        await websocket.close(code=1009)  # Message too big
+                        return
+                    await run_in_threadpool(temp_file.write, message["bytes"])
+                elif message.get("text") == "end":
+                    break
+                elif message.get("text"):
+                    options = parse_ws_options(message["text"])
+                    if options is None:
+                        await websocket.send_json({"event": "error", "data": {"detail": INVALID_OPTIONS}})
+                        await websocket.close(code=1007)  # Invalid payload data
+                        return
+                    language = options.get("language", language)
+                    task = options.get("task", task)
+                    local_model = options.get("local_model", local_model)
+                    compute_type = options.get("compute_type", compute_type)
+                    word_timestamps = bool(options.get("word_timestamps", word_timestamps))
+
+        logger.info(f"Received WebSocket transcription request - Language: {language}, Task: {task}")
+        try:
+            model_key = resolve_model(local_model, compute_type)
+            events = await open_stream(model_key, temp_file.name, language, task, word_timestamps=word_timestamps)
+        except HTTPException as e:
+            await websocket.send_json({"event": "error", "data": {"detail": e.detail}})
+            await websocket.close(code=1008)  # Policy violation
+            return
+        except PoolSaturatedError as e:
+            await websocket.send_json({"event": "error", "data": {"detail": str(e), "retry_after": e.retry_after}})
+            await websocket.close(code=1013)  # Try again later
+            return
+        except Exception as e:
+            logger.error(f"WebSocket transcription error: {e}")
+            await websocket.send_json({"event": "error", "data": {"detail": f"Transcription failed: {str(e)}"}})
+            await websocket.close(code=1011)  # Internal error
+            return
+
+        try:
+            async for event, data in events:
+                await websocket.send_json({"event": event, "data": data})
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            logger.error(f"WebSocket transcription error: {e}")
+            await websocket.send_json({"event": "error", "data": {"detail": f"Transcription failed: {str(e)}"}})
+        finally:
+            await events.aclose()
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("WebSocket client disconnected")
+    finally:
+        try:
+            os.unlink(temp_file.name)
+        except OSError:
+            logger.warning("Failed to clean up temporary file")
+
+
+async def run_live_session(websocket: WebSocket):
+    """Receive live audio, cut it into utterances and send partial and final transcriptions back"""
+    settings = get_settings()
+    options = {}
+    model_key = None
+    decoder: Optional[FrameDecoder] = None
+    segmenter: Optional[UtteranceSegmenter] = None
+    # Utterances waiting for the model; when full, audio is no longer read from the socket
+    finals: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.ivrit_live_max_pending_utterances))
+    finalizer: Optional[asyncio.Task] = None
+    partial_task: Optional[asyncio.Task] = None
+    last_partial = time.monotonic()
+    send_lock = asyncio.Lock()
+
+    async def send(event: str, data: dict):
+        async with send_lock:
+            await websocket.send_json({"event": event, "data": data})
+
+    async def finalize():
+        language = options.get("language")
+        while (utterance := await finals.get()) is not None:
+            while True:
+                try:
+                    result = await transcribe_samples(
+                        model_key, utterance.samples, language, options.get("task", "transcribe"),
+                        bool(options.get("word_timestamps", False)),
+                    )
+                    break
+                except DeadlineUnreachableError as e:
+                    logger.error(f"Live transcription of utterance {utterance.index} failed: {e}")
+                    await send("error", {"utterance": utterance.index, "detail": str(e)})
+                    result = None
+                    break
+                except PoolSaturatedError as e:
+                    # A finished utterance is never dropped; wait for room like a long file's chunks
+                    await asyncio.sleep(min(e.retry_after, 5))
+                except Exception as e:
+                    logger.error(f"Live transcription of utterance {utterance.index} failed: {e}")
+                    await send("error", {"utterance": utterance.index, "detail": f"Transcription failed: {str(e)}"})
+                    result = None
+                    break
+            if result is None:
+                continue
+            # The first detected language is kept for the rest of the stream
+            language = language or result["language"]
+            await send("final", {
+                "utterance": utterance.index,
+                "start": round(utterance.start, 3),
+                "end": round(utterance.end, 3),
+                "text": result["full_text"],
+                "language": result["language"],
+                "segments": [shift_segment(segment, utterance.start) for segment in result["segments"]],
+            })
+
+    async def send_partial(utterance: Utterance):
+        try:
+            result = await transcribe_samples(
+                model_key, utterance.samples, options.get("language"), options.get("task", "transcribe")
+            )
+        except PoolSaturatedError:
+            return  # Partials are best effort
+        except Exception as e:
+            logger.warning(f"Partial transcription failed: {e}")
+            return
+        if result["full_text"] and segmenter.utterances == utterance.index:  # Not finalized in the meantime
+            await send("partial", {
+                "utterance": utterance.index,
+                "start": round(utterance.start, 3),
+                "end": round(utterance.end, 3),
+                "text": result["full_text"],
+            })
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("text") == "end":
+                break
+            if message.get("text"):
+                if decoder is None:
+                    update = parse_ws_options(message["text"])
+                    if update is None:
+                        await send("error", {"detail": INVALID_OPTIONS})
+                        await websocket.close(code=1007)  # Invalid payload data
+                        return
+                    options.update(update)
+                continue
+            data = message.get("bytes")
+            if not data:
+                continue
+            if len(data) > settings.ivrit_live_max_frame_bytes:
+                await send("error", {"detail": f"Frames must not exceed {settings.ivrit_live_max_frame_bytes} bytes"})
+                await websocket.close(code=1009)  # Message too big
+                return
+
+            if decoder is None:
+                # The first audio frame starts the session with the options received so far
+                try:
+                    model_key = resolve_model(options.get("local_model"), options.get("compute_type"))
+                    decoder = FrameDecoder(
+                        options.get("encoding", "pcm_s16le"),
+                        int(options.get("sample_rate") or (48000 if options.get("encoding") == "opus" else SAMPLE_RATE)),
+                    )
+                except (HTTPException, ValueError) as e:
+                    await send("error", {"detail": e.detail if isinstance(e, HTTPException) else str(e)})
+                    await websocket.close(code=1008)  # Policy violation
+                    return
+                segmenter = UtteranceSegmenter(
+                    vad_parameters(),
+                    settings.ivrit_vad_min_silence_ms / 1000,
+                    settings.ivrit_live_max_utterance_seconds,
+                    settings.ivrit_live_step_ms / 1000,
+                )
+                finalizer = asyncio.create_task(finalize())
+                logger.info(f"Live transcription started - Options: {options}")
+
+            if not segmenter.append(decoder.decode(data)):
+                continue
+            utterance = await run_in_threadpool(segmenter.scan)
+            if utterance is not None:
+                await finals.put(utterance)
+            elif (
+                settings.ivrit_live_partial_seconds
+                and options.get("partials", True)
+                and (partial_task is None or partial_task.done())
+                and finals.empty()
+                and time.monotonic() - last_partial >= settings.ivrit_live_partial_seconds
+            ):
+                in_progress = segmenter.partial()
+                if in_progress is not None:
+                    last_partial = time.monotonic()
+                    partial_task = asyncio.create_task(send_partial(in_progress))
+
+        if segmenter is not None:
+            utterance = await run_in_threadpool(segmenter.scan, True)
+            if utterance is not None:
+                await finals.put(utterance)
+            await finals.put(None)
+            await finalizer
+        await send("summary", {
+            "utterances": segmenter.utterances if segmenter else 0,
+            "duration": round(segmenter.duration, 3) if segmenter else 0.0,
+        })
+        await websocket.close()
+    finally:
+        for task in (finalizer, partial_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+@router.websocket("/ws")
+async def live_transcription_ws(websocket: WebSocket):
+    """
+    Transcribe live audio, e.g. a microphone, while it is being spoken
+    
+    Protocol:
+        1. Client optionally sends a JSON text frame before the audio:
+           {"language": "he", "task": "transcribe", "local_model": "turbo", "compute_type": "int8",
+            "encoding": "pcm_s16le", "sample_rate": 16000, "partials": true, "word_timestamps": false}
+           encoding is 'pcm_s16le' (mono, 16 kHz unless sample_rate says otherwise) or 'opus'
+           (one raw Opus packet per frame, 48 kHz unless sample_rate says otherwise)
+        2. Client streams the audio as binary frames, e.g. every 20-100ms
+        3. Server sends 'partial' events with the text of the utterance in progress and one
+           'final' event per utterance once the speaker pauses (start/end in seconds since
+           the stream began, segments as in /transcribe)
+        4. Client sends the text frame "end"; the server finalizes the last utterance,
+           sends 'summary' and closes the connection
+    
+    Each connection buffers at most ivrit_live_max_utterance_seconds of audio plus
+    ivrit_live_max_pending_utterances utterances waiting for the model; at most
+    ivrit_live_max_streams connections are served at once, others are closed with 1013.
+    """
+    global live_streams
+    await websocket.accept()
+    if live_streams >= get_settings().ivrit_live_max_streams:
+        await websocket.send_json({"event": "error", "data": {"detail": "Too many live streams, try again later"}})
+        await websocket.close(code=1013)  # Try again later
+        return
+    live_streams += 1
+    try:
+        with in_flight("ivrit_live"):
+            await run_live_session(websocket)
+    except WebSocketDisconnect:
+        logger.info("Live transcription client disconnected")
     except Exception as e:
-        # Clean up temporary file in case of error
-        if 'temp_file_path' in locals():
-            try:
-                logger.debug("Attempting to clean up temporary file after error")
-                os.unlink(temp_file_path)
-            except:
-                logger.warning("Failed to clean up temporary file")
-                pass
-        
-        logger.error(f"Transcription error: {e}")
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+        logger.error(f"Live transcription error: {e}")
+        await websocket.send_json({"event": "error", "data": {"detail": f"Transcription failed: {str(e)}"}})
+        await websocket.close(code=1011)  # Internal error
+    finally:
+        live_streams -= 1
+
 
 @router.post("/transcribe/url")
 async def transcribe_from_url(
+    request: Request,
+    response: Response,
     audio_url: str,
     language: Optional[str] = None,
     task: str = "transcribe",
-    model=None
+    local_model: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    no_cache: bool = False,
+    word_timestamps: bool = False,
+    output_format: str = "json",
+    priority: Optional[str] = None,
 ):
     """
     Transcribe audio from URL
@@ -175,75 +1331,33 @@ async def transcribe_from_url(
         audio_url: URL to audio file
         language: Language code (e.g., 'en', 'he', 'ar'). Auto-detect if None
         task: Either 'transcribe' or 'translate'
+        local_model: Model alias (e.g. 'turbo', 'small', 'distil') or full name. Server default if None
+        compute_type: CTranslate2 compute type (e.g. 'int8', 'float32'). Server default if None
+        no_cache: Skip the result cache lookup and always run inference
+        word_timestamps: Add per-word timings to each segment
+        output_format: 'json', 'columnar', 'msgpack', 'srt' or 'vtt', as for /transcribe
+        priority: 'interactive' or 'batch', as for /transcribe
+
+    The download streams into a local cache (capped at max_upload_size), resumes with
+    Range requests when interrupted, and is revalidated with ETag/Last-Modified on later
+    requests, so unchanged URLs are not downloaded again. The X-Download header says
+    whether the file was fetched or reused.
     """
     logger.info(f"Received URL transcription request - URL: {audio_url}, Language: {language}, Task: {task}")
-    if model is None:
-        logger.error("Model not available for URL transcription")
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    
-    try:
-        # Download audio file
-        logger.info("Downloading audio file from URL")
-        response = requests.get(audio_url, timeout=30)
-        response.raise_for_status()
-        
-        # Save to temporary file
-        logger.debug("Saving downloaded file to temporary location")
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".tmp") as temp_file:
-            temp_file.write(response.content)
-            temp_file_path = temp_file.name
-        
-        logger.info(f"Processing URL: {audio_url}")
-        
-        # Transcribe
-        logger.debug("Starting transcription process")
-        segments, info = model.transcribe(
-            temp_file_path,
-            language=language,
-            task=task,
-            beam_size=5,
-            vad_filter=True,
-            vad_parameters=dict(min_silence_duration_ms=500)
-        )
-        
-        # Collect results
-        logger.debug("Processing transcription results")
-        transcription_segments = []
-        full_text = ""
-        
-        for segment in segments:
-            segment_data = {
-                "start": segment.start,
-                "end": segment.end,
-                "text": segment.text.strip(),
-                "confidence": getattr(segment, 'avg_logprob', None)
-            }
-            transcription_segments.append(segment_data)
-            full_text += segment.text.strip() + " "
-        
-        # Clean up
-        logger.debug("Cleaning up temporary file")
-        os.unlink(temp_file_path)
-        
-        logger.info("URL transcription completed successfully")
-        return {
-            "url": audio_url,
-            "language": info.language,
-            "language_probability": info.language_probability,
-            "duration": info.duration,
-            "full_text": full_text.strip(),
-            "segments": transcription_segments,
-            "task": task
-        }
-        
-    except Exception as e:
-        if 'temp_file_path' in locals():
-            try:
-                logger.debug("Attempting to clean up temporary file after error")
-                os.unlink(temp_file_path)
-            except:
-                logger.warning("Failed to clean up temporary file")
-                pass
-        
-        logger.error(f"URL transcription error: {e}")
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}") 
\ No newline at end of file
+    check_output_format(output_format)
+    model_key = resolve_model(local_model, compute_type)
+
+    with admit(request, priority):
+        async with get_url_fetcher().fetch(audio_url, get_settings().max_upload_size) as media:
+            response.headers["X-Download"] = "CACHED" if media.from_cache else "FETCHED"
+            logger.info(f"Processing URL: {audio_url} ({media.size} bytes)")
+            result = await transcribe_cached(
+                response, media.path, media.sha256, model_key, language, task, no_cache, word_timestamps
+            )
+
+    logger.info("URL transcription completed successfully")
+    return render({
+        "url": audio_url,
+        **result,
+        "task": task
+    }, output_format, response.headers)
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import mimetypes
+import os
+from typing import Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from admission import BATCH, Admission, scheduled
+from config import get_settings
+from inference import PoolSaturatedError
+from job_runner import JobRunner, ProgressCallback
+from job_store import JobStore
+from uploads import spool_upload
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"]
+)
+
+logger = logging.getLogger(__name__)
+
+# Background jobs queue behind interactive requests, in the inference pool and for Gemini's upstream slots
+JOB_ADMISSION = Admission(BATCH, "jobs")
+
+# Router each job kind runs on; a kind is only accepted while its router is enabled
+job_routers = {"transcribe": "ivrit", "gemini": "gemini"}
+
+# Global job store and runner, created in the application lifespan
+store: Optional[JobStore] = None
+runner: Optional[JobRunner] = None
+
+
+async def run_transcription_job(job: dict, report_progress: ProgressCallback) -> dict:
+    """Transcribe a job's input, reporting progress as the share of audio duration decoded"""
+    from routers import ivrit
+
+    metadata = job["metadata"]
+    language = metadata.get("language")
+    task = metadata.get("task", "transcribe")
+    model_key = ivrit.resolve_model(metadata.get("local_model"), metadata.get("compute_type"))
+    while True:
+        try:
+            with scheduled(JOB_ADMISSION):
+                events = await ivrit.open_stream(
+                    model_key, job["input_path"], language, task, metadata.get("sha256"),
+                    metadata.get("word_timestamps", False),
+                )
+            break
+        except PoolSaturatedError as e:
+            # Background work waits for room instead of failing the attempt
+            await asyncio.sleep(min(e.retry_after, 5))
+
+    info = {}
+    transcription_segments = []
+    async for event, data in events:
+        if event == "info":
+            info = data
+        elif event == "segment":
+            transcription_segments.append(data)
+            if info.get("duration"):
+                report_progress(100 * data["end"] / info["duration"])
+    return {
+        "filename": metadata.get("filename"),
+        "language": info.get("language"),
+        "language_probability": info.get("language_probability"),
+        "duration": info.get("duration"),
+        "full_text": " ".join(segment["text"] for segment in transcription_segments),
+        "segments": transcription_segments,
+        "task": task
+    }
+
+
+async def run_gemini_job(job: dict, report_progress: ProgressCallback) -> dict:
+    from routers import gemini
+
+    metadata = job["metadata"]
+    report_progress(0)
+    with scheduled(JOB_ADMISSION):
+        return await gemini.generate(
+            job["input_path"], metadata.get("mime_type"), metadata["prompt"], metadata["local_model"], metadata.get("sha256")
+        )
+
+
+def job_kinds() -> list[str]:
+    enabled = get_settings().enabled_routers
+    return [kind for kind, router_name in job_routers.items() if router_name in enabled]
+
+
+def start():
+    global store, runner
+    settings = get_settings()
+    store = JobStore(settings.job_store_path, lease_seconds=settings.job_lease_seconds)
+    handlers = {"transcribe": run_transcription_job, "gemini": run_gemini_job}
+    runner = JobRunner(
+        store,
+        {kind: handlers[kind] for kind in job_kinds()},
+        workers=settings.job_workers,
+    )
+    runner.start()
+    logger.info(f"Job runner started with {settings.job_workers} worker(s), store at {settings.job_store_path}")
+
+
+async def stop():
+    if runner is not None:
+        await runner.stop()
+    if store is not None:
+        store.close()
+
+
+def get_store() -> JobStore:
+    if store is None:
+        raise HTTPException(status_code=503, detail="Job subsystem is not running")
+    return store
+
+
+def public_view(job: dict, include_result: bool = True) -> dict:
+    view = {key: value for key, value in job.items() if key not in ("input_path", "audit_log")}
+    if not include_result:
+        view.pop("result", None)
+    return view
+
+
+@router.post("", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    kind: str = Form("transcribe"),  # "transcribe" or "gemini"
+    language: Optional[str] = Form(None),
+    task: str = Form("transcribe"),
+    local_model: Optional[str] = Form(None),
+    compute_type: Optional[str] = Form(None),
+    word_timestamps: bool = Form(False),
+    prompt: Optional[str] = Form(None),  # Defaults to /gemini/execute's prompt
+    mime_type: Optional[str] = Form(None),
+    webhook_url: Optional[str] = Form(None),
+    max_attempts: int = Form(3),
+):
+    """
+    Queue a transcription or Gemini execution and return immediately
+    
+    Args:
+        file: The audio file to process
+        kind: 'transcribe' (Whisper, see /ivrit/transcribe) or 'gemini' (see /gemini/execute)
+        language, task, local_model, compute_type, word_timestamps: Transcription options
+        prompt, mime_type, local_model: Gemini options
+        webhook_url: Optional URL that receives a POST with the job once it succeeded or failed
+        max_attempts: Attempts before the job is marked failed, retried with exponential backoff
+        
+    Returns:
+        The job id and where to poll it. GET /jobs/{job_id} reports status, progress
+        (percent of audio processed) and, once succeeded, the same result the
+        synchronous endpoint would have returned.
+    """
+    job_store = get_store()
+    if kind not in job_kinds():
+        raise HTTPException(status_code=400, detail=f"kind must be one of {job_kinds()}")
+    logger.info(f"Received {kind} job request - File: {file.filename}")
+
+    if kind == "transcribe":
+        # Imported per kind, so a deployment without the ivrit router never loads the Whisper stack
+        from routers import ivrit
+
+        if not file.content_type or not file.content_type.startswith('audio/'):
+            logger.warning(f"Invalid file type received: {file.content_type}")
+            raise HTTPException(status_code=400, detail="File must be an audio file")
+        # Fail fast on unknown models instead of on the first attempt
+        ivrit.resolve_model(local_model, compute_type)
+        metadata = {
+            "filename": file.filename,
+            "language": language,
+            "task": task,
+            "local_model": local_model,
+            "compute_type": compute_type,
+            "word_timestamps": word_timestamps,
+        }
+    else:
+        from routers import gemini
+
+        metadata = {
+            "filename": file.filename,
+            "prompt": prompt or gemini.DEFAULT_PROMPT,
+            "mime_type": mime_type or mimetypes.guess_type(file.filename)[0],
+            "local_model": local_model or gemini.DEFAULT_MODEL,
+        }
+
+    settings = get_settings()
+    os.makedirs(settings.job_spool_dir, exist_ok=True)
+    upload = await spool_upload(file, suffix=os.path.splitext(file.filename)[1], directory=settings.job_spool_dir, router="jobs")
+    metadata["sha256"] = upload.sha256
+    metadata["size_bytes"] = upload.size
+    try:
+        job = await asyncio.to_thread(
+            job_store.create,
+            kind,
+            summary=f"{kind} {file.filename}",
+            metadata=metadata,
+            input_path=upload.path,
+            webhook_url=webhook_url,
+            retry_spec={
+                "max_attempts": max(1, max_attempts),
+                "backoff_seconds": settings.job_retry_backoff_seconds,
+                "backoff_multiplier": 2.0,
+            },
+        )
+    except BaseException:
+        # No job refers to the input, so nothing else would ever delete it
+        upload.close()
+        raise
+    runner.notify()
+    logger.info(f"Queued job {job['job_id']}")
+    return {"job_id": job["job_id"], "status": job["status"], "status_url": f"/jobs/{job['job_id']}"}
+
+
+@router.get("")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """List recent jobs (without results), optionally filtered by status"""
+    job_store = get_store()
+    counts = await asyncio.to_thread(job_store.counts)
+    jobs = await asyncio.to_thread(job_store.list, status, min(limit, 500))
+    return {
+        "counts": counts,
+        "jobs": [public_view(job, include_result=False) for job in jobs],
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Poll a job's status, progress and result"""
+    job = await asyncio.to_thread(get_store().get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": f"Job {job_id} not found"})
+    return public_view(job)
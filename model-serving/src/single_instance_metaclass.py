@@ -1,23 +0,0 @@
-class SingleInstanceMetaClass(type):
-    def __init__(self, name, bases, dic):
-        self.__single_instance = None
-        super().__init__(name, bases, dic)
-
-    def __call__(cls, *args, **kwargs):
-        if cls.__single_instance:
-            return cls.__single_instance
-        single_obj = cls.__new__(cls)  # type: ignore
-        single_obj.__init__(*args, **kwargs)
-        cls.__single_instance = single_obj
-        return single_obj
-
-
-def singleton(cls):
-    instances = {}
-
-    def wrapper(*args, **kwargs):
-        if cls not in instances:
-            instances[cls] = cls(*args, **kwargs)
-        return instances[cls]
-
-    return wrapper
@@ -0,0 +1,69 @@
+"""
+Where a process's cold start goes: interpreter and imports, settings, router
+registration, lifespan hooks, and the background backend import and model load.
+
+Phases are recorded as they happen and served at GET /startup; main.py logs the
+summary once the worker accepts requests, the model loader once the model is warm.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+def process_uptime() -> Optional[float]:
+    """Seconds since this process was started (Linux only), so time before main.py ran is counted too"""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Field 22 is the start time in clock ticks after boot; the command name may contain spaces
+            started_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            boot_seconds = float(uptime.read().split()[0])
+        return round(boot_seconds - started_ticks / os.sysconf("SC_CLK_TCK"), 3)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """Named durations, in the order they were first recorded"""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.serving_after: Optional[float] = None  # Process uptime when the worker started accepting requests
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = round(self.phases.get(name, 0.0) + seconds, 3)
+
+    def mark_serving(self):
+        self.serving_after = process_uptime()
+
+    def report(self) -> dict:
+        with self._lock:
+            phases = dict(self.phases)
+        return {
+            "phases": phases,
+            "serving_after_seconds": self.serving_after,
+            "process_uptime_seconds": process_uptime(),
+        }
+
+    def summary(self) -> str:
+        with self._lock:
+            phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        if self.serving_after is not None:
+            phases += f"; serving {self.serving_after:.2f}s after process start"
+        return phases
+
+
+# Global startup profile of this process
+startup_profile = StartupProfile()
@@ -0,0 +1,22 @@
+import json
+from typing import Any
+
+# Response media type per supported streaming format
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+# Keep proxies (nginx, swag) from buffering the stream
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_event(event: str, data: Any, stream_format: str = "sse") -> str:
+    """Serialize a single event as a Server-Sent Event frame or an NDJSON line"""
+    payload = json.dumps(data, ensure_ascii=False)
+    if stream_format == "ndjson":
+        return f'{{"event": {json.dumps(event)}, "data": {payload}}}\n'
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from typing import BinaryIO, Optional, Union
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from config import get_settings
+from metrics import BYTES_INGESTED, stage
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+class IngestedUpload:
+    """
+    An upload that has been size-checked and hashed.
+
+    `source` is what gets handed to the model: either the path of a spool file we
+    own (deleted on close) or the request's own file object, rewound to the start.
+    """
+
+    def __init__(self, source: Union[str, BinaryIO], size: int, sha256: str, filename: Optional[str]):
+        self.source = source
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+
+    @property
+    def path(self) -> Optional[str]:
+        return self.source if isinstance(self.source, str) else None
+
+    def close(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+                logger.debug(f"Cleaned up spool file: {self.path}")
+            except OSError as e:
+                logger.warning(f"Failed to clean up spool file {self.path}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def link_or_copy(path: str) -> str:
+    """
+    Give the file at path a second name next to it, so it survives the original being deleted.
+
+    A hard link costs no I/O; filesystems without them get a copy. The caller owns (and
+    deletes) the returned path.
+    """
+    root, extension = os.path.splitext(path)
+    owned = f"{root}-{uuid.uuid4().hex[:8]}{extension}"
+    try:
+        os.link(path, owned)
+    except OSError:
+        shutil.copyfile(path, owned)
+    return owned
+
+
+def _too_large(size: int, max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File size ({size} bytes) exceeds maximum allowed size of {max_size} bytes"
+    )
+
+
+def _copy_chunks(src: BinaryIO, dst: Optional[BinaryIO], max_size: int, chunk_size: int):
+    digest = hashlib.sha256()
+    size = 0
+    src.seek(0)
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            raise _too_large(size, max_size)
+        digest.update(chunk)
+        if dst is not None:
+            dst.write(chunk)
+    src.seek(0)
+    return size, digest.hexdigest()
+
+
+async def spool_upload(
+    file: UploadFile,
+    suffix: str = ".tmp",
+    max_size: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    directory: Optional[str] = None,
+    router: str = "",
+) -> IngestedUpload:
+    """
+    Copy an upload to a spool file in fixed-size chunks, hashing it on the way.
+
+    Use this when the file has to outlive the request (streaming responses, background
+    jobs) or the consumer needs a real path. The copy aborts with 413 as soon as
+    max_size is crossed. The spool directory defaults to the system temp dir and can be
+    pointed at tmpfs with the upload_spool_dir setting, or overridden with directory.
+    """
+    settings = get_settings()
+    max_size = max_size or settings.max_upload_size
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory or settings.upload_spool_dir)
+    try:
+        with temp_file, stage(router, "spool_write"):
+            size, sha256 = await run_in_threadpool(_copy_chunks, file.file, temp_file, max_size, chunk_size)
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+    BYTES_INGESTED.inc(size, router=router)
+    logger.info(f"Spooled upload {file.filename} ({size} bytes) to {temp_file.name}")
+    return IngestedUpload(temp_file.name, size, sha256, file.filename)
+
+
+async def ingest_upload(
+    file: UploadFile,
+    max_size: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    router: str = "",
+) -> IngestedUpload:
+    """
+    Size-check and hash an upload in place, without copying it.
+
+    The returned source is the request's own (already spooled) file object, so it is
+    only valid until the endpoint returns. faster-whisper decodes file objects directly.
+    """
+    max_size = max_size or get_settings().max_upload_size
+    with stage(router, "upload_read"):
+        size, sha256 = await run_in_threadpool(_copy_chunks, file.file, None, max_size, chunk_size)
+    BYTES_INGESTED.inc(size, router=router)
+    return IngestedUpload(file.file, size, sha256, file.filename)
@@ -0,0 +1,64 @@
+"""Ordering and deadlines of the upstream (Gemini) concurrency limit"""
+import asyncio
+import time
+
+import pytest
+
+from admission import BATCH, INTERACTIVE, Admission, DeadlineExceededError, PrioritySemaphore, scheduled
+
+
+async def wait_as(semaphore: PrioritySemaphore, admission: Admission, order: list[str], name: str):
+    with scheduled(admission):
+        await semaphore.acquire()
+    order.append(name)
+
+
+def test_interactive_waiters_overtake_batch():
+    async def run():
+        semaphore = PrioritySemaphore(1)
+        await semaphore.acquire()
+        order = []
+        waiters = []
+        for name, priority in [("batch-1", BATCH), ("interactive-1", INTERACTIVE), ("batch-2", BATCH), ("interactive-2", INTERACTIVE)]:
+            waiters.append(asyncio.create_task(wait_as(semaphore, Admission(priority), order, name)))
+            await asyncio.sleep(0)
+        for _ in waiters:
+            semaphore.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+        return order
+
+    assert asyncio.run(run()) == ["interactive-1", "interactive-2", "batch-1", "batch-2"]
+
+
+def test_waiter_past_its_deadline_gives_up_without_taking_the_slot():
+    async def run():
+        semaphore = PrioritySemaphore(1)
+        await semaphore.acquire()
+        order = []
+        late = asyncio.create_task(wait_as(semaphore, Admission(INTERACTIVE, deadline=time.time() + 0.05), order, "late"))
+        patient = asyncio.create_task(wait_as(semaphore, Admission(BATCH), order, "patient"))
+        with pytest.raises(DeadlineExceededError):
+            await late
+        semaphore.release()
+        await patient
+        semaphore.release()
+        return order, semaphore.locked()
+
+    assert asyncio.run(run()) == (["patient"], False)
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        semaphore = PrioritySemaphore(1)
+        await semaphore.acquire()
+        order = []
+        cancelled = asyncio.create_task(wait_as(semaphore, Admission(INTERACTIVE), order, "cancelled"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        semaphore.release()
+        await asyncio.wait_for(semaphore.acquire(), timeout=1)
+        return order
+
+    assert asyncio.run(run()) == []
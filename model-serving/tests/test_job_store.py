@@ -0,0 +1,129 @@
+"""Lease ownership of the job store, with two stores standing in for two uvicorn workers"""
+import pytest
+
+from job_store import FAILED, QUEUED, RUNNING, SUCCEEDED, JobStore
+
+NO_BACKOFF = {"max_attempts": 2, "backoff_seconds": 0, "backoff_multiplier": 1.0}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+@pytest.fixture
+def stores(path):
+    opened = [JobStore(path), JobStore(path)]
+    yield opened
+    for store in opened:
+        store.close()
+
+
+def create(store: JobStore, retry_spec: dict = NO_BACKOFF) -> str:
+    return store.create("transcribe", summary="transcribe a.wav", metadata={}, retry_spec=retry_spec)["job_id"]
+
+
+def events(store: JobStore, job_id: str) -> list[str]:
+    return [entry["event"] for entry in store.get(job_id)["audit_log"]]
+
+
+def test_claim_is_exclusive(stores):
+    first, second = stores
+    job_id = create(first)
+
+    job = first.claim_next()
+    assert job["job_id"] == job_id
+    assert job["status"] == RUNNING
+    assert job["owner"] == first.owner
+    assert job["attempts"] == 1
+    assert second.claim_next() is None
+
+
+def test_renew_leases_reports_jobs_owned_elsewhere(stores):
+    first, second = stores
+    job_id = create(first)
+    expires = first.claim_next()["lease_expires_at"]
+
+    assert second.renew_leases([job_id]) == {job_id}
+    assert first.get(job_id)["lease_expires_at"] == expires
+    assert first.renew_leases([job_id]) == set()
+    assert first.get(job_id)["lease_expires_at"] >= expires
+
+
+def test_requeue_expired_leaves_live_leases(stores):
+    first, second = stores
+    job_id = create(first)
+    first.claim_next()
+
+    assert second.requeue_expired() == 0
+    assert second.get(job_id)["status"] == RUNNING
+
+
+def test_expired_lease_moves_the_job_to_another_owner(path):
+    dead, live = JobStore(path, lease_seconds=0), JobStore(path)
+    job_id = create(dead)
+    dead.claim_next()
+
+    assert live.requeue_expired() == 1
+    job = live.get(job_id)
+    assert job["status"] == QUEUED
+    assert job["owner"] is None
+    assert events(live, job_id)[-1] == "requeued_after_lease_expired"
+
+    assert live.claim_next()["owner"] == live.owner
+    # The previous owner finishing late must not touch the job it lost
+    assert dead.complete(job_id, {"full_text": "late"}) is None
+    assert dead.fail(job_id, "late") is None
+    assert dead.release(job_id) is False
+    assert dead.renew_leases([job_id]) == {job_id}
+    job = live.get(job_id)
+    assert job["status"] == RUNNING
+    assert job["owner"] == live.owner
+    assert job["result"] is None
+
+    assert live.complete(job_id, {"full_text": "done"})["status"] == SUCCEEDED
+    dead.close()
+    live.close()
+
+
+def test_finished_job_ignores_its_former_owner(stores):
+    first, _ = stores
+    job_id = create(first)
+    first.claim_next()
+
+    assert first.complete(job_id, {"full_text": "done"})["status"] == SUCCEEDED
+    assert first.complete(job_id, {"full_text": "again"}) is None
+    assert first.fail(job_id, "after success") is None
+    job = first.get(job_id)
+    assert job["status"] == SUCCEEDED
+    assert job["result"] == {"full_text": "done"}
+    assert job["owner"] is None
+    assert events(first, job_id) == ["created", "started", "succeeded"]
+
+
+def test_fail_retries_until_attempts_run_out(stores):
+    first, second = stores
+    job_id = create(first)
+
+    first.claim_next()
+    job = first.fail(job_id, "boom")
+    assert job["status"] == QUEUED
+    assert job["retry_count"] == 1
+    assert job["owner"] is None
+
+    second.claim_next()
+    assert first.fail(job_id, "not mine") is None
+    job = second.fail(job_id, "boom again")
+    assert job["status"] == FAILED
+    assert job["last_error"] == "boom again"
+    assert events(first, job_id) == ["created", "started", "retry_scheduled", "started", "failed"]
+
+
+def test_reopening_keeps_the_schema(path):
+    store = JobStore(path)
+    job_id = create(store)
+    store.close()
+
+    reopened = JobStore(path)
+    assert reopened.get(job_id)["status"] == QUEUED
+    reopened.close()